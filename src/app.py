@@ -1,69 +1,367 @@
+import math
+import os
 import sys
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
 import streamlit as st
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from tests import code_coverage
-
-# need to monitor coverage during imports
-code_coverage.cov.start()
-
-from tasks import (
+from src.storage.shared import get_shared_store
+from src.tasks import (
     DATE_FORMAT,
+    DEFAULT_TASKS_FILE,
     TIME_FORMAT,
+    ConcurrentModificationError,
+    TaskCollection,
+    TaskQuery,
     complete_all_tasks,
-    filter_tasks_by_category,
-    filter_tasks_by_priority,
+    complete_where,
+    delete_where,
     generate_unique_id,
     get_task_stats,
-    load_tasks,
-    save_tasks,
-    sort_tasks,
 )
-from tests import html, test_advanced, test_basic, test_bdd, test_tdd
+from tests.common import TEST_DIR
+
+# the test tooling (tests.runner, tests.benchmark, and through them pytest and
+# coverage) is imported when a button needs it, to keep startup fast; see
+# tests/importtime.py
+
+# test buttons, with the name and path of the tests each one shows
+TEST_SUITES = {
+    "Run Basic Tests": ("Basic Unit Tests", "test_basic.py"),
+    "Run Advanced Tests": ("Advanced Tests", "test_advanced.py"),
+    "Run TDD Tests": ("TDD Tests", "test_tdd.py"),
+    "Run BDD Tests": ("BDD Tests", "feature"),
+}
+# seconds between refreshes of a running test job
+TEST_POLL_INTERVAL = 1.0
+
+
+def show_test_results(test_name, reports):
+    """Shows the results of a finished test job.
+
+    Args:
+        test_name (str): The name of the tests.
+        reports (Iterable[dict]): The per-test reports to show.
+    """
+    passed = []
+    failed = []
+
+    for report in reports:
+        if report["outcome"] == "passed":
+            passed.append(report["nodeid"])
+        elif report["outcome"] == "failed":
+            failed.append(report["nodeid"])
+
+    label = f"**Results for `{test_name}`:**"
+    message = [
+        f"{len(passed)} tests passed!\n{len(failed)} tests failed!",
+    ]
+
+    with st.status(label, state="error" if failed else "complete", expanded=True):
+        if failed:
+            lines = ["Failing tests:\n"]
+            for node in failed:
+                lines.append(f"- `{node}`")
+            message.append("\n".join(lines))
 
-code_coverage.cov.stop()
+        st.markdown("\n\n".join(message))
 
 
-def run_tests(run_func, test_name="Test"):
-    with st.status("Running tests...", state="running") as status:
-        reports = run_func()
+def show_html_report(job):
+    """Offers the HTML report of a finished test job for download.
+
+    Args:
+        job (TestJob): The job.
+    """
+    report_content = job.results and job.results["html"]
+    if report_content:
+        with st.status("Report Created!", state="complete", expanded=True):
+            st.download_button(
+                "Download HTML Report",
+                data=report_content,
+                file_name="report.html",
+                mime="text/html",
+                icon=":material/download:",
+            )
+    else:
+        st.status("Report creation failed!", state="error")
 
-        passed = []
-        failed = []
 
-        for nodeid, test_passed in reports:
-            if test_passed:
-                passed.append(nodeid)
-            else:
-                failed.append(nodeid)
+def show_coverage(job):
+    """Shows the code coverage measured by a finished test job.
 
-        label = f"**Results for `{test_name}`:**"
-        message = [
-            f"{len(passed)} tests passed!\n{len(failed)} tests failed!",
+    Args:
+        job (TestJob): The job.
+    """
+    report = job.results["coverage"] if job.results else []
+    message = "\n\n".join(
+        [
+            "**NOTE:** Coverage is measured in the test run, so app.py is only covered as far as the tests use it."
         ]
+        + [f"`{name}: {coverage:.2f}%`" for name, coverage in report]
+    )
+
+    with st.status("Coverage Calculation Complete", state="complete", expanded=True):
+        st.markdown(message)
+
+
+def show_test_job():
+    """Shows the current test job: live progress while it runs, then its results."""
+    if "test_job" not in st.session_state:
+        return
+
+    from tests import runner
+
+    job = runner.get_job(st.session_state["test_job"])
+    if job is None:
+        return
+    view, test_name, path = st.session_state["test_view"]
+    reports = [
+        report
+        for report in list(job.reports)
+        if path is None or runner.in_path(report["nodeid"], path)
+    ]
+
+    if not job.done:
+        outcomes = [report["outcome"] for report in job.reports]
+        total = job.total or 0
+        st.progress(
+            min(len(outcomes) / total, 1.0) if total else 0.0,
+            text=f"Running tests... {len(outcomes)} of {total or '?'} done "
+            f"({outcomes.count('failed')} failed, {job.duration:.0f}s)",
+        )
+        for report in reports[-5:]:
+            st.caption(f"{report['outcome']}: `{report['nodeid']}`")
+        if st.button("Cancel Tests"):
+            job.cancel()
+        return
+
+    if st.session_state.get("test_job_running"):
+        # stop polling now the job is done
+        st.session_state["test_job_running"] = False
+        st.rerun()
+
+    if job.state in ("cancelled", "error"):
+        st.status(f"Test run {job.state}", state="error")
+    elif view == "html":
+        show_html_report(job)
+    elif view == "coverage":
+        show_coverage(job)
+    else:
+        show_test_results(test_name, reports)
+
+
+def start_tests(view, test_name=None, path=None):
+    """Starts (or reuses) the background test job and shows part of it.
+
+    Args:
+        view (str): "tests", "html" or "coverage".
+        test_name (str, optional): The name of the tests to show.
+        path (str, optional): The test file or directory to show.
+    """
+    from tests import runner
+
+    # only a run of every test makes an HTML report
+    job = runner.start_job(full=view == "html")
+    st.session_state["test_job"] = job.id
+    st.session_state["test_job_running"] = not job.done
+    st.session_state["test_view"] = (view, test_name, path)
+
+
+def show_test_history():
+    """Shows past test runs and the slowest tests of the latest one."""
+    from tests import runner
+
+    history = runner.job_history()
+    if not history:
+        return
+
+    with st.expander("Test History"):
+        st.dataframe(
+            [
+                {
+                    "started": datetime.fromtimestamp(run["started"]).strftime(
+                        TIME_FORMAT
+                    ),
+                    "seconds": round(run["duration"], 1),
+                    "state": run["state"],
+                    "passed": run["passed"],
+                    "failed": run["failed"],
+                }
+                for run in history
+            ],
+            hide_index=True,
+        )
+        slowest = sorted(
+            history[0]["durations"].items(), key=lambda item: item[1], reverse=True
+        )
+        st.caption("Slowest tests in the latest run")
+        st.dataframe(
+            [
+                {"test": nodeid, "seconds": round(duration, 3)}
+                for nodeid, duration in slowest[:10]
+            ],
+            hide_index=True,
+        )
+
+
+# where tasks are kept, e.g. "sqlite://tasks.db" or "memory://demo"; see open_store
+TASKS_STORE = os.environ.get("TASKS_STORE", f"json://{DEFAULT_TASKS_FILE}")
 
-        if failed:
-            lines = ["Failing tests:\n"]
-            for node in failed:
-                lines.append(f"- `{node}`")
-            message.append("\n".join(lines))
 
-            status.update(label=label, state="error", expanded=True)
+def run_benchmarks(sizes=(1_000,)):
+    """Times every function in tasks.py and storage/ against the saved baseline.
+
+    Args:
+        sizes (Iterable[int], optional): The numbers of tasks to benchmark with.
+    """
+    from tests import benchmark
+
+    with st.status("Running benchmarks...", state="running") as status:
+        results = benchmark.run_suite(sizes)
+        baseline = benchmark.load_baseline()
+        regressions = benchmark.find_regressions(results, baseline) if baseline else []
+
+        if regressions:
+            status.update(label="Benchmarks regressed!", state="error", expanded=True)
+            st.markdown(
+                "\n".join(
+                    f"- `{name}` ({n} tasks) {metric}: {old:.4g} → {new:.4g}"
+                    for name, n, metric, old, new in regressions
+                )
+            )
         else:
+            label = "No regressions" if baseline else "No baseline to compare with"
             status.update(label=label, state="complete", expanded=True)
 
-        st.markdown("\n\n".join(message))
+        st.dataframe(benchmark.format_results(results), hide_index=True)
+
+
+def show_startup_report():
+    """Measures how long a cold start of the app spends importing."""
+    from tests import importtime
+
+    with st.status("Measuring startup...", state="running") as status:
+        report = importtime.startup_report()
+        problems = importtime.check_startup(report)
+
+        if problems:
+            status.update(label="Startup over budget!", state="error", expanded=True)
+            st.markdown("\n".join(f"- app {problem}" for problem in problems))
+        else:
+            status.update(
+                label="Startup within budget", state="complete", expanded=True
+            )
+
+        st.markdown(
+            f"Imports take `{report['total']:.3f}s`, "
+            f"`{report['startup']:.3f}s` of that outside streamlit."
+        )
+        st.dataframe(
+            [
+                {"import": i["module"], "seconds": i["cumulative"]}
+                for i in report["slowest"]
+            ],
+            hide_index=True,
+        )
+
+
+PAGE_SIZES = [10, 25, 50, 100]
+# due date filters, as functions of today giving inclusive (start, end) dates
+DUE_RANGES = {
+    "Any Time": None,
+    "Overdue": lambda today: (date.min, today - timedelta(days=1)),
+    "Today": lambda today: (today, today),
+    "Next 7 Days": lambda today: (today, today + timedelta(days=6)),
+    "Next 30 Days": lambda today: (today, today + timedelta(days=29)),
+}
+TABLE_COLUMNS = [
+    "completed",
+    "title",
+    "description",
+    "due_date",
+    "priority",
+    "category",
+]
+
+
+def show_task_list(store, tasks):
+    """Shows tasks one after another, each with buttons to complete or delete it.
+
+    Args:
+        store (SharedTaskStore): The store to save changes to.
+        tasks (list[dict]): The tasks on the current page.
+    """
+    for task in tasks:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            if task.get("completed", False):
+                st.markdown(f"~~**{task['title']}**~~")
+            else:
+                st.markdown(f"**{task['title']}**")
+            st.write(task.get("description", "No Description"))
+            st.caption(
+                f"Due: {task.get('due_date', 'N/A')} | Priority: {task.get('priority', 'N/A')} | Category: {task.get('category', 'N/A')}"
+            )
+        with col2:
+            if st.button(
+                "Complete" if not task.get("completed", False) else "Undo",
+                key=f"complete_{task.get('id', None)}",
+            ):
+                store.toggle(task["id"])
+                st.rerun()
+            if st.button("Delete", key=f"delete_{task.get('id', None)}"):
+                store.delete(task["id"])
+                st.rerun()
+
+
+def show_task_table(store, tasks):
+    """Shows tasks in a compact table, where the completed column can be edited.
+
+    Args:
+        store (SharedTaskStore): The store to save completion changes to.
+        tasks (list[dict]): The tasks on the current page.
+    """
+    rows = [
+        {
+            "id": task.get("id"),
+            "completed": bool(task.get("completed", False)),
+            **{column: task.get(column, "") for column in TABLE_COLUMNS[1:]},
+        }
+        for task in tasks
+    ]
+
+    edited = st.data_editor(
+        rows,
+        # a new key once the tasks change, so old edits aren't re-applied
+        key=f"task_table_{store.version}",
+        hide_index=True,
+        width="stretch",
+        column_config={"id": None},
+        disabled=TABLE_COLUMNS[1:],
+    )
+
+    toggled = [
+        row["id"]
+        for row, original in zip(edited, rows)
+        if row["completed"] != original["completed"]
+    ]
+    if toggled:
+        for task_id in toggled:
+            store.toggle(task_id)
+        st.rerun()
 
 
 def main():
     st.title("To-Do Application")
 
-    # Load existing tasks
-    tasks = load_tasks()
+    # Load existing tasks; the store only re-reads the file when it changes
+    store = get_shared_store(TASKS_STORE)
+    tasks_version = store.refresh()
+    tasks = store.view()
 
     # Sidebar for adding new tasks
     st.sidebar.header("Add New Task")
@@ -81,7 +379,7 @@ def main():
 
         if submit_button and task_title:
             new_task = {
-                "id": generate_unique_id(tasks),
+                "id": generate_unique_id(store),
                 "title": task_title,
                 "description": task_description,
                 "priority": task_priority,
@@ -90,8 +388,8 @@ def main():
                 "completed": False,
                 "created_at": datetime.now().strftime(TIME_FORMAT),
             }
-            tasks.append(new_task)
-            save_tasks(tasks)
+            store.add(new_task)
+            tasks = store.view()
             st.sidebar.success("Task added successfully!")
 
     # Main area to display tasks
@@ -106,10 +404,13 @@ def main():
             + list(set([task["category"] for task in tasks if "category" in task])),
         )
         show_completed = st.checkbox("Show Completed Tasks")
+        search_query = st.text_input("Search")
     with col2:
         filter_priority = st.selectbox(
             "Filter by Priority", ["All", "High", "Medium", "Low"]
         )
+        filter_due = st.selectbox("Due", list(DUE_RANGES))
+        view_mode = st.radio("View", ["List", "Table"], horizontal=True)
 
     with col3:
         sort_by = st.selectbox(
@@ -118,105 +419,97 @@ def main():
             placeholder="Choose an Option",
         )
         ascending = st.checkbox("Sort Ascending", value=True)
+        page_size = st.selectbox("Tasks per Page", PAGE_SIZES, index=1)
 
     if st.button(
         "Complete All Tasks",
         disabled=all(task.get("completed", False) for task in tasks),
     ):
-        tasks = complete_all_tasks(tasks)
-        save_tasks(tasks)
-        st.rerun()
+        tasks = TaskCollection(complete_all_tasks(tasks), tasks.high_water_mark)
+        try:
+            store.save(tasks, expected_version=tasks_version)
+        except ConcurrentModificationError:
+            st.warning("Tasks were changed in another session. Please try again.")
+        else:
+            st.rerun()
 
-    stats = get_task_stats(tasks)
+    stats = get_task_stats(store)
 
     st.write(
         f"Total Tasks: {stats[0]} | Completed Tasks: {stats[2]} | Incomplete Tasks: {stats[1]} | Overdue Tasks: {stats[3]}"
     )
 
     # Apply filters
-    filtered_tasks = [task.copy() for task in tasks]
+    query = TaskQuery().sort_by(sort_by, ascending)
     if filter_category != "All":
-        filtered_tasks = filter_tasks_by_category(filtered_tasks, filter_category)
+        query.category(filter_category)
     if filter_priority != "All":
-        filtered_tasks = filter_tasks_by_priority(filtered_tasks, filter_priority)
+        query.priority(filter_priority)
     if not show_completed:
-        filtered_tasks = [task for task in filtered_tasks if not task["completed"]]
-    filtered_tasks = sort_tasks(filtered_tasks, sort_by, ascending)
+        query.completed(False)
+    if search_query:
+        query.search(search_query, store)
+    if DUE_RANGES[filter_due] is not None:
+        query.due_between(*DUE_RANGES[filter_due](date.today()), store)
+
+    # Only build widgets for one page of tasks
+    filtered_count = query.count(tasks)
+    page_count = max(1, math.ceil(filtered_count / page_size))
+    if st.session_state.get("page", 1) > page_count:
+        st.session_state["page"] = 1
+    page = st.number_input("Page", min_value=1, max_value=page_count, key="page")
+    st.caption(f"Page {page} of {page_count} ({filtered_count} tasks)")
+    page_tasks = query.page(page, page_size).run(tasks)
+
+    # Bulk actions, each saved with a single write
+    titles = {task.get("id"): task.get("title", "") for task in page_tasks}
+    selected = st.multiselect(
+        "Select Tasks",
+        list(titles),
+        format_func=titles.get,
+        key=f"selected_{store.version}",
+    )
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("Complete Selected", disabled=not selected):
+            complete_where(store, selected)
+            st.rerun()
+    with col2:
+        if st.button("Delete Selected", disabled=not selected):
+            delete_where(store, selected)
+            st.rerun()
+    with col3:
+        if st.button("Delete Completed Tasks", disabled=stats[2] == 0):
+            delete_where(store, lambda task: task.get("completed", False))
+            st.rerun()
 
     # Display tasks
-    for task in filtered_tasks:
-        col1, col2 = st.columns([4, 1])
-        with col1:
-            if task.get("completed", False):
-                st.markdown(f"~~**{task['title']}**~~")
-            else:
-                st.markdown(f"**{task['title']}**")
-            st.write(task.get("description", "No Description"))
-            st.caption(
-                f"Due: {task.get('due_date', 'N/A')} | Priority: {task.get('priority', 'N/A')} | Category: {task.get('category', 'N/A')}"
-            )
-        with col2:
-            if st.button(
-                "Complete" if not task.get("completed", False) else "Undo",
-                key=f"complete_{task.get('id', None)}",
-            ):
-                for t in tasks:
-                    if t["id"] == task["id"]:
-                        t["completed"] = not t["completed"]
-                        save_tasks(tasks)
-                        st.rerun()
-            if st.button("Delete", key=f"delete_{task.get('id', None)}"):
-                tasks = [
-                    t for t in tasks if task.get("id", None) != task.get("id", None)
-                ]
-                save_tasks(tasks)
-                st.rerun()
+    if view_mode == "Table":
+        show_task_table(store, page_tasks)
+    else:
+        show_task_list(store, page_tasks)
 
     st.header("Tests")
 
-    if st.button("Run Basic Tests"):
-        run_tests(test_basic.run_tests, "Basic Unit Tests")
-
-    if st.button("Run Advanced Tests"):
-        run_tests(test_advanced.run_tests, "Advanced Tests")
+    for button, (test_name, path) in TEST_SUITES.items():
+        if st.button(button):
+            start_tests("tests", test_name, str(Path(TEST_DIR) / path))
 
-    if st.button("Run TDD Tests"):
-        run_tests(test_tdd.run_tests, "TDD Tests")
+    if st.button("Run Benchmarks"):
+        run_benchmarks()
 
-    if st.button("Run BDD Tests"):
-        run_tests(test_bdd.run_tests, "BDD Tests")
+    if st.button("Startup Report"):
+        show_startup_report()
 
     if st.button("Generate HTML Report"):
-
-        with st.status("Running Tests...") as status:
-            report_content = html.generate_html_report()
-            if report_content:
-                status.update(label="Report Created!", state="complete", expanded=True)
-                st.download_button(
-                    "Download HTML Report",
-                    data=report_content,
-                    file_name="report.html",
-                    mime="text/html",
-                    icon=":material/download:",
-                )
-            else:
-                status.update(label="Report creation failed!", state="error")
+        start_tests("html")
 
     if st.button("Get Test Coverage"):
-        with st.status("Running Tests...") as status:
-            report = code_coverage.get_code_coverage()
-
-            message = "\n\n".join(
-                [
-                    "**NOTE:** Coverage for app.py is not accurate when coverage is run through the streamlit app. All other stats are correct."
-                ]
-                + [f"`{name}: {coverage:.2f}%`" for name, coverage in report]
-            )
+        start_tests("coverage")
 
-            status.update(
-                label="Coverage Calculation Complete", state="complete", expanded=True
-            )
-            st.markdown(message)
+    running = st.session_state.get("test_job_running", False)
+    st.fragment(show_test_job, run_every=TEST_POLL_INTERVAL if running else None)()
+    show_test_history()
 
 
 if __name__ == "__main__":
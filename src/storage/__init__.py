@@ -0,0 +1,15 @@
+"""
+Storage engines for tasks, each in its own module.
+
+`src/tasks.py` is the API over plain lists of task dictionaries; the engines
+here keep tasks some other way and plug into that API:
+
+    sqlite       SQLiteTaskRepository, which pushes queries down to SQL
+    compact      Task and TaskList, a compact in-memory representation
+    columnar     ColumnarTaskStore, NumPy arrays for vectorized queries
+    shared       SharedTaskStore, one in-memory copy per process
+    backends     The TaskStore protocol, MemoryTaskStore and open_store
+    async_store  AsyncTaskStore, for asyncio hosts
+    parallel     ParallelTaskScan, which shards scans across processes
+    binary       The memory-mapped binary snapshot format
+"""
@@ -0,0 +1,182 @@
+"""An asyncio front end to a tasks file."""
+
+import asyncio
+import contextlib
+import functools
+
+from ..tasks import (
+    DEFAULT_TASKS_FILE,
+    STREAM_CHUNK_TASKS,
+    ConcurrentModificationError,
+    TaskCollection,
+    TaskQuery,
+    get_tasks_version,
+    load_task_collection,
+    lock_tasks,
+    save_tasks,
+)
+
+
+class AsyncTaskStore:
+    """
+    The tasks of a file for asyncio code, without blocking the event loop.
+
+    File I/O and queries run in a thread pool. Changes are made to the tasks
+    in memory by `apply`, and saved a short `delay` later, so a burst of
+    changes from many clients is written to the file once.
+    """
+
+    def __init__(self, file_path=DEFAULT_TASKS_FILE, delay=0.05, executor=None):
+        """
+        Create a store; nothing is loaded until it is first used.
+
+        Args:
+            file_path (str): Path to the JSON file containing tasks
+            delay (float): Seconds to wait for more changes before saving
+            executor (concurrent.futures.Executor, optional): Where to run
+                file I/O; defaults to the event loop's thread pool
+        """
+        self.file_path = file_path
+        self.delay = delay
+        self.writes = 0
+        self._executor = executor
+        self._tasks = None
+        self._version = None
+        self._changes = 0  # number of changes made
+        self._written = 0  # `_changes` as of the last write
+        self._pending = None  # the delayed write, if one is scheduled
+        self._loading = None  # the first load, while it runs
+        self._write_lock = asyncio.Lock()
+
+    async def _run(self, func, *args):
+        """Run a blocking function in the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args)
+        )
+
+    def _read(self):
+        """Read the tasks and the version of the file they were read at."""
+        with lock_tasks(self.file_path, shared=True):
+            tasks = load_task_collection(self.file_path)
+            return tasks, get_tasks_version(self.file_path)
+
+    def _save(self, tasks, expected_version):
+        """Write the tasks and get the version of the file written."""
+        with lock_tasks(self.file_path):
+            save_tasks(tasks, self.file_path, expected_version)
+            return get_tasks_version(self.file_path)
+
+    async def _loaded(self):
+        """Get the tasks in memory, loading them the first time."""
+        if self._tasks is None:
+            # concurrent first callers share one load
+            if self._loading is None:
+                self._loading = asyncio.ensure_future(self.load())
+            try:
+                await asyncio.shield(self._loading)
+            finally:
+                self._loading = None
+        return self._tasks
+
+    async def load(self):
+        """
+        Read the tasks from the file.
+
+        Changes not saved yet are saved first, or dropped if the file was
+        changed by someone else, so this is also how to recover from a
+        `ConcurrentModificationError`.
+
+        Returns:
+            TaskCollection: A copy-on-write view of the tasks
+        """
+        if self._written != self._changes:
+            with contextlib.suppress(ConcurrentModificationError):
+                await self.save()
+        self._tasks, self._version = await self._run(self._read)
+        self._written = self._changes
+        return self._tasks.copy()
+
+    async def save(self, tasks=None):
+        """
+        Save the tasks now, instead of waiting for the delayed write.
+
+        Args:
+            tasks (Iterable[dict], optional): Tasks to replace the current
+                ones with; by default the tasks in memory are saved
+
+        Raises:
+            ConcurrentModificationError: If the file was changed by someone
+                else since it was read
+        """
+        if tasks is not None:
+            high_water_mark = 0
+            if self._tasks is not None:
+                high_water_mark = self._tasks.high_water_mark
+            self._tasks = TaskCollection(tasks, high_water_mark)
+            self._changes += 1
+        async with self._write_lock:
+            await self._write()
+
+    async def apply(self, mutation):
+        """
+        Change the tasks, and wait until the change is saved.
+
+        Changes from every caller within `delay` of each other are saved
+        together, with a single write.
+
+        Args:
+            mutation (Callable[[TaskCollection], Any]): Changes the tasks it is
+                given in place, e.g. `lambda tasks: complete_where(tasks, [1])`.
+                Use the collection's own methods, so views handed out earlier
+                are left unchanged.
+
+        Returns:
+            Any: What `mutation` returned
+
+        Raises:
+            ConcurrentModificationError: If the file was changed by someone
+                else since it was read
+        """
+        tasks = await self._loaded()
+        result = mutation(tasks)
+        self._changes += 1
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._write_later())
+        # one caller giving up shouldn't cancel the write for everyone else
+        await asyncio.shield(self._pending)
+        return result
+
+    async def _write_later(self):
+        """Save the tasks after `delay`, taking in any changes made meanwhile."""
+        await asyncio.sleep(self.delay)
+        async with self._write_lock:
+            self._pending = None
+            await self._write()
+
+    async def _write(self):
+        """Save the tasks if they changed; the write lock must be held."""
+        if self._written == self._changes:
+            return
+        changes = self._changes
+        self._version = await self._run(self._save, self._tasks.copy(), self._version)
+        self._written = changes
+        self.writes += 1
+
+    async def query(self, query=None):
+        """
+        Run a query in the thread pool and iterate over its results.
+
+        Args:
+            query (TaskQuery, optional): The query; all tasks by default
+
+        Yields:
+            dict: The matching tasks
+        """
+        tasks = (await self._loaded()).copy()
+        results = await self._run((query or TaskQuery()).run, tasks)
+        for i, task in enumerate(results, 1):
+            yield task
+            if i % STREAM_CHUNK_TASKS == 0:
+                # let other clients run during long results
+                await asyncio.sleep(0)
@@ -0,0 +1,325 @@
+"""The `TaskStore` protocol, its in-memory backend and `open_store`."""
+
+import threading
+from typing import Protocol, runtime_checkable
+
+from ..tasks import (
+    JSON_LINES_SUFFIX,
+    ConcurrentModificationError,
+    DueDateIndex,
+    SearchIndex,
+    TaskCollection,
+    TaskQuery,
+    TaskStats,
+    is_json_lines,
+)
+from .shared import (
+    SharedTaskStore,
+    get_shared_store,
+)
+from .sqlite import SQLiteTaskRepository
+
+
+@runtime_checkable
+class TaskStore(Protocol):
+    """
+    Somewhere tasks are kept, such as a file, a database or memory.
+
+    `open_store` opens one by URI. Stores that keep the tasks in memory for
+    the whole process (`SharedTaskStore` and `CachedTaskStore`) also have a
+    `version`: an int that starts at 0 when the tasks are loaded and goes up
+    each time they change. Pass it back to `save` as `expected_version` to
+    make sure nothing changed the tasks in between.
+    """
+
+    def load(self):
+        """
+        Get every task.
+
+        Returns:
+            Iterable[dict]: The tasks
+        """
+
+    def save(self, tasks):
+        """
+        Replace all of the tasks.
+
+        Args:
+            tasks (Iterable[dict]): The new tasks
+        """
+
+    def get(self, task_id):
+        """
+        Look up a task by id.
+
+        Args:
+            task_id (int): The id of the task
+
+        Returns:
+            dict | None: The task, or None if there is no such task
+        """
+
+    def put(self, task):
+        """
+        Add a task, replacing any task with the same id.
+
+        Args:
+            task (dict): The task
+        """
+
+    def delete(self, task_id):
+        """
+        Delete a task by id.
+
+        Args:
+            task_id (int): The id of the task
+        """
+
+    def query(self, query=None):
+        """
+        Run a query over the tasks.
+
+        Args:
+            query (TaskQuery, optional): The query; all tasks by default
+
+        Returns:
+            list[dict]: The matching tasks
+        """
+
+
+class MemoryTaskStore:
+    """
+    Tasks kept in memory only, for tests and benchmarks.
+
+    Tasks are copied on the way in and out, so changing a task that was
+    passed in or handed out doesn't change the store, as with a file.
+    """
+
+    def __init__(self, tasks=()):
+        """
+        Create a store.
+
+        Args:
+            tasks (Iterable[dict]): The initial tasks
+        """
+        self._tasks = TaskCollection(dict(task) for task in tasks)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __iter__(self):
+        return (dict(task) for task in self._tasks)
+
+    def load(self):
+        """
+        Get every task.
+
+        Returns:
+            TaskCollection: Copies of the tasks
+        """
+        return TaskCollection(self, self._tasks.high_water_mark)
+
+    def save(self, tasks):
+        """
+        Replace all of the tasks.
+
+        Args:
+            tasks (Iterable[dict]): The new tasks
+        """
+        high_water_mark = getattr(tasks, "high_water_mark", 0)
+        self._tasks = TaskCollection((dict(task) for task in tasks), high_water_mark)
+
+    def get(self, task_id):
+        """
+        Look up a task by id.
+
+        Args:
+            task_id (int): The id of the task
+
+        Returns:
+            dict | None: A copy of the task, or None if there is no such task
+        """
+        task = self._tasks.get(task_id)
+        return None if task is None else dict(task)
+
+    def put(self, task):
+        """
+        Add a task, replacing any task with the same id.
+
+        Args:
+            task (dict): The task
+        """
+        self._tasks.append(dict(task))
+
+    def delete(self, task_id):
+        """
+        Delete a task by id.
+
+        Args:
+            task_id (int): The id of the task
+        """
+        self._tasks.delete(task_id)
+
+    def query(self, query=None):
+        """
+        Run a query over the tasks.
+
+        Args:
+            query (TaskQuery, optional): The query; all tasks by default
+
+        Returns:
+            list[dict]: Copies of the matching tasks
+        """
+        return [dict(task) for task in (query or TaskQuery()).run(self._tasks)]
+
+    def generate_unique_id(self):
+        """Allocate an id for a new task; see `generate_unique_id`."""
+        return self._tasks.generate_unique_id()
+
+
+class CachedTaskStore(SharedTaskStore):
+    """
+    A `SharedTaskStore` over any `TaskStore`, such as SQLite or memory.
+
+    The tasks are read from the backend once, and changes are written to
+    both the backend and the in-memory copy, so the stats and indexes stay up
+    to date without reloading. Unlike with files, changes made to the backend
+    by anything else are not picked up.
+    """
+
+    def __init__(self, backend):
+        """
+        Wrap a store; nothing is loaded until it is first used.
+
+        Args:
+            backend (TaskStore): The store to read from and write to
+        """
+        super().__init__(file_path=None)
+        self.backend = backend
+
+    def refresh(self):
+        """
+        Load the tasks, the first time.
+
+        Returns:
+            int: The number of changes made since they were loaded
+        """
+        with self._lock:
+            if self._tasks is None:
+                self._load(0)
+            return self._version
+
+    def _load(self, version):
+        """
+        Read the tasks from the backend and rebuild the stats and indexes.
+
+        Args:
+            version (int): The version to mark the tasks as
+        """
+        tasks = self.backend.load()
+        high_water_mark = getattr(tasks, "high_water_mark", 0)
+        self._tasks = TaskCollection(tasks, high_water_mark)
+        self._stats = TaskStats(self._tasks)
+        self._index = SearchIndex(self._tasks)
+        self._due_dates = DueDateIndex(self._tasks)
+        self._version = version
+        self.loads += 1
+
+    def _journal(self, entries):
+        """
+        Write a batch of changes to the backend and the tasks in memory.
+
+        Args:
+            entries (list[dict]): Journal entries; see `replay_journal`
+        """
+        with self._lock:
+            self.refresh()
+            for entry in entries:
+                if entry.get("op") == "delete":
+                    self.backend.delete(entry.get("id"))
+                else:
+                    self.backend.put(entry["task"])
+            self._apply_entries(entries)
+            self._version += 1
+
+    def save(self, tasks, expected_version=None):
+        """
+        Replace all of the tasks.
+
+        Args:
+            tasks (Iterable[dict]): The new tasks
+            expected_version (int, optional): The `version` the tasks were
+                read at
+
+        Raises:
+            ConcurrentModificationError: If the tasks are not at `expected_version`
+        """
+        with self._lock:
+            version = self.refresh()
+            if expected_version is not None and version != expected_version:
+                raise ConcurrentModificationError(
+                    "tasks were modified by another writer"
+                )
+            self.backend.save(tasks)
+            self._load(version + 1)
+
+
+_store_openers = {}
+_memory_stores = {}
+_memory_stores_guard = threading.Lock()
+
+
+def register_store(scheme, opener):
+    """
+    Make a kind of store available to `open_store`.
+
+    Args:
+        scheme (str): The URI scheme, e.g. "sqlite"
+        opener (Callable[[str], TaskStore]): Opens a store given the rest of
+            the URI
+    """
+    _store_openers[scheme] = opener
+
+
+def open_store(uri):
+    """
+    Open a task store by URI.
+
+    `json://` and `jsonl://` give the `SharedTaskStore` for a file path, and
+    `sqlite://` an `SQLiteTaskRepository` for a database path (or
+    ":memory:"). `memory://` gives a `MemoryTaskStore` by name, which is
+    the same store every time the same name is opened.
+
+    Args:
+        uri (str): The URI, e.g. "sqlite://tasks.db"
+
+    Returns:
+        TaskStore: The store
+
+    Raises:
+        ValueError: If the URI has an unknown scheme
+    """
+    scheme, separator, location = uri.partition("://")
+    if not separator or scheme not in _store_openers:
+        raise ValueError(f"Unknown task store: {uri}")
+    return _store_openers[scheme](location)
+
+
+def _open_memory_store(name):
+    with _memory_stores_guard:
+        store = _memory_stores.get(name)
+        if store is None:
+            store = _memory_stores[name] = MemoryTaskStore()
+    return store
+
+
+def _open_json_lines_store(file_path):
+    if not is_json_lines(file_path):
+        raise ValueError(f"JSON lines files must end in {JSON_LINES_SUFFIX}")
+    return get_shared_store(file_path)
+
+
+register_store("json", get_shared_store)
+register_store("jsonl", _open_json_lines_store)
+register_store("sqlite", SQLiteTaskRepository)
+register_store("memory", _open_memory_store)
@@ -0,0 +1,388 @@
+"""A memory-mapped binary snapshot format for tasks."""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import MutableMapping, MutableSequence, Sequence
+from datetime import date, datetime, timedelta
+
+from ..tasks import (
+    STREAM_CHUNK_SIZE,
+    STREAM_CHUNK_TASKS,
+    date_sort_key,
+    timestamp_sort_key,
+    to_json,
+)
+from .compact import (
+    _INTERNED_FIELDS,
+    _TASK_FIELD_SET,
+    _TASK_FIELDS,
+    _parse_iso,
+)
+
+_BINARY_MAGIC = b"TBIN\x00\x00\x00\x01"
+# magic, number of tasks, offset of the string heap
+_BINARY_HEADER = struct.Struct("<8sQQ")
+# id; title, description, priority and category as (heap offset, length);
+# due date as a proleptic ordinal; created_at in seconds since 0001-01-01;
+# completed; a bitmask of the fields present; the task as JSON if irregular
+_BINARY_RECORD = struct.Struct("<qQIQIQIQIiqBHQI")
+_BINARY_STRINGS = {"title": 1, "description": 3, "priority": 5, "category": 7}
+_BINARY_BITS = {field: 1 << i for i, field in enumerate(_TASK_FIELDS)}
+_BINARY_RAW = 1 << 15
+_BINARY_EPOCH = datetime(1, 1, 1)
+
+
+class BinaryTaskSnapshot(Sequence):
+    """
+    A read-only sequence of tasks backed by a memory-mapped binary file.
+
+    The file is a table of fixed-width records followed by a heap of UTF-8
+    strings, so opening it only maps the file, and a task's fields are
+    decoded when they are accessed rather than up front. Tasks that don't
+    fit the record layout (unknown keys, keys out of the usual order, or
+    values of other types or formats) are stored as JSON in the heap, so
+    converting to and from JSON is lossless.
+
+    Written by `save_tasks` for `.tbin` files, and read lazily by
+    `open_tasks`.
+    """
+
+    def __init__(self, file_path):
+        """
+        Map a binary snapshot.
+
+        Args:
+            file_path (str): Path to the snapshot
+
+        Raises:
+            ValueError: If the file is not a binary snapshot
+        """
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _BINARY_HEADER.size:
+                raise ValueError(f"{file_path} is not a binary task snapshot")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, self._heap = _BINARY_HEADER.unpack_from(self._map)
+        if magic != _BINARY_MAGIC:
+            self._map.close()
+            raise ValueError(f"{file_path} is not a binary task snapshot")
+
+    def close(self):
+        """Unmap the file; tasks from the snapshot can't be read afterwards."""
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("task index out of range")
+        offset = _BINARY_HEADER.size + index * _BINARY_RECORD.size
+        return BinaryTask(self, _BINARY_RECORD.unpack_from(self._map, offset))
+
+    def __iter__(self):
+        for start in range(0, self._count, STREAM_CHUNK_TASKS):
+            offset = _BINARY_HEADER.size + start * _BINARY_RECORD.size
+            end = offset + min(STREAM_CHUNK_TASKS, self._count - start) * (
+                _BINARY_RECORD.size
+            )
+            for record in _BINARY_RECORD.iter_unpack(self._map[offset:end]):
+                yield BinaryTask(self, record)
+
+    def _string(self, offset, length):
+        """Decode a string from the heap."""
+        start = self._heap + offset
+        return self._map[start : start + length].decode("utf-8", "surrogatepass")
+
+
+class BinaryTaskList(MutableSequence):
+    """
+    The tasks of a `BinaryTaskSnapshot` as a list, as given by `open_tasks`.
+
+    Tasks are read from the snapshot the first time they are accessed, so
+    loading costs next to nothing up front, and the same task object is
+    returned each time so changes to it stick. Closing the list unmaps the
+    snapshot.
+    """
+
+    def __init__(self, snapshot):
+        """
+        Wrap a snapshot.
+
+        Args:
+            snapshot (BinaryTaskSnapshot): The snapshot to read from
+        """
+        self._snapshot = snapshot
+        self._tasks = [None] * len(snapshot)  # None until read
+        self._unread = len(snapshot)
+
+    def close(self):
+        """Close the snapshot; tasks not yet changed can't be read afterwards."""
+        self._snapshot.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _list(self):
+        """Read every task, e.g. before the list is rearranged."""
+        if self._unread:
+            for i, task in enumerate(self._snapshot):
+                if self._tasks[i] is None:
+                    self._tasks[i] = task
+            self._unread = 0
+        return self._tasks
+
+    def _read(self, index):
+        task = self._tasks[index]
+        if task is None:
+            task = self._tasks[index] = self._snapshot[index]
+            self._unread -= 1
+        return task
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._read(i) for i in range(*index.indices(len(self)))]
+        return self._read(index)
+
+    def __iter__(self):
+        if not self._unread:
+            return iter(self._tasks)
+        return self._iter_unread()
+
+    def _iter_unread(self):
+        for i, task in enumerate(self._snapshot):
+            if i >= len(self._tasks) or self._unread == 0:
+                # read fully or rearranged part way through
+                yield from self._tasks[i:]
+                return
+            if self._tasks[i] is None:
+                self._tasks[i] = task
+                self._unread -= 1
+            yield self._tasks[i]
+
+    def __setitem__(self, index, value):
+        self._list()[index] = value
+
+    def __delitem__(self, index):
+        del self._list()[index]
+
+    def insert(self, index, value):
+        self._list().insert(index, value)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, (str, bytes)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"BinaryTaskList({list(self)!r})"
+
+    def copy(self):
+        """
+        Copy the list; the tasks themselves are shared.
+
+        Returns:
+            list: The tasks
+        """
+        return list(self._list())
+
+
+class BinaryTask(MutableMapping):
+    """
+    A task in a `BinaryTaskSnapshot`, decoded one field at a time.
+
+    Changing the task first copies it into a plain dictionary, leaving the
+    snapshot untouched.
+    """
+
+    __slots__ = ("_snapshot", "_record", "_data")
+
+    def __init__(self, snapshot, record):
+        """
+        Wrap a task's record.
+
+        Args:
+            snapshot (BinaryTaskSnapshot): The snapshot holding the task
+            record (tuple): The task's unpacked record
+        """
+        self._snapshot = snapshot
+        self._record = record
+        self._data = None  # the whole task, once changed or if irregular
+        if record[12] & _BINARY_RAW:
+            self._data = json.loads(snapshot._string(*record[13:]))
+
+    def _materialize(self):
+        """Copy the task into a dictionary, e.g. before changing it."""
+        if self._data is None:
+            self._data = dict(self.items())
+        return self._data
+
+    def __getitem__(self, key):
+        if self._data is not None:
+            return self._data[key]
+
+        record = self._record
+        if not record[12] & _BINARY_BITS.get(key, 0):
+            raise KeyError(key)
+
+        if key == "id":
+            return record[0]
+        if key == "completed":
+            return bool(record[11])
+        if key == "due_date":
+            return date.fromordinal(record[9]).isoformat()
+        if key == "created_at":
+            created_at = _BINARY_EPOCH + timedelta(seconds=record[10])
+            return created_at.isoformat(" ")
+        i = _BINARY_STRINGS[key]
+        return self._snapshot._string(record[i], record[i + 1])
+
+    def __iter__(self):
+        if self._data is not None:
+            return iter(self._data)
+        present = self._record[12]
+        return (field for field, bit in _BINARY_BITS.items() if present & bit)
+
+    def __len__(self):
+        if self._data is not None:
+            return len(self._data)
+        return self._record[12].bit_count()
+
+    def __setitem__(self, key, value):
+        self._materialize()[key] = value
+
+    def __delitem__(self, key):
+        del self._materialize()[key]
+
+    def __repr__(self):
+        return f"BinaryTask({dict(self)!r})"
+
+    def copy(self):
+        """
+        Copy the task.
+
+        Returns:
+            dict: The task as a dictionary
+        """
+        return dict(self)
+
+
+def write_binary(tasks, f):
+    """
+    Write tasks as a binary snapshot; see `BinaryTaskSnapshot`.
+
+    Args:
+        tasks (Iterable[dict]): The tasks to write
+        f (BinaryIO): The file to write to, which must be seekable
+    """
+    f.write(_BINARY_HEADER.pack(_BINARY_MAGIC, 0, 0))
+    interned = {}
+    count = 0
+
+    # the heap goes after the records, so it is collected separately first
+    with tempfile.SpooledTemporaryFile(64 * 1024 * 1024) as heap:
+
+        def add_string(value, intern=False):
+            if intern and value in interned:
+                return interned[value]
+            data = value.encode("utf-8", "surrogatepass")
+            location = (heap.tell(), len(data))
+            heap.write(data)
+            if intern:
+                interned[value] = location
+            return location
+
+        records = []
+        for task in tasks:
+            records.append(_binary_record(task, add_string))
+            count += 1
+            if len(records) >= STREAM_CHUNK_TASKS:
+                f.write(b"".join(records))
+                records.clear()
+        f.write(b"".join(records))
+
+        heap_offset = f.tell()
+        heap.seek(0)
+        while chunk := heap.read(STREAM_CHUNK_SIZE):
+            f.write(chunk)
+
+    f.seek(0)
+    f.write(_BINARY_HEADER.pack(_BINARY_MAGIC, count, heap_offset))
+    f.seek(0, os.SEEK_END)
+
+
+def _binary_record(task, add_string):
+    """
+    Pack a task into a binary snapshot record.
+
+    Args:
+        task (dict): The task
+        add_string (Callable): Adds a string to the heap, returning its
+            (offset, length); interned if the second argument is true
+
+    Returns:
+        bytes: The record
+    """
+    values = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, False, 0, 0, 0]
+    present = 0
+    last = -1
+
+    for key, value in task.items():
+        i = _TASK_FIELDS.index(key) if key in _TASK_FIELD_SET else -1
+        if i <= last:
+            break
+        last = i
+
+        if key == "id":
+            if type(value) is not int or not -(2**63) <= value < 2**63:
+                break
+            values[0] = value
+        elif key in _BINARY_STRINGS:
+            if type(value) is not str:
+                break
+            j = _BINARY_STRINGS[key]
+            values[j : j + 2] = add_string(value, key in _INTERNED_FIELDS)
+        elif key == "due_date":
+            parsed = _parse_iso(value, date_sort_key, date)
+            if not isinstance(parsed, date) or parsed.isoformat() != value:
+                break
+            values[9] = parsed.toordinal()
+        elif key == "created_at":
+            parsed = _parse_iso(value, timestamp_sort_key, datetime)
+            if not isinstance(parsed, datetime) or parsed.isoformat(" ") != value:
+                break
+            values[10] = (parsed - _BINARY_EPOCH) // timedelta(seconds=1)
+        elif type(value) is bool:
+            values[11] = value
+        else:
+            break
+
+        present |= 1 << i
+    else:
+        values[12] = present
+        return _BINARY_RECORD.pack(*values)
+
+    # doesn't fit the record layout; keep the whole task as JSON
+    values = [0] * 15
+    values[12] = _BINARY_RAW
+    values[13:] = add_string(json.dumps(task, default=to_json))
+    return _BINARY_RECORD.pack(*values)
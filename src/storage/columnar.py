@@ -0,0 +1,312 @@
+"""Column-per-field task storage on NumPy arrays, for analytics."""
+
+from datetime import datetime
+
+from ..tasks import (
+    date_sort_key,
+    is_overdue,
+    sort_tasks,
+    timestamp_sort_key,
+)
+from .compact import _TASK_FIELD_SET
+
+# only needed for ColumnarTaskStore, so imported by it; see `_import_numpy`
+np = None
+
+
+def _import_numpy():
+    """
+    Import NumPy on first use, as it takes longer than the rest of this module.
+
+    Returns:
+        bool: Whether NumPy is available.
+    """
+    global np
+    if np is None:
+        try:
+            import numpy as np
+        except ImportError:
+            return False
+    return True
+
+
+class ColumnarTaskStore:
+    """
+    Tasks stored as NumPy arrays, one per field.
+
+    Priorities and categories are stored as integer codes, completion as a
+    boolean array and dates as `datetime64`, so filters become boolean masks,
+    stats become `np.count_nonzero` and sorting becomes `argsort`. Results are
+    converted back to task dictionaries only when they are returned. Values
+    that don't fit a column (e.g. a non-integer id or a date that isn't in
+    ISO format) are kept per task in `extras`, so conversion is lossless.
+
+    Requires NumPy.
+    """
+
+    def __init__(self, tasks=()):
+        """
+        Convert tasks to columns.
+
+        Args:
+            tasks (Iterable[dict]): The tasks
+        """
+        if not _import_numpy():
+            raise ImportError("ColumnarTaskStore requires numpy")
+
+        self.priorities = []
+        self.categories = []
+        self._irregular_keys = set()
+        priority_codes = {}
+        category_codes = {}
+
+        ids, has_id = [], []
+        titles, descriptions = [], []
+        priorities, categories = [], []
+        completed, has_completed = [], []
+        due_dates, created_ats = [], []
+        extras = []
+
+        for task in tasks:
+            extra = {}
+            if not task.keys() <= _TASK_FIELD_SET:
+                extra = {
+                    key: value
+                    for key, value in task.items()
+                    if key not in _TASK_FIELD_SET
+                }
+
+            task_id = task.get("id")
+            has_id.append(type(task_id) is int)
+            ids.append(task_id if has_id[-1] else 0)
+            if "id" in task and not has_id[-1]:
+                extra["id"] = task_id
+
+            for column, key in ((titles, "title"), (descriptions, "description")):
+                value = task.get(key)
+                column.append(value if isinstance(value, str) else None)
+                if key in task and column[-1] is None:
+                    extra[key] = value
+
+            for column, key, names, codes in (
+                (priorities, "priority", self.priorities, priority_codes),
+                (categories, "category", self.categories, category_codes),
+            ):
+                value = task.get(key)
+                if isinstance(value, str):
+                    if value not in codes:
+                        codes[value] = len(names)
+                        names.append(value)
+                    column.append(codes[value])
+                else:
+                    column.append(-1)
+                    if key in task:
+                        extra[key] = value
+
+            value = task.get("completed", False)
+            # truthy values count as completed, as in `get_task_stats`
+            completed.append(bool(value))
+            has_completed.append(type(value) is bool and "completed" in task)
+            if "completed" in task and type(value) is not bool:
+                extra["completed"] = value
+
+            for column, key, sort_key in (
+                (due_dates, "due_date", date_sort_key),
+                (created_ats, "created_at", timestamp_sort_key),
+            ):
+                value = task.get(key)
+                try:
+                    column.append(sort_key(value))
+                except (TypeError, ValueError):
+                    column.append("NaT")
+                if key in task and column[-1] != value:
+                    extra[key] = value
+
+            extras.append(extra or None)
+            self._irregular_keys.update(extra)
+
+        self.id = np.array(ids, dtype=np.int64)
+        self.has_id = np.array(has_id, dtype=bool)
+        self.title = np.array(titles, dtype=object)
+        self.description = np.array(descriptions, dtype=object)
+        self.priority = np.array(priorities, dtype=np.int32)
+        self.category = np.array(categories, dtype=np.int32)
+        self.completed = np.array(completed, dtype=bool)
+        self.has_completed = np.array(has_completed, dtype=bool)
+        self.due_date = np.array(due_dates, dtype="datetime64[D]")
+        self.created_at = np.array(created_ats, dtype="datetime64[s]")
+        self.extras = np.array(extras + [None], dtype=object)[:-1]
+
+    def __len__(self):
+        return len(self.id)
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    def to_dicts(self, indices=None):
+        """
+        Convert tasks back to dictionaries.
+
+        Args:
+            indices (np.ndarray, optional): Positions of the tasks to convert.
+                Defaults to all tasks.
+
+        Returns:
+            list[dict]: The tasks
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+
+        columns = zip(
+            self.id[indices].tolist(),
+            self.has_id[indices].tolist(),
+            self.title[indices].tolist(),
+            self.description[indices].tolist(),
+            self.priority[indices].tolist(),
+            self.category[indices].tolist(),
+            self.due_date[indices].tolist(),
+            self.completed[indices].tolist(),
+            self.has_completed[indices].tolist(),
+            self.created_at[indices].tolist(),
+            self.extras[indices].tolist(),
+        )
+
+        tasks = []
+        for (
+            task_id,
+            has_id,
+            title,
+            description,
+            priority,
+            category,
+            due_date,
+            completed,
+            has_completed,
+            created_at,
+            extra,
+        ) in columns:
+            task = {}
+            if has_id:
+                task["id"] = task_id
+            if title is not None:
+                task["title"] = title
+            if description is not None:
+                task["description"] = description
+            if priority >= 0:
+                task["priority"] = self.priorities[priority]
+            if category >= 0:
+                task["category"] = self.categories[category]
+            if due_date is not None:
+                task["due_date"] = due_date.isoformat()
+            if has_completed:
+                task["completed"] = completed
+            if created_at is not None:
+                task["created_at"] = created_at.isoformat(sep=" ")
+            if extra is not None:
+                task.update(extra)
+            tasks.append(task)
+
+        return tasks
+
+    def _code_mask(self, column, names, value):
+        """Mask of tasks whose coded `column` equals `value`."""
+        if value not in names:
+            return np.zeros(len(self), dtype=bool)
+        return column == names.index(value)
+
+    def incomplete_mask(self):
+        """Mask of tasks that aren't completed."""
+        return ~self.completed
+
+    def overdue_mask(self):
+        """Mask of incomplete tasks that are past their due date."""
+        today = np.datetime64(datetime.now().date(), "D")
+        return self.incomplete_mask() & (self.due_date < today)
+
+    def filter_tasks_by_priority(self, priority):
+        """Columnar implementation of `filter_tasks_by_priority`."""
+        mask = self._code_mask(self.priority, self.priorities, priority)
+        return self.to_dicts(np.flatnonzero(mask))
+
+    def filter_tasks_by_category(self, category):
+        """Columnar implementation of `filter_tasks_by_category`."""
+        mask = self._code_mask(self.category, self.categories, category)
+        return self.to_dicts(np.flatnonzero(mask))
+
+    def filter_tasks_by_completion(self, completed=True):
+        """Columnar implementation of `filter_tasks_by_completion`."""
+        mask = self.has_completed & (self.completed == completed)
+        if "completed" in self._irregular_keys:
+            # values that aren't bools (e.g. 1 or 0) are compared like the list
+            for index in np.flatnonzero(~self.has_completed):
+                extra = self.extras[index] or {}
+                mask[index] = extra.get("completed") == completed
+        return self.to_dicts(np.flatnonzero(mask))
+
+    def get_overdue_tasks(self):
+        """Columnar implementation of `get_overdue_tasks`."""
+        today = datetime.now().date().isoformat()
+        # due dates that couldn't be parsed go through `is_overdue` to warn
+        for extra in self.extras[self.incomplete_mask() & np.isnat(self.due_date)]:
+            if extra is not None:
+                is_overdue(extra, today)
+        return self.to_dicts(np.flatnonzero(self.overdue_mask()))
+
+    def get_task_stats(self):
+        """Columnar implementation of `get_task_stats`."""
+        complete = int(np.count_nonzero(self.completed))
+        overdue = int(np.count_nonzero(self.overdue_mask()))
+        return len(self), len(self) - complete, complete, overdue
+
+    def sort_tasks(self, sort_by, asc=True, limit=None):
+        """Columnar implementation of `sort_tasks`, for single column keys."""
+        column = None
+        if not isinstance(sort_by, (list, tuple)):
+            column = self._sort_column(sort_by)
+        if column is None:
+            return sort_tasks(self.to_dicts(), sort_by, asc, limit)
+
+        values, present = column
+        present_indices = np.flatnonzero(present)
+        values = values[present_indices]
+
+        if asc:
+            order = np.argsort(values, kind="stable")
+        else:
+            # reverse, stable sort and reverse again to keep ties in order
+            order = len(values) - 1 - np.argsort(values[::-1], kind="stable")[::-1]
+
+        # tasks missing the key go last, in their original order
+        indices = np.concatenate([present_indices[order], np.flatnonzero(~present)])
+        return self.to_dicts(indices[:limit])
+
+    def _sort_column(self, sort_by):
+        """
+        Get the values and presence mask to sort by `sort_by`.
+
+        Args:
+            sort_by: The key in the tasks to sort by.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] | None: The values and the mask of
+                tasks that have the key, or None if the key can't be sorted
+                using the columns
+        """
+        if sort_by in self._irregular_keys:
+            return None
+
+        if sort_by == "id":
+            return self.id, self.has_id
+        if sort_by == "due_date":
+            return self.due_date, ~np.isnat(self.due_date)
+        if sort_by == "created_at":
+            return self.created_at, ~np.isnat(self.created_at)
+        if sort_by == "completed":
+            return self.completed, self.has_completed
+        if sort_by in ("priority", "category"):
+            names = self.priorities if sort_by == "priority" else self.categories
+            codes = getattr(self, sort_by)
+            # rank of each code when the names are sorted alphabetically
+            ranks = np.argsort(np.argsort(np.array(names + [""], dtype=object)))
+            return ranks[codes], codes >= 0
+        return None
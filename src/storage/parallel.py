@@ -0,0 +1,274 @@
+"""Scans of large task files, sharded across processes."""
+
+import contextlib
+import json
+import mmap
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from ..tasks import (
+    DEFAULT_TASKS_FILE,
+    JSON_LINES_SUFFIX,
+    get_journal_path,
+    get_task_stats,
+    is_json_lines,
+    is_overdue,
+    iter_tasks,
+    write_json_lines,
+)
+
+PARALLEL_THRESHOLD = 200_000
+
+
+class ParallelTaskScan:
+    """
+    Tasks spread over a pool of worker processes for full scans.
+
+    The tasks are kept as a JSON lines file that every worker memory-maps,
+    so only byte ranges go to the workers, and only the lines of matching
+    tasks (or partial counts) come back, instead of pickling every task.
+    Each worker parses and checks its own shard; the results are merged in
+    order, so they match the plain functions.
+
+    Below `PARALLEL_THRESHOLD` tasks, or with one worker, scans run in this
+    process instead. Whether workers pay off depends on the machine; the
+    parallel table in tests/benchmark.py measures it.
+    """
+
+    def __init__(self, tasks=(), workers=None):
+        """
+        Write tasks to a temporary JSON lines file for the workers to read.
+
+        Args:
+            tasks (Iterable[dict]): The tasks
+            workers (int, optional): The number of worker processes.
+                Defaults to the number of CPUs.
+        """
+        fd, path = tempfile.mkstemp(suffix=JSON_LINES_SUFFIX)
+        with os.fdopen(fd, "w") as f:
+            write_json_lines(tasks, f)
+        self._init(path, workers, owns_file=True)
+
+    @classmethod
+    def from_file(cls, file_path=DEFAULT_TASKS_FILE, workers=None):
+        """
+        Scan the tasks in a tasks file.
+
+        A JSON lines file without a journal is mapped directly; anything
+        else is streamed into a temporary JSON lines file first.
+
+        Args:
+            file_path (str): Path to the tasks file
+            workers (int, optional): The number of worker processes
+
+        Returns:
+            ParallelTaskScan: The scan
+        """
+        if is_json_lines(file_path) and not os.path.exists(get_journal_path(file_path)):
+            scan = object.__new__(cls)
+            scan._init(file_path, workers, owns_file=False)
+            return scan
+        return cls(iter_tasks(file_path), workers)
+
+    def _init(self, path, workers, owns_file):
+        self.path = path
+        self.workers = workers or os.cpu_count() or 1
+        self._owns_file = owns_file
+        self._executor = None
+
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:  # empty files can't be mapped
+                self._map = b""
+        self._shards = self._split(self.workers * 4)
+        # tasks, not newlines: blank lines are skipped like in `load_tasks`
+        self._count = sum(
+            sum(1 for line in self._map[start:end].split(b"\n") if line.strip())
+            for start, end in self._shards
+        )
+
+    def close(self):
+        """Stop the workers and remove the temporary file, if there is one."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        if self._owns_file:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path)
+            self._owns_file = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for start, end in self._shards:
+            yield from map(json.loads, _read_lines(self._map, start, end))
+
+    def _split(self, count):
+        """
+        Split the file into byte ranges that start and end on line boundaries.
+
+        Args:
+            count (int): The number of ranges to aim for
+
+        Returns:
+            list[tuple[int, int]]: The (start, end) byte ranges
+        """
+        size = len(self._map)
+        shards = []
+        start = 0
+        for i in range(1, count + 1):
+            end = self._map.find(b"\n", size * i // count) + 1
+            end = size if i == count or end == 0 else max(end, start)
+            if end > start:
+                shards.append((start, end))
+            start = end
+        return shards
+
+    def _scan(self, op, arg=None):
+        """
+        Run `_scan_shard` over every shard, in parallel for large inputs.
+
+        Args:
+            op (str): The operation; see `_scan_shard`
+            arg: The operation's argument
+
+        Returns:
+            list: The result for each shard, in order. When run in this
+                process, filters return the matching tasks already parsed.
+        """
+        if not self._shards:
+            return []
+        if self._count < PARALLEL_THRESHOLD or self.workers == 1:
+            return [_scan_shard(self.path, 0, len(self._map), op, arg, parse=True)]
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        futures = [
+            self._executor.submit(_scan_shard, self.path, start, end, op, arg)
+            for start, end in self._shards
+        ]
+        return [future.result() for future in futures]
+
+    def _matching(self, op, arg=None):
+        """
+        Get the tasks a filtering operation matches.
+
+        Args:
+            op (str): The operation; see `_scan_shard`
+            arg: The operation's argument
+
+        Returns:
+            list[dict]: The matching tasks, in file order
+        """
+        return [
+            json.loads(task) if isinstance(task, str) else task
+            for shard in self._scan(op, arg)
+            for task in shard
+        ]
+
+    def filter_tasks_by_priority(self, priority):
+        """`filter_tasks_by_priority`, scanning shards in parallel."""
+        return self._matching("priority", priority)
+
+    def filter_tasks_by_category(self, category):
+        """`filter_tasks_by_category`, scanning shards in parallel."""
+        return self._matching("category", category)
+
+    def filter_tasks_by_completion(self, completed=True):
+        """`filter_tasks_by_completion`, scanning shards in parallel."""
+        return self._matching("completed", completed)
+
+    def search_tasks(self, query):
+        """`search_tasks`, scanning shards in parallel."""
+        return self._matching("search", query.lower())
+
+    def get_overdue_tasks(self):
+        """`get_overdue_tasks`, scanning shards in parallel."""
+        return self._matching("overdue", datetime.now().date().isoformat())
+
+    def get_task_stats(self):
+        """`get_task_stats`, counting shards in parallel."""
+        return tuple(map(sum, zip((0, 0, 0, 0), *self._scan("stats"))))
+
+
+def _read_lines(data, start, end):
+    """
+    Get the non-blank lines in a byte range of a buffer.
+
+    Args:
+        data (bytes | mmap.mmap): The buffer
+        start (int): The start of the range, at the start of a line
+        end (int): The end of the range, at the end of a line
+
+    Returns:
+        list[str]: The lines
+    """
+    # one decode and split is much faster than handling each line separately
+    return [line for line in data[start:end].decode().split("\n") if line.strip()]
+
+
+def _scan_predicate(op, arg):
+    """
+    Get the condition checked by a filtering operation of `_scan_shard`.
+
+    Args:
+        op (str): The operation
+        arg: The operation's argument
+
+    Returns:
+        Callable[[dict], bool]: The condition
+    """
+    if op in ("priority", "category", "completed"):
+        return lambda task: task.get(op) == arg
+    if op == "search":
+        return lambda task: (
+            arg in task.get("title", "").lower()
+            or arg in task.get("description", "").lower()
+        )
+    if op == "overdue":
+        return lambda task: is_overdue(task, arg)
+    raise ValueError(f"Unknown scan operation: {op}")
+
+
+def _scan_shard(path, start, end, op, arg, parse=False):
+    """
+    Scan one shard of a JSON lines file; run in the worker processes.
+
+    Args:
+        path (str): Path to the JSON lines file
+        start (int): The start of the shard, in bytes
+        end (int): The end of the shard, in bytes
+        op (str): "stats", or a filter: "priority", "category", "completed",
+            "search" or "overdue"
+        arg: The operation's argument (the value to match, the lowercase
+            search query or today's date)
+        parse (bool): Return matching tasks as dictionaries instead of as JSON
+            lines, which are cheaper to send between processes
+
+    Returns:
+        tuple | list: The `get_task_stats` counts for "stats", otherwise the
+            matching tasks
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            lines = _read_lines(data, start, end)
+
+    if op == "stats":
+        return get_task_stats(map(json.loads, lines))
+
+    matches = _scan_predicate(op, arg)
+    if parse:
+        return [task for task in map(json.loads, lines) if matches(task)]
+    return [line for line in lines if matches(json.loads(line))]
@@ -0,0 +1,416 @@
+"""One in-memory copy of the tasks, shared by every session in the process."""
+
+import json
+import os
+import threading
+
+from ..tasks import (
+    DEFAULT_TASKS_FILE,
+    ConcurrentModificationError,
+    DueDateIndex,
+    TaskQuery,
+    TaskStats,
+    append_journal_entries,
+    bulk_import,
+    delete_where,
+    get_journal_path,
+    get_tasks_version,
+    load_search_index,
+    load_task_collection,
+    lock_tasks,
+    save_tasks,
+    update_where,
+)
+
+
+class SharedTaskStore:
+    """
+    One in-memory copy of a tasks file, shared by everything in the process.
+
+    The file is parsed once. After that, `refresh` only stats the snapshot
+    and journal; if just the journal has grown, the new entries are applied
+    to the tasks, stats, search index and due date index in place, and only
+    a new snapshot causes a full reload. Callers get cheap copy-on-write
+    views of the tasks from `view`, and change the file through the store's
+    own methods.
+
+    The store can be passed as the index of `search_tasks`,
+    `get_overdue_tasks`, `get_tasks_due_between` and `get_next_due_tasks`.
+    The tasks then come in the index's order (best match first, or earliest
+    due date first) rather than in the order of the tasks, which is what
+    `search_tasks` and `get_overdue_tasks` give without an index.
+    `TaskQuery.search` and `TaskQuery.due_between` only use the index to pick
+    tasks, so they keep the order of the tasks.
+    """
+
+    def __init__(self, file_path=DEFAULT_TASKS_FILE):
+        """
+        Create a store; nothing is loaded until it is first used.
+
+        Args:
+            file_path (str): Path to the JSON file containing tasks
+        """
+        self.file_path = file_path
+        self.loads = 0
+        self._lock = threading.RLock()
+        self._version = None
+        self._file_version = None
+        self._journal_offset = 0
+        self._tasks = None
+        self._stats = None
+        self._index = None
+        self._due_dates = None
+
+    @property
+    def version(self):
+        """int: How many times the tasks have changed since they were loaded."""
+        return self._version
+
+    def refresh(self):
+        """
+        Bring the in-memory tasks up to date with the file.
+
+        Returns:
+            int: The version of the tasks now in memory
+        """
+        with self._lock:
+            if self._file_version == get_tasks_version(self.file_path):
+                return self._version
+
+            with lock_tasks(self.file_path, shared=True):
+                file_version = get_tasks_version(self.file_path)
+                if self._journal_grew(file_version):
+                    self._apply_journal(file_version[1][2])
+                else:
+                    self._load(file_version)
+                self._file_version = file_version
+                self._version = 0 if self._version is None else self._version + 1
+
+            return self._version
+
+    def _journal_grew(self, file_version):
+        """
+        Check whether the only change since the last refresh is appended entries.
+
+        Args:
+            file_version (tuple): The current `get_tasks_version` of the file
+
+        Returns:
+            bool: True if the new journal entries can be applied incrementally
+        """
+        if self._file_version is None or file_version[0] != self._file_version[0]:
+            return False
+
+        old_journal, journal = self._file_version[1], file_version[1]
+        if journal is None:
+            return False
+        if old_journal is not None and old_journal[0] != journal[0]:
+            return False
+        return journal[2] >= self._journal_offset
+
+    def _load(self, file_version):
+        """
+        Parse the whole file and rebuild the stats and search index.
+
+        Args:
+            file_version (tuple): The current `get_tasks_version` of the file
+        """
+        self._tasks = load_task_collection(self.file_path)
+        self._stats = TaskStats(self._tasks)
+        self._index = load_search_index(self._tasks, self.file_path)
+        self._due_dates = DueDateIndex(self._tasks)
+        self._journal_offset = file_version[1][2] if file_version[1] else 0
+        self.loads += 1
+
+    def _apply_journal(self, journal_size):
+        """
+        Apply the journal entries written since the last refresh.
+
+        Args:
+            journal_size (int): The current size of the journal
+        """
+        with open(get_journal_path(self.file_path), "rb") as f:
+            f.seek(self._journal_offset)
+            entries = f.read(journal_size - self._journal_offset)
+
+        # leave an entry that is still being written for next time
+        entries = entries[: entries.rfind(b"\n") + 1]
+        self._journal_offset += len(entries)
+
+        parsed = []
+        for line in entries.splitlines():
+            try:
+                parsed.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        self._apply_entries(parsed)
+
+    def _apply_entries(self, entries):
+        """
+        Apply changes to the tasks, stats, search index and due date index.
+
+        Args:
+            entries (Iterable[dict]): Journal entries; see `replay_journal`
+        """
+        for entry in entries:
+            if entry.get("op") == "delete":
+                task_id = entry.get("id")
+                old = self._tasks.delete(task_id)
+                self._index.remove(task_id)
+                self._due_dates.remove(task_id)
+            else:
+                task = entry["task"]
+                old = self._tasks.get(task.get("id"))
+                self._tasks.append(task)
+                self._index.add(task)
+                self._due_dates.add(task)
+                self._stats.add(task)
+
+            if old is not None:
+                self._stats.remove(old)
+
+    def view(self):
+        """
+        Get the current tasks.
+
+        Returns:
+            TaskCollection: A copy-on-write view of the tasks; changing it
+                doesn't change the store
+        """
+        with self._lock:
+            self.refresh()
+            return self._tasks.copy()
+
+    def generate_unique_id(self):
+        """Allocate an id for a new task; see `generate_unique_id`."""
+        with self._lock:
+            self.refresh()
+            return self._tasks.generate_unique_id()
+
+    def get_task_stats(self):
+        """`get_task_stats` from the incrementally maintained `TaskStats`."""
+        with self._lock:
+            self.refresh()
+            return self._stats.get_task_stats()
+
+    def search(self, query, limit=None):
+        """
+        Search the tasks with the shared `SearchIndex`; see `SearchIndex.search`.
+
+        Passing the store as the index of `search_tasks` or `TaskQuery.search`
+        uses this.
+
+        Args:
+            query (str): The search query
+            limit (int, optional): The maximum number of ids to return
+
+        Returns:
+            list[int]: The ids of the matching tasks, best match first
+        """
+        with self._lock:
+            self.refresh()
+            return self._index.search(query, limit)
+
+    def overdue(self):
+        """
+        Get the overdue tasks from the shared `DueDateIndex`.
+
+        Passing the store as the index of `get_overdue_tasks` uses this.
+
+        Returns:
+            list[int]: The task ids, earliest due date first
+        """
+        with self._lock:
+            self.refresh()
+            return self._due_dates.overdue()
+
+    def due_between(self, start, end):
+        """`DueDateIndex.due_between` on the shared index."""
+        with self._lock:
+            self.refresh()
+            return self._due_dates.due_between(start, end)
+
+    def next_due(self, n):
+        """`DueDateIndex.next_due` on the shared index."""
+        with self._lock:
+            self.refresh()
+            return self._due_dates.next_due(n)
+
+    def load(self):
+        """`view`, for the `TaskStore` protocol."""
+        return self.view()
+
+    def get(self, task_id):
+        """
+        Look up a task by id.
+
+        Args:
+            task_id (int): The id of the task
+
+        Returns:
+            dict | None: The task, or None if there is no such task
+        """
+        with self._lock:
+            self.refresh()
+            return self._tasks.get(task_id)
+
+    def query(self, query=None):
+        """
+        Run a query over the current tasks.
+
+        Args:
+            query (TaskQuery, optional): The query; all tasks by default
+
+        Returns:
+            list[dict]: The matching tasks
+        """
+        return (query or TaskQuery()).run(self.view())
+
+    def add(self, task):
+        """
+        Add a task.
+
+        Args:
+            task (dict): The new task
+        """
+        self._journal([{"op": "add", "task": task}])
+
+    def update(self, task):
+        """
+        Replace a task with a modified version.
+
+        Args:
+            task (dict): The task, after modification
+        """
+        self._journal([{"op": "update", "task": task}])
+
+    put = update
+
+    def toggle(self, task_id):
+        """
+        Flip the completion status of a task.
+
+        Args:
+            task_id (int): The id of the task
+
+        Returns:
+            dict: The modified task
+
+        Raises:
+            KeyError: If there is no such task
+        """
+        with self._lock:
+            self.refresh()
+            task = self._tasks.get(task_id)
+            if task is None:
+                raise KeyError(task_id)
+            task = task.copy()
+            task["completed"] = not task.get("completed", False)
+            self.update(task)
+            return task
+
+    def delete(self, task_id):
+        """
+        Delete a task.
+
+        Args:
+            task_id (int): The id of the task
+        """
+        self._journal([{"op": "delete", "id": task_id}])
+
+    def update_where(self, where, fields):
+        """`update_where`, saved with a single journal write."""
+        with self._lock:
+            updated = update_where(self.view(), where, fields)
+            self._journal([{"op": "update", "task": task} for task in updated])
+            return updated
+
+    def delete_where(self, where):
+        """`delete_where`, saved with a single journal write."""
+        with self._lock:
+            deleted = delete_where(self.view(), where)
+            self._journal(
+                [
+                    {"op": "delete", "id": task["id"]}
+                    for task in deleted
+                    if task.get("id") is not None
+                ]
+            )
+            return deleted
+
+    def bulk_import(self, tasks):
+        """`bulk_import`, saved with a single journal write."""
+        with self._lock:
+            imported = bulk_import(self.view(), tasks)
+            self._journal([{"op": "add", "task": task} for task in imported])
+            return imported
+
+    def _journal(self, entries):
+        """
+        Journal a batch of changes and pick them up.
+
+        Args:
+            entries (list[dict]): The journal entries
+        """
+        append_journal_entries(entries, self.file_path)
+        self.refresh()
+
+    def save(self, tasks, expected_version=None):
+        """
+        Replace all of the tasks; see `save_tasks`.
+
+        Args:
+            tasks (Iterable[dict]): The new tasks
+            expected_version (int, optional): The `version` the tasks were
+                read at
+
+        Raises:
+            ConcurrentModificationError: If the tasks are not at `expected_version`
+        """
+        with self._lock:
+            if expected_version is None:
+                save_tasks(tasks, self.file_path)
+            elif self.refresh() != expected_version:
+                raise ConcurrentModificationError(
+                    "tasks were modified by another writer"
+                )
+            else:
+                save_tasks(tasks, self.file_path, self._file_version)
+            self.refresh()
+
+
+_shared_stores = {}
+_shared_stores_guard = threading.Lock()
+
+
+def get_shared_store(file_path=DEFAULT_TASKS_FILE):
+    """
+    Get the store shared by everything in this process for a tasks file.
+
+    Args:
+        file_path (str): Path to the JSON file containing tasks, or the URI
+            of any store; see `open_store`
+
+    Returns:
+        SharedTaskStore: The store
+    """
+    if "://" in str(file_path):
+        # backends builds on this module, so it can only be imported here
+        from .backends import CachedTaskStore, open_store
+
+        with _shared_stores_guard:
+            store = _shared_stores.get(file_path)
+        if store is None:
+            backend = open_store(file_path)
+            if not isinstance(backend, SharedTaskStore):
+                backend = CachedTaskStore(backend)
+            with _shared_stores_guard:
+                store = _shared_stores.setdefault(file_path, backend)
+        return store
+
+    key = os.path.abspath(file_path)
+    with _shared_stores_guard:
+        store = _shared_stores.get(key)
+        if store is None:
+            store = _shared_stores[key] = SharedTaskStore(file_path)
+    return store
@@ -0,0 +1,502 @@
+"""SQLite storage for tasks, with the list functions pushed down to SQL."""
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from ..tasks import (
+    DATE_FORMAT,
+    DEFAULT_TASKS_FILE,
+    TaskQuery,
+    TaskStats,
+    assign_ids,
+    batched,
+    filter_tasks_by_category,
+    filter_tasks_by_completion,
+    filter_tasks_by_priority,
+    get_overdue_tasks,
+    iter_tasks,
+    search_tasks,
+    sort_tasks,
+    stats_due_date,
+    updated_task,
+)
+
+_SQL_COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "priority",
+    "category",
+    "due_date",
+    "completed",
+    "created_at",
+)
+# true for due dates already in ISO format, which compare correctly as strings;
+# date() lets days past the end of the month through unless it normalizes them
+_SQL_ISO_DUE_DATE = "date(due_date, '+0 days') IS due_date AND due_date >= '0001'"
+# due dates as ISO strings, or NULL if they can't be parsed; only dates not in
+# ISO format call back into Python, to `_sql_due_date`
+_SQL_DUE_DATE = (
+    f"CASE WHEN {_SQL_ISO_DUE_DATE} THEN due_date ELSE due_date_key(due_date) END"
+)
+# trigram FTS only matches queries of at least this many characters
+_FTS_MIN_QUERY = 3
+
+_SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    priority TEXT,
+    category TEXT,
+    due_date TEXT,
+    completed INTEGER,
+    created_at TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority);
+CREATE INDEX IF NOT EXISTS tasks_category ON tasks (category);
+CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed);
+CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_date);
+CREATE INDEX IF NOT EXISTS tasks_extra ON tasks (id) WHERE extra IS NOT NULL;
+"""
+
+_SQL_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+    title, description, content='tasks', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_fts (rowid, title, description)
+    VALUES (new.id, new.title, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE ON tasks BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+    VALUES ('delete', old.id, old.title, old.description);
+    INSERT INTO tasks_fts (rowid, title, description)
+    VALUES (new.id, new.title, new.description);
+END;
+"""
+
+
+class SQLiteTaskRepository:
+    """
+    Task storage backed by an SQLite database.
+
+    The filter, search, sort and stats functions in `tasks` detect a
+    repository and run their work as indexed SQL queries, so only the tasks
+    that are actually returned get turned into dictionaries. Tasks are kept in
+    id order, and their ids must be integers.
+    """
+
+    def __init__(self, db_path):
+        """
+        Open (and create, if needed) a task database.
+
+        Args:
+            db_path (str): Path to the SQLite database, or ":memory:"
+        """
+        self.db_path = str(db_path)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.create_function("due_date_key", 1, _sql_due_date, deterministic=True)
+        self.conn.create_function("py_lower", 1, str.lower, deterministic=True)
+        self.conn.executescript(_SQL_SCHEMA)
+
+        try:
+            self.conn.executescript(_SQL_FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite was built without FTS5 (or without the trigram tokenizer)
+            self.has_fts = False
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT count(*) FROM tasks").fetchone()[0]
+
+    def __iter__(self):
+        return self._select()
+
+    def _select(self, where="", params=(), order_by="id", limit=None):
+        """
+        Lazily fetch tasks matching a WHERE clause.
+
+        Args:
+            where (str): SQL condition, or empty to fetch every task
+            params (tuple): Parameters for the condition
+            order_by (str): SQL ORDER BY expression
+            limit (int, optional): Maximum number of tasks to fetch
+
+        Returns:
+            Iterator[dict[str, Any]]: The matching tasks
+        """
+        sql = f"SELECT {', '.join(_SQL_COLUMNS)}, extra FROM tasks"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        return (_row_to_task(row) for row in self.conn.execute(sql, params))
+
+    def get(self, task_id):
+        """
+        Get a task by id.
+
+        Args:
+            task_id (int): The id of the task
+
+        Returns:
+            dict | None: The task, or None if there is no such task
+        """
+        return next(self._select("id = ?", (task_id,)), None)
+
+    def put(self, task):
+        """
+        Insert a task, replacing any task with the same id.
+
+        Args:
+            task (dict): The task to store
+        """
+        self.import_tasks([task])
+
+    def delete(self, task_id):
+        """
+        Delete a task by id.
+
+        Args:
+            task_id (int): The id of the task
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def load(self):
+        """
+        Fetch every task.
+
+        Returns:
+            list[dict]: The tasks, in id order
+        """
+        return list(self)
+
+    def save(self, tasks):
+        """
+        Replace all of the tasks in a single transaction.
+
+        Args:
+            tasks (Iterable[dict]): The new tasks
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM tasks")
+            self._insert(tasks)
+
+    def query(self, query=None):
+        """
+        Run a query over the tasks.
+
+        Args:
+            query (TaskQuery, optional): The query; all tasks by default
+
+        Returns:
+            list[dict]: The matching tasks
+        """
+        return (query or TaskQuery()).run(self)
+
+    def import_tasks(self, tasks):
+        """
+        Insert tasks in a single transaction, replacing tasks with the same id.
+
+        Args:
+            tasks (Iterable[dict]): The tasks to store
+        """
+        with self.conn:
+            self._insert(tasks)
+
+    def _insert(self, tasks):
+        """
+        Insert tasks, giving any without an id the next unused one.
+
+        The ids are the ones `generate_unique_id` would give, counting from
+        the highest id once every other task is in, rather than whatever
+        rowid SQLite would pick.
+
+        Args:
+            tasks (Iterable[dict]): The tasks to store
+        """
+        placeholders = ", ".join("?" * (len(_SQL_COLUMNS) + 1))
+        sql = f"INSERT OR REPLACE INTO tasks VALUES ({placeholders})"
+        without_ids = []
+
+        def rows():
+            for task in tasks:
+                if task.get("id") is None:
+                    without_ids.append(task)
+                else:
+                    yield _task_to_row(task)
+
+        self.conn.executemany(sql, rows())
+        if without_ids:
+            (highest_id,) = self.conn.execute("SELECT MAX(id) FROM tasks").fetchone()
+            self.conn.executemany(
+                sql, map(_task_to_row, assign_ids(without_ids, highest_id or 0))
+            )
+
+    def _find_where(self, where):
+        """
+        Get the tasks selected by `where`; see `update_where`.
+
+        Args:
+            where (Callable | Iterable[int]): A predicate or task ids
+
+        Returns:
+            list[dict]: The tasks
+        """
+        if callable(where):
+            return [task for task in self if where(task)]
+
+        ids = list(dict.fromkeys(where))
+        found = []
+        # stay under SQLite's limit on the number of parameters
+        for batch in batched(ids, 500):
+            placeholders = ", ".join("?" * len(batch))
+            found.extend(self._select(f"id IN ({placeholders})", batch))
+        return found
+
+    def update_where(self, where, fields):
+        """`update_where` in a single transaction."""
+        updated = [updated_task(task, fields) for task in self._find_where(where)]
+        self.import_tasks(updated)
+        return updated
+
+    def delete_where(self, where):
+        """`delete_where` in a single transaction."""
+        deleted = self._find_where(where)
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM tasks WHERE id = ?",
+                ((task["id"],) for task in deleted),
+            )
+        return deleted
+
+    def bulk_import(self, tasks):
+        """`bulk_import` in a single transaction."""
+        (highest_id,) = self.conn.execute("SELECT MAX(id) FROM tasks").fetchone()
+        imported = assign_ids(tasks, highest_id or 0)
+        self.import_tasks(imported)
+        return imported
+
+    def filter_tasks_by_priority(self, priority):
+        """SQL implementation of `filter_tasks_by_priority`."""
+        if self._has_extra("priority"):
+            return filter_tasks_by_priority(list(self), priority)
+        return list(self._select("priority = ?", (priority,)))
+
+    def filter_tasks_by_category(self, category):
+        """SQL implementation of `filter_tasks_by_category`."""
+        if self._has_extra("category"):
+            return filter_tasks_by_category(list(self), category)
+        return list(self._select("category = ?", (category,)))
+
+    def filter_tasks_by_completion(self, completed=True):
+        """SQL implementation of `filter_tasks_by_completion`."""
+        if self._has_extra("completed"):
+            return filter_tasks_by_completion(list(self), completed)
+        return list(self._select("completed = ?", (int(completed),)))
+
+    def search_tasks(self, query):
+        """SQL implementation of `search_tasks`."""
+        if not query.isascii() or self._has_extra("title", "description"):
+            # SQLite's case folding only matches `str.lower` for ASCII
+            return search_tasks(list(self), query)
+
+        if self.has_fts and len(query) >= _FTS_MIN_QUERY:
+            phrase = '"' + query.replace('"', '""') + '"'
+            where = "id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)"
+            # the index folds a few letters (like "İ") differently, so it can
+            # find tasks that don't match
+            return search_tasks(list(self._select(where, (phrase,))), query)
+
+        where = (
+            "instr(py_lower(coalesce(title, '')), ?)"
+            " OR instr(py_lower(coalesce(description, '')), ?)"
+        )
+        query = query.lower()
+        return list(self._select(where, (query, query)))
+
+    def get_overdue_tasks(self):
+        """SQL implementation of `get_overdue_tasks`."""
+        if self._has_extra("completed", "due_date"):
+            return get_overdue_tasks(list(self))
+
+        where = f"NOT coalesce(completed, 0) AND {_SQL_DUE_DATE} < ?"
+        today = datetime.now().strftime(DATE_FORMAT)
+        return list(self._select(where, (today,)))
+
+    def sort_tasks(self, sort_by, asc=True, limit=None):
+        """SQL implementation of `sort_tasks`."""
+        keys = list(sort_by) if isinstance(sort_by, (list, tuple)) else [sort_by]
+        directions = list(asc) if isinstance(asc, (list, tuple)) else [asc] * len(keys)
+
+        if (
+            not all(key in _SQL_COLUMNS for key in keys)
+            or ("due_date" in keys and self._has_irregular_due_dates())
+            or self._has_extra(*keys)
+        ):
+            return sort_tasks(list(self), sort_by, asc, limit)
+
+        # tasks missing a key go after the ones that have it
+        order_by = ", ".join(
+            f"{key} IS NULL, {key} {'ASC' if asc else 'DESC'}"
+            for key, asc in zip(keys, directions)
+        )
+        return list(self._select(order_by=order_by + ", id", limit=limit))
+
+    def get_task_stats(self):
+        """SQL implementation of `get_task_stats`."""
+        if self._has_extra("completed", "due_date"):
+            return TaskStats(self).get_task_stats()
+
+        today = datetime.now().strftime(DATE_FORMAT)
+        total, incomplete, overdue = self.conn.execute(
+            f"""
+            SELECT
+                count(*),
+                coalesce(sum(NOT coalesce(completed, 0)), 0),
+                coalesce(sum(
+                    NOT coalesce(completed, 0) AND {_SQL_DUE_DATE} < ?
+                ), 0)
+            FROM tasks
+            """,
+            (today,),
+        ).fetchone()
+        return total, incomplete, total - incomplete, overdue
+
+    def _has_irregular_due_dates(self):
+        """
+        Check for due dates not in ISO format, which don't sort as strings.
+
+        Returns:
+            bool: True if any task has one
+        """
+        (found,) = self.conn.execute(
+            "SELECT EXISTS (SELECT 1 FROM tasks"
+            f" WHERE due_date IS NOT NULL AND NOT ({_SQL_ISO_DUE_DATE}))"
+        ).fetchone()
+        return bool(found)
+
+    def _has_extra(self, *columns):
+        """
+        Check for values of columns that are kept in `extra` instead.
+
+        Those are values a column can't hold as they are, like a `completed`
+        of 1 or a title of None. SQL doesn't see them, so the list functions
+        are used whenever one of the columns a query needs has any.
+
+        Args:
+            *columns (str): Column names
+
+        Returns:
+            bool: True if any task has one
+        """
+        where = " OR ".join(
+            f"json_type(extra, '$.{column}') IS NOT NULL" for column in columns
+        )
+        (found,) = self.conn.execute(
+            f"SELECT EXISTS (SELECT 1 FROM tasks WHERE extra IS NOT NULL AND ({where}))"
+        ).fetchone()
+        return bool(found)
+
+
+def _sql_due_date(value):
+    """
+    Get a due date as an ISO string, as `due_date_key` in SQL.
+
+    Args:
+        value: The `due_date` column
+
+    Returns:
+        str | None: The due date, or None if it's missing or can't be parsed
+    """
+    if not isinstance(value, str):
+        return None
+    return stats_due_date({"due_date": value})
+
+
+def _task_to_row(task):
+    """
+    Convert a task dictionary to a row of the `tasks` table.
+
+    Args:
+        task (dict): The task
+
+    Returns:
+        tuple: The column values, with unknown keys stored as JSON in `extra`,
+            along with values their column can't hold as they are
+
+    Raises:
+        ValueError: If the task's id isn't an integer
+    """
+    if not isinstance(task["id"], int) or isinstance(task["id"], bool):
+        raise ValueError(f"SQLite task ids must be integers, not {task['id']!r}")
+
+    extra = {key: value for key, value in task.items() if key not in _SQL_COLUMNS}
+    row = [task["id"]]
+    for column in _SQL_COLUMNS[1:]:
+        value = task.get(column)
+        if column in task and not isinstance(
+            value, bool if column == "completed" else str
+        ):
+            # kept intact rather than coerced, and None rather than dropped
+            extra[column] = value
+            value = None
+        row.append(value)
+
+    row.append(json.dumps(extra) if extra else None)
+    return tuple(row)
+
+
+def _row_to_task(row):
+    """
+    Convert a row of the `tasks` table back to a task dictionary.
+
+    Args:
+        row (tuple): The column values
+
+    Returns:
+        dict: The task, without the keys that were missing when it was stored
+    """
+    task = {
+        column: value for column, value in zip(_SQL_COLUMNS, row) if value is not None
+    }
+    if "completed" in task:
+        task["completed"] = bool(task["completed"])
+    if row[-1] is not None:
+        task.update(json.loads(row[-1]))
+    return task
+
+
+def migrate_json_to_sqlite(json_path=DEFAULT_TASKS_FILE, db_path=None):
+    """
+    Import a JSON tasks file (and its journal) into an SQLite repository.
+
+    Args:
+        json_path (str): Path to the JSON file containing tasks
+        db_path (str, optional): Path to the database. Defaults to the JSON
+            path with a `.db` suffix.
+
+    Returns:
+        SQLiteTaskRepository: The repository holding the imported tasks
+    """
+    if db_path is None:
+        db_path = str(Path(json_path).with_suffix(".db"))
+
+    repo = SQLiteTaskRepository(db_path)
+    repo.import_tasks(iter_tasks(json_path))
+    return repo
@@ -1,228 +1,2543 @@
+import bisect
+import contextlib
+import functools
+import heapq
+import itertools
 import json
+import math
+import operator
 import os
-from datetime import datetime
+import re
+import tempfile
+import threading
+from collections import Counter
+from collections.abc import Iterator, Mapping
+from datetime import date, datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # not available on Windows, where locking is per process
+    fcntl = None
+
 # Globals
 DEFAULT_TASKS_FILE = str(Path(__file__).parent / "tasks.json")
 DATE_FORMAT = "%Y-%m-%d"
 TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+# timestamps already in TIME_FORMAT compare correctly as plain strings
+_ISO_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+
+JOURNAL_SUFFIX = ".journal"
+JSON_LINES_SUFFIX = ".jsonl"
+BINARY_SUFFIX = ".tbin"
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_CHUNK_TASKS = 1000
+META_SUFFIX = ".meta"
+SEARCH_INDEX_SUFFIX = ".index"
+LOCK_SUFFIX = ".lock"
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+
 
 def load_tasks(file_path=DEFAULT_TASKS_FILE):
     """
-    Load tasks from a JSON file.
+    Load tasks from a JSON file, replaying its journal (if any) on top.
+
+    Binary snapshots are decoded in full and closed again; see `open_tasks`
+    to read one lazily.
+
+    Args:
+        file_path (str): Path to the JSON file containing tasks
+
+    Returns:
+        list: List of task dictionaries, empty list if file doesn't exist
+    """
+    with lock_tasks(file_path, shared=True):
+        return replay_journal(_load_snapshot(file_path), get_journal_path(file_path))
+
+
+@contextlib.contextmanager
+def open_tasks(file_path=DEFAULT_TASKS_FILE):
+    """
+    Load tasks as `load_tasks` does, reading binary snapshots lazily.
+
+    A binary snapshot is mapped rather than read, and each task is decoded
+    from it when first accessed, so the tasks can only be used inside the
+    `with` block; the file is unmapped when it ends. Other files are loaded
+    in full.
+
+    Args:
+        file_path (str): Path to the tasks file
+
+    Yields:
+        list: The tasks, a `BinaryTaskList` for binary snapshots
+    """
+    with contextlib.ExitStack() as stack:
+        with lock_tasks(file_path, shared=True):
+            snapshot = _load_snapshot(file_path, lazy=True)
+            if isinstance(snapshot, contextlib.AbstractContextManager):
+                stack.enter_context(snapshot)
+            tasks = replay_journal(snapshot, get_journal_path(file_path))
+        yield tasks
+
+
+def _load_snapshot(file_path, lazy=False):
+    """
+    Load tasks from a JSON file, ignoring its journal.
 
     Args:
         file_path (str): Path to the JSON file containing tasks
+        lazy (bool, optional): Return a binary snapshot as an open
+            `BinaryTaskList`, for the caller to close.
 
     Returns:
         list: List of task dictionaries, empty list if file doesn't exist
     """
     try:
+        if _is_binary(file_path):
+            from .storage.binary import BinaryTaskList, BinaryTaskSnapshot
+
+            snapshot = BinaryTaskSnapshot(file_path)
+            if lazy:
+                return BinaryTaskList(snapshot)
+            with snapshot:
+                return [dict(task) for task in snapshot]
         with open(file_path, "r") as f:
+            if is_json_lines(file_path):
+                return [json.loads(line) for line in f if line.strip()]
             return json.load(f)
     except FileNotFoundError:
         return []
-    except json.JSONDecodeError:
+    except ValueError:  # includes json.JSONDecodeError
         # Handle corrupted JSON file
         print(f"Warning: {file_path} contains invalid JSON. Creating new tasks list.")
         return []
 
 
-def save_tasks(tasks, file_path=DEFAULT_TASKS_FILE):
+def save_tasks(tasks, file_path=DEFAULT_TASKS_FILE, expected_version=None):
     """
     Save tasks to a JSON file.
 
+    The file written is a full snapshot, so any journal kept next to it is
+    discarded afterwards. Tasks are written in chunks as they are produced,
+    so `tasks` can be any iterable, including one too large to fit in memory.
+    Files ending in `.jsonl` are written as JSON lines, and files ending in
+    `.tbin` as a binary snapshot; see `BinaryTaskSnapshot`.
+
+    The snapshot is written to a temporary file and renamed over the old one,
+    so a crash part way through leaves the previous version intact.
+
+    If `tasks` is a `TaskCollection`, its id high-water mark is saved to a
+    metadata file next to the JSON file.
+
     Args:
         tasks (list): List of task dictionaries
         file_path (str): Path to save the JSON file
+        expected_version (tuple, optional): The `get_tasks_version` the tasks
+            were loaded at. If given, the save is refused when someone else
+            has written the file since.
+
+    Raises:
+        ConcurrentModificationError: If the file is not at `expected_version`
     """
-    with open(file_path, "w") as f:
-        json.dump(tasks, f, indent=2)
+    high_water_mark = getattr(tasks, "high_water_mark", None)
 
+    with lock_tasks(file_path):
+        if expected_version is not None:
+            version = get_tasks_version(file_path)
+            if version != expected_version:
+                raise ConcurrentModificationError(
+                    f"{file_path} was modified by another writer"
+                )
 
-def generate_unique_id(tasks):
+        if _is_binary(file_path):
+            from .storage.binary import write_binary
+
+            with atomic_write(file_path, "wb") as f:
+                write_binary(tasks, f)
+        else:
+            with atomic_write(file_path) as f:
+                if is_json_lines(file_path):
+                    write_json_lines(tasks, f)
+                else:
+                    _write_json_array(tasks, f)
+
+        if high_water_mark is not None:
+            with atomic_write(get_meta_path(file_path)) as f:
+                json.dump({"high_water_mark": high_water_mark}, f)
+
+        try:
+            os.remove(get_journal_path(file_path))
+        except FileNotFoundError:
+            pass
+
+
+def to_json(value):
     """
-    Generate a unique ID for a new task.
+    Convert values the `json` module doesn't know about, such as `Task`.
 
     Args:
-        tasks (list): List of existing task dictionaries
+        value: The value to convert
 
     Returns:
-        int: A unique ID for a new task
+        dict: A JSON-serializable version of `value`
     """
-    if not tasks:
-        return 1
-    return max(task.get("id", 0) for task in tasks) + 1
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
 
 
-def filter_tasks_by_priority(tasks, priority):
+# ---------- SAFE WRITES ----------
+
+
+class ConcurrentModificationError(RuntimeError):
+    """Raised when a tasks file was changed by someone else since it was loaded."""
+
+
+@contextlib.contextmanager
+def atomic_write(file_path, mode="w"):
     """
-    Filter tasks by priority level.
+    Open a file for writing so that it is replaced all at once.
+
+    The content goes to a temporary file in the same directory, which is
+    flushed to disk and then renamed over `file_path`. If anything fails
+    before that, `file_path` is left untouched.
 
     Args:
-        tasks (list): List of task dictionaries
-        priority (str): Priority level to filter by (High, Medium, Low)
+        file_path (str): Path of the file to write
+        mode (str): "w" for text or "wb" for binary
 
-    Returns:
-        list: Filtered list of tasks matching the priority
+    Yields:
+        IO: The temporary file to write to
     """
-    return [task for task in tasks if task.get("priority") == priority]
+    directory, name = os.path.split(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
 
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
 
-def filter_tasks_by_category(tasks, category):
+        try:
+            os.chmod(temp_path, os.stat(file_path).st_mode)
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o644)
+
+        os.replace(temp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_path)
+        raise
+
+    _fsync_directory(directory)
+
+
+def _fsync_directory(directory):
     """
-    Filter tasks by category.
+    Make a rename inside a directory durable.
 
     Args:
-        tasks (list): List of task dictionaries
-        category (str): Category to filter by
+        directory (str): The directory
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # directories can't be opened on Windows
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def get_lock_path(file_path=DEFAULT_TASKS_FILE):
+    """
+    Get the path of the lock file used to coordinate writers of a tasks file.
+
+    Args:
+        file_path (str): Path to the JSON file containing tasks
 
     Returns:
-        list: Filtered list of tasks matching the category
+        str: The lock file path
     """
-    return [task for task in tasks if task.get("category") == category]
+    return str(file_path) + LOCK_SUFFIX
 
 
-def filter_tasks_by_completion(tasks, completed=True):
+class _FileLock:
     """
-    Filter tasks by completion status.
+    A lock on a tasks file, shared by threads and processes.
+
+    Threads in this process are serialized by a re-entrant lock, so the same
+    thread can take it again (e.g. compacting from inside a journal append).
+    Other processes are kept out by an advisory `fcntl.flock` on the lock
+    file, held while any thread here holds the lock. Writers hold it
+    exclusively, creating the lock file if need be; readers hold it shared,
+    and only if the lock file is already there, so reading has no side
+    effects.
+    """
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        self._exclusive = False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    @contextlib.contextmanager
+    def shared(self):
+        """
+        Hold the lock for reading.
+
+        Yields:
+            _FileLock: The lock
+        """
+        self.acquire(exclusive=False)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def acquire(self, exclusive=True):
+        """
+        Take the lock, upgrading it if this thread only holds it for reading.
+
+        Args:
+            exclusive (bool, optional): Whether to keep out readers too.
+        """
+        self._lock.acquire()
+        try:
+            if fcntl is not None and (
+                self._depth == 0 or (exclusive and not self._exclusive)
+            ):
+                self._lock_file(exclusive)
+        except BaseException:
+            self._lock.release()
+            raise
+        self._depth += 1
+
+    def release(self):
+        """Release the lock, unlocking the file once it is no longer held."""
+        self._depth -= 1
+        if self._depth == 0:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+            self._exclusive = False
+        self._lock.release()
+
+    def _lock_file(self, exclusive):
+        fd = self._fd
+        if fd is None:
+            try:
+                if exclusive:
+                    fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                else:
+                    fd = os.open(self.lock_path, os.O_RDONLY)
+            except OSError:
+                if exclusive:
+                    raise
+                # nothing has written the file, or we can't; read unlocked
+                return
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        except BaseException:
+            if fd != self._fd:
+                os.close(fd)
+            raise
+        self._fd = fd
+        self._exclusive = exclusive
+
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def lock_tasks(file_path=DEFAULT_TASKS_FILE, shared=False):
+    """
+    Get the lock that guards a tasks file, its journal and its metadata.
+
+    Use it as a context manager around read-modify-write sequences, or with
+    `shared` around reads that need the files to agree. It is re-entrant
+    within a thread.
 
     Args:
-        tasks (list): List of task dictionaries
-        completed (bool): Completion status to filter by
+        file_path (str): Path to the JSON file containing tasks
+        shared (bool, optional): Lock for reading, without creating the lock
+            file. Other processes can read at the same time.
 
     Returns:
-        list: Filtered list of tasks matching the completion status
+        ContextManager: The lock
     """
-    return [task for task in tasks if task.get("completed") == completed]
+    key = os.path.abspath(file_path)
+    with _file_locks_guard:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = _file_locks[key] = _FileLock(get_lock_path(key))
+    return lock.shared() if shared else lock
 
 
-def search_tasks(tasks, query):
+# ---------- STREAMING ----------
+
+
+def is_json_lines(file_path):
     """
-    Search tasks by a text query in title and description.
+    Check whether a tasks file holds one task per line instead of an array.
 
     Args:
-        tasks (list): List of task dictionaries
-        query (str): Search query
+        file_path (str): Path to the tasks file
 
     Returns:
-        list: Filtered list of tasks matching the search query
+        bool: True for JSON lines files
     """
-    query = query.lower()
-    return [
-        task
-        for task in tasks
-        if query in task.get("title", "").lower()
-        or query in task.get("description", "").lower()
-    ]
+    return str(file_path).endswith(JSON_LINES_SUFFIX)
 
 
-def get_overdue_tasks(tasks):
+def _is_binary(file_path):
     """
-    Get tasks that are past their due date and not completed.
+    Check whether a tasks file is a binary snapshot.
 
     Args:
-        tasks (list): List of task dictionaries
+        file_path (str): Path to the tasks file
 
     Returns:
-        list: List of overdue tasks
+        bool: True for binary snapshots
     """
-    today = datetime.now().date()
+    return str(file_path).endswith(BINARY_SUFFIX)
 
-    overdue = []
+
+def _write_json_array(tasks, f):
+    """
+    Write tasks as an indented JSON array, as `json.dump(tasks, f, indent=2)`
+    would, without needing the whole list up front.
+
+    Args:
+        tasks (Iterable[dict]): The tasks to write
+        f (TextIO): The file to write to
+    """
+    chunk = []
+    separator = "[\n  "
 
     for task in tasks:
-        if not task.get("completed", False):
-            due_date = task.get("due_date")
-            if due_date:
-                try:
-                    if datetime.strptime(due_date, DATE_FORMAT).date() < today:
-                        overdue.append(task)
-                except ValueError as e:
-                    print(
-                        f"Could not parse date: {due_date}. Does it match the format '{DATE_FORMAT}'?"
-                    )
+        chunk.append(separator)
+        chunk.append(json.dumps(task, indent=2, default=to_json).replace("\n", "\n  "))
+        separator = ",\n  "
 
-    return overdue
+        if len(chunk) >= STREAM_CHUNK_TASKS:
+            f.write("".join(chunk))
+            chunk.clear()
 
+    chunk.append("[]" if separator.startswith("[") else "\n]")
+    f.write("".join(chunk))
 
-def sort_tasks(tasks, sort_by, asc=True):
+
+def write_json_lines(tasks, f):
     """
-    Sort tasks by key `sort_by`.
+    Write tasks as JSON lines.
 
     Args:
-        tasks: The tasks to sort.
-        sort_by: The key in the tasks to sort by.
-        asc: True to sort ascending, False for descending. Defaults to True.
+        tasks (Iterable[dict]): The tasks to write
+        f (TextIO): The file to write to
+    """
+    for batch in batched(tasks, STREAM_CHUNK_TASKS):
+        f.write("".join(json.dumps(task, default=to_json) + "\n" for task in batch))
+
+
+def batched(iterable, size):
+    """Split an iterable into lists of at most `size` items."""
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def iter_tasks(file_path=DEFAULT_TASKS_FILE):
+    """
+    Lazily read tasks from a JSON or JSON lines file, with its journal applied.
+
+    Unlike `load_tasks`, only a small part of the file is in memory at once,
+    so this can be used on files larger than memory.
+
+    Args:
+        file_path (str): Path to the tasks file
+
+    Yields:
+        dict: The tasks, in the order `load_tasks` would return them
+
+    Raises:
+        json.JSONDecodeError: If the file is not valid JSON
+    """
+    # an open file keeps its contents even if it is replaced, so the lock
+    # only needs to be held until both files have been read or opened
+    with lock_tasks(file_path, shared=True):
+        changes = _read_journal_changes(get_journal_path(file_path))
+        try:
+            if _is_binary(file_path):
+                from .storage.binary import BinaryTaskSnapshot
+
+                snapshot_file = BinaryTaskSnapshot(file_path)
+            else:
+                snapshot_file = open(file_path, "r")
+        except FileNotFoundError:
+            snapshot_file = None
+
+    if snapshot_file is not None:
+        with snapshot_file as f:
+            if _is_binary(file_path):
+                # decoded in full, since the file is unmapped once we're done
+                snapshot = (dict(task) for task in f)
+            elif is_json_lines(file_path):
+                snapshot = (json.loads(line) for line in f if line.strip())
+            else:
+                snapshot = _iter_json_array(f)
+
+            for task in snapshot:
+                ops = changes.pop(task.get("id"), None) if changes else None
+                if ops is None:
+                    yield task
+                    continue
+
+                task, appended = _apply_changes(task, ops)
+                if task is not None:
+                    yield task
+                if appended is not None:
+                    changes[appended[1].get("id")] = [appended]
+
+    # tasks that only exist in the journal, in the order they were added
+    appended = []
+    for ops in changes.values():
+        _, task = _apply_changes(None, ops)
+        if task is not None:
+            appended.append(task)
+    for _, task in sorted(appended, key=lambda item: item[0]):
+        yield task
+
+
+def _read_journal_changes(journal_path):
+    """
+    Group the entries of a journal by task id, for `iter_tasks`.
+
+    Args:
+        journal_path (str): Path to the journal
 
     Returns:
-        list[dict[str, Any]]: The sorted tasks.
+        dict: Task id -> list of (entry number, task or None for a delete)
     """
-    missing_sort_key = []
-    has_sort_key = []
+    changes = {}
+    for number, entry in enumerate(_read_journal(journal_path)):
+        if entry.get("op") == "delete":
+            changes.setdefault(entry.get("id"), []).append((number, None))
+        else:
+            changes.setdefault(entry["task"].get("id"), []).append(
+                (number, entry["task"])
+            )
+    return changes
 
-    # actual for loop to avoid making two loops
-    for task in tasks:
-        if sort_by in task:
-            has_sort_key.append(task)
+
+def _apply_changes(task, ops):
+    """
+    Apply one task's journal entries the same way `replay_journal` would.
+
+    Args:
+        task (dict | None): The task from the snapshot, or None if it isn't there
+        ops (list): (entry number, task or None) pairs from `_read_journal_changes`
+
+    Returns:
+        tuple: The task to keep in place (or None), and an (entry number, task)
+            pair for a task that ends up appended after the snapshot (or None)
+    """
+    appended = None
+    for number, new_task in ops:
+        if new_task is None:
+            task = appended = None
+        elif task is not None:
+            task = new_task
+        elif appended is not None:
+            appended = (appended[0], new_task)
         else:
-            missing_sort_key.append(task)
+            appended = (number, new_task)
+    return task, appended
 
-    key = lambda task: task[sort_by]
 
-    if sort_by == "due_date":
-        key = lambda task: datetime.strptime(task[sort_by], DATE_FORMAT).date()
-    elif sort_by == "created_at":
-        key = lambda task: datetime.strptime(task[sort_by], TIME_FORMAT)
+def _iter_json_array(f):
+    """
+    Incrementally parse the values of a JSON array.
 
-    return sorted(has_sort_key, key=key, reverse=not asc) + missing_sort_key
+    Args:
+        f (TextIO): The file containing the array
 
+    Yields:
+        Any: The values in the array
 
-def complete_all_tasks(tasks):
+    Raises:
+        json.JSONDecodeError: If the file is not a valid JSON array
     """
-    Completes all the provided tasks.
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    expecting = "["
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+
+        if pos == len(buffer) or expecting == "partial":
+            if eof:
+                raise json.JSONDecodeError("Unexpected end of data", buffer, pos)
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            if expecting == "partial":
+                expecting = "value"
+            continue
+
+        char = buffer[pos]
+        if expecting == "[":
+            if char != "[":
+                raise json.JSONDecodeError("Expecting '['", buffer, pos)
+            pos += 1
+            expecting = "value or ]"
+        elif expecting == "," and char == ",":
+            pos += 1
+            expecting = "value"
+        elif expecting in ("value or ]", ",") and char == "]":
+            return
+        elif expecting == ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                expecting = "partial"
+                continue
+
+            if end == len(buffer) and not eof:
+                # a number could continue in the next chunk
+                expecting = "partial"
+                continue
+
+            yield value
+            pos = end
+            expecting = ","
+
+
+# ---------- JOURNAL ----------
+
+
+def get_journal_path(file_path=DEFAULT_TASKS_FILE):
+    """
+    Get the path of the journal kept next to a tasks file.
 
     Args:
-        tasks: The tasks to complete.
+        file_path (str): Path to the JSON file containing tasks
 
     Returns:
-        list[dict[str, Any]]: The completed tasks.
+        str: Path to the journal file
     """
-    tasks = [task.copy() for task in tasks]
+    return str(file_path) + JOURNAL_SUFFIX
 
-    for task in tasks:
-        task["completed"] = True
 
-    return tasks
+def replay_journal(tasks, journal_path):
+    """
+    Apply the operations recorded in a journal to a list of tasks.
 
+    Journal entries are JSON objects, one per line, of the form
+    `{"op": "add" | "update", "task": {...}}` or `{"op": "delete", "id": ...}`.
+    Adds and updates replace any task with the same id, so replaying a journal
+    that was already folded into the snapshot is harmless.
 
-def get_task_stats(tasks):
+    Args:
+        tasks (list): Tasks loaded from the snapshot
+        journal_path (str): Path to the journal file
+
+    Returns:
+        list: The tasks with the journal applied
     """
-    Get stats for tasks.
+    return _replay_journal(tasks, journal_path)[0]
+
+
+def _replay_journal(tasks, journal_path):
+    """
+    Apply a journal to a list of tasks; see `replay_journal`.
 
     Args:
-        tasks: The tasks to get stats for.
+        tasks (list): Tasks loaded from the snapshot
+        journal_path (str): Path to the journal file
 
     Returns:
-        tuple[int, int, int, int]: (num_tasks, num_incomplete, num_completed, num_overdue)
+        tuple[list, int]: The tasks with the journal applied, and the highest
+            integer id mentioned anywhere in the journal (0 if there is none)
     """
-    incomplete = 0
-    complete = 0
-    overdue = 0
+    if not os.path.exists(journal_path):
+        return tasks, 0
 
-    today = datetime.now().date()
+    tasks = list(tasks)
+    positions = {task.get("id"): i for i, task in enumerate(tasks)}
+    deleted = False
+    highest_id = 0
 
-    for task in tasks:
-        if not task.get("completed", False):
-            incomplete += 1
-            if (
-                "due_date" in task
-                and datetime.strptime(task["due_date"], DATE_FORMAT).date() < today
-            ):
-                overdue += 1
+    for entry in _read_journal(journal_path):
+        if entry.get("op") == "delete":
+            task_id = entry.get("id")
+            i = positions.pop(task_id, None)
+            if i is not None:
+                tasks[i] = None
+                deleted = True
         else:
-            complete += 1
+            task = entry["task"]
+            task_id = task.get("id")
+            i = positions.get(task_id)
+            if i is None:
+                positions[task_id] = len(tasks)
+                tasks.append(task)
+            else:
+                tasks[i] = task
+
+        if isinstance(task_id, int) and task_id > highest_id:
+            highest_id = task_id
+
+    if deleted:
+        tasks = [task for task in tasks if task is not None]
+
+    return tasks, highest_id
+
+
+def _read_journal(journal_path):
+    """
+    Read the entries of a journal, skipping any that are not valid JSON.
+
+    Args:
+        journal_path (str): Path to the journal file
+
+    Yields:
+        dict: The journal entries, oldest first
+    """
+    try:
+        f = open(journal_path, "r")
+    except FileNotFoundError:
+        return
+
+    with f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # most likely a write that was interrupted part way through
+                print(
+                    f"Warning: skipping invalid journal entry {journal_path}:{line_no}"
+                )
+
+
+def append_journal(entry, file_path=DEFAULT_TASKS_FILE):
+    """
+    Append a single operation to the journal of a tasks file.
+
+    The entry is on disk when this returns. Appends made at the same time
+    from other threads share a single write and fsync; see
+    `GroupCommitJournal`.
+
+    Once the journal grows past `JOURNAL_COMPACT_BYTES` it is compacted into
+    the snapshot.
+
+    Args:
+        entry (dict): The journal entry to append
+        file_path (str): Path to the JSON file containing tasks
+    """
+    append_journal_entries([entry], file_path)
+
+
+def append_journal_entries(entries, file_path=DEFAULT_TASKS_FILE):
+    """
+    Append several operations to a journal with a single write; see
+    `append_journal`.
+
+    Args:
+        entries (list[dict]): The journal entries, in order
+        file_path (str): Path to the JSON file containing tasks
+    """
+    if entries:
+        get_group_commit_journal(file_path).append(entries)
+
+
+class GroupCommitJournal:
+    """
+    Appends entries to a journal, one fsync per burst of appends.
+
+    The first caller to arrive becomes the leader and writes every entry
+    queued so far. Callers arriving while it is writing queue their entries
+    and wait, and the next leader writes them all together, so a burst of
+    appends costs a couple of fsyncs instead of one each.
+    """
+
+    def __init__(self, file_path=DEFAULT_TASKS_FILE):
+        self.file_path = file_path
+        self.commits = 0
+        self._condition = threading.Condition()
+        self._pending = _JournalBatch()
+        self._writing = False
+
+    def append(self, entries):
+        """
+        Append entries and wait until they are on disk.
+
+        Args:
+            entries (list[dict]): The journal entries, in order
+
+        Raises:
+            OSError: If writing the batch containing the entries failed
+        """
+        with self._condition:
+            batch = self._pending
+            batch.entries.extend(entries)
+
+            while not batch.done:
+                if self._writing:
+                    self._condition.wait()
+                    continue
+
+                # lead: write everything queued so far, outside the condition
+                self._pending = _JournalBatch()
+                self._writing = True
+                self._condition.release()
+                try:
+                    self._write(batch.entries)
+                except BaseException as e:
+                    batch.error = e
+                finally:
+                    self._condition.acquire()
+                    self._writing = False
+                    batch.done = True
+                    self._condition.notify_all()
+
+            if batch.error is not None:
+                raise batch.error
+
+    def _write(self, entries):
+        """
+        Write a batch of entries, compacting the journal if it grew too big.
+
+        Args:
+            entries (list[dict]): The journal entries
+        """
+        data = "".join(json.dumps(e, default=to_json) + "\n" for e in entries)
+        with lock_tasks(self.file_path):
+            with open(get_journal_path(self.file_path), "a+b") as f:
+                # end an entry torn by a crash, so it's skipped on its own
+                # line instead of swallowing the first entry written here
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        data = "\n" + data
+                f.write(data.encode())
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            self.commits += 1
+
+            if size > JOURNAL_COMPACT_BYTES:
+                compact_tasks(self.file_path)
+
+
+class _JournalBatch:
+    """Entries waiting to be written together by a `GroupCommitJournal`."""
+
+    __slots__ = ("entries", "done", "error")
+
+    def __init__(self):
+        self.entries = []
+        self.done = False
+        self.error = None
+
+
+_journals = {}
+
+
+def get_group_commit_journal(file_path=DEFAULT_TASKS_FILE):
+    """
+    Get the journal writer shared by everything in this process for a file.
+
+    Args:
+        file_path (str): Path to the JSON file containing tasks
+
+    Returns:
+        GroupCommitJournal: The journal writer
+    """
+    key = os.path.abspath(file_path)
+    with _file_locks_guard:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = _journals[key] = GroupCommitJournal(file_path)
+    return journal
+
+
+def journal_add_task(task, file_path=DEFAULT_TASKS_FILE):
+    """
+    Record a newly added task without rewriting the tasks file.
+
+    Args:
+        task (dict): The task that was added
+        file_path (str): Path to the JSON file containing tasks
+    """
+    append_journal({"op": "add", "task": task}, file_path)
+
+
+def journal_update_task(task, file_path=DEFAULT_TASKS_FILE):
+    """
+    Record a modified task without rewriting the tasks file.
+
+    Args:
+        task (dict): The task, after modification
+        file_path (str): Path to the JSON file containing tasks
+    """
+    append_journal({"op": "update", "task": task}, file_path)
+
+
+def journal_delete_task(task_id, file_path=DEFAULT_TASKS_FILE):
+    """
+    Record a deleted task without rewriting the tasks file.
+
+    Args:
+        task_id (int): The id of the deleted task
+        file_path (str): Path to the JSON file containing tasks
+    """
+    append_journal({"op": "delete", "id": task_id}, file_path)
+
+
+def compact_tasks(file_path=DEFAULT_TASKS_FILE):
+    """
+    Fold the journal of a tasks file into a fresh snapshot.
+
+    Args:
+        file_path (str): Path to the JSON file containing tasks
+    """
+    with lock_tasks(file_path):
+        save_tasks(load_task_collection(file_path), file_path)
+
+
+def get_tasks_version(file_path=DEFAULT_TASKS_FILE):
+    """
+    Get a value that changes whenever a tasks file or its journal is written.
+
+    Args:
+        file_path (str): Path to the JSON file containing tasks
+
+    Returns:
+        tuple: An opaque version, comparable with `==`
+    """
+    version = []
+    for path in (file_path, get_journal_path(file_path)):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+# ---------- TASK COLLECTION ----------
+
+
+def get_meta_path(file_path=DEFAULT_TASKS_FILE):
+    """
+    Get the path of the metadata file kept next to a tasks file.
+
+    Args:
+        file_path (str): Path to the JSON file containing tasks
+
+    Returns:
+        str: Path to the metadata file
+    """
+    return str(file_path) + META_SUFFIX
+
+
+def load_task_collection(file_path=DEFAULT_TASKS_FILE, cls=None):
+    """
+    Load tasks from a JSON file (and its journal) into a `TaskCollection`.
+
+    Args:
+        file_path (str): Path to the JSON file containing tasks
+        cls (type, optional): The collection type, e.g. `TaskList`. Defaults
+            to `TaskCollection`.
+
+    Returns:
+        TaskCollection: The tasks, with the id high-water mark restored
+    """
+    with lock_tasks(file_path, shared=True):
+        tasks, highest_id = _replay_journal(
+            _load_snapshot(file_path), get_journal_path(file_path)
+        )
+
+        try:
+            with open(get_meta_path(file_path), "r") as f:
+                highest_id = max(highest_id, json.load(f).get("high_water_mark", 0))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    return (cls or TaskCollection)(tasks, highest_id)
+
+
+class TaskCollection:
+    """
+    A list of tasks indexed by id.
+
+    It iterates like the list of task dictionaries it replaces, so it can be
+    passed to any function in this module, but getting, updating and
+    deleting a task by id take constant time. New ids are allocated from a
+    high-water mark that never decreases, so ids of deleted tasks aren't
+    reused.
+    """
+
+    def __init__(self, tasks=(), high_water_mark=0):
+        """
+        Index a list of tasks.
+
+        Args:
+            tasks (Iterable[dict]): The tasks
+            high_water_mark (int): The highest id allocated so far; raised to
+                the highest id in `tasks` if that is larger
+        """
+        self._tasks = {}
+        self._shared = False  # storage is shared with a copy
+        self._copied = False  # tasks may be shared with a copy
+        self.high_water_mark = high_water_mark
+        self.extend(tasks)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def __iter__(self):
+        return iter(self._tasks.values())
+
+    def __getitem__(self, index):
+        # positional access needs a full pass; prefer `get`
+        return list(self._tasks.values())[index]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, TaskCollection)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TaskCollection({list(self)!r}, {self.high_water_mark!r})"
+
+    def copy(self):
+        """
+        Make a copy that can be changed independently.
+
+        The copy shares storage with this collection until one of them is
+        modified, so copying is constant time. Tasks themselves stay shared;
+        once a collection has been copied, its tasks are no longer modified
+        in place.
+
+        Returns:
+            TaskCollection: The copy
+        """
+        other = object.__new__(type(self))
+        other.__dict__.update(self.__dict__)
+        other._shared = self._shared = True
+        other._copied = self._copied = True
+        return other
+
+    def _unshare(self):
+        """Take a private copy of storage shared with `copy`, before modifying it."""
+        if self._shared:
+            self._tasks = dict(self._tasks)
+            self._shared = False
+
+    def append(self, task):
+        """
+        Add a task, replacing any task with the same id.
+
+        Args:
+            task (dict): The task
+        """
+        self._unshare()
+        task_id = task.get("id")
+        if task_id is None:
+            # keep tasks without an id, but they can't be looked up
+            task_id = object()
+        elif isinstance(task_id, int) and task_id > self.high_water_mark:
+            self.high_water_mark = task_id
+
+        self._tasks[task_id] = task
+
+    def extend(self, tasks):
+        """
+        Add several tasks; see `append`.
+
+        Args:
+            tasks (Iterable[dict]): The tasks
+        """
+        for task in tasks:
+            self.append(task)
+
+    def get(self, task_id, default=None):
+        """
+        Get a task by id.
+
+        Args:
+            task_id (int): The id of the task
+            default: Returned if there is no such task
+
+        Returns:
+            dict: The task
+        """
+        return self._tasks.get(task_id, default)
+
+    def toggle(self, task_id):
+        """
+        Flip the completion status of a task.
+
+        If the collection has been copied, the task is replaced by a modified
+        copy rather than changed in place, so the other copies aren't affected.
+
+        Args:
+            task_id (int): The id of the task
+
+        Returns:
+            dict: The modified task
+        """
+        self._unshare()
+        task = self._tasks[task_id]
+        if self._copied:
+            task = self._tasks[task_id] = task.copy()
+        task["completed"] = not task.get("completed", False)
+        return task
+
+    def delete(self, task_id):
+        """
+        Delete a task by id.
+
+        Args:
+            task_id (int): The id of the task
+
+        Returns:
+            dict | None: The deleted task, or None if there was no such task
+        """
+        self._unshare()
+        return self._tasks.pop(task_id, None)
+
+    def generate_unique_id(self):
+        """Allocate an id for a new task; see `generate_unique_id`."""
+        self.high_water_mark += 1
+        return self.high_water_mark
+
+    def _keys_where(self, where):
+        """
+        Get the storage keys of the tasks selected by `where`.
+
+        Args:
+            where (Callable | Iterable[int]): A predicate or task ids
+
+        Returns:
+            list: The keys, looked up by id without a scan when given ids
+        """
+        if callable(where):
+            return [key for key, task in self._tasks.items() if where(task)]
+        return [task_id for task_id in dict.fromkeys(where) if task_id in self._tasks]
+
+    def update_where(self, where, fields):
+        """`update_where`, looking ids up directly instead of scanning."""
+        self._unshare()
+        updated = []
+        for key in self._keys_where(where):
+            task = self._tasks[key] = updated_task(self._tasks[key], fields)
+            updated.append(task)
+        return updated
+
+    def delete_where(self, where):
+        """`delete_where`, looking ids up directly instead of scanning."""
+        self._unshare()
+        return [self._tasks.pop(key) for key in self._keys_where(where)]
+
+    def bulk_import(self, tasks):
+        """`bulk_import`, allocating ids from the high-water mark."""
+        imported = assign_ids(tasks, self.high_water_mark)
+        self.extend(imported)
+        return imported
+
+
+# ---------- TASKS ----------
+
+
+def _native(tasks, name):
+    """
+    Get a task container's own implementation of one of the functions below.
+
+    Containers such as `SQLiteTaskRepository` implement methods named after
+    the module-level functions so the work can be pushed down to them instead
+    of scanning every task in Python.
+
+    Args:
+        tasks: The task container.
+        name (str): The name of the function.
+
+    Returns:
+        Callable | None: The bound method, or None if there isn't one.
+    """
+    return getattr(tasks, name, None)
+
+
+def _collect(tasks, matches):
+    """
+    Return the matching tasks the same way they were given.
+
+    An iterator (for example from `iter_tasks`) gets a lazy iterator back so
+    that it never has to be held in memory, anything else gets a list.
+
+    Args:
+        tasks (Iterable[dict]): The tasks that were filtered
+        matches (Iterator[dict]): The matching tasks
+
+    Returns:
+        list | Iterator: The matching tasks
+    """
+    if isinstance(tasks, Iterator):
+        return matches
+    return list(matches)
+
+
+def generate_unique_id(tasks):
+    """
+    Generate a unique ID for a new task.
+
+    For a `TaskCollection` this allocates the ID, so two calls never return
+    the same one.
+
+    Args:
+        tasks (list): List of existing task dictionaries
+
+    Returns:
+        int: A unique ID for a new task
+    """
+    native = _native(tasks, "generate_unique_id")
+    if native is not None:
+        return native()
+
+    if not tasks:
+        return 1
+    return max(task.get("id", 0) for task in tasks) + 1
+
+
+def filter_tasks_by_priority(tasks, priority):
+    """
+    Filter tasks by priority level.
+
+    Args:
+        tasks (list): List of task dictionaries
+        priority (str): Priority level to filter by (High, Medium, Low)
+
+    Returns:
+        list: Filtered list of tasks matching the priority
+    """
+    native = _native(tasks, "filter_tasks_by_priority")
+    if native is not None:
+        return native(priority)
+
+    return _collect(tasks, (task for task in tasks if task.get("priority") == priority))
+
+
+def filter_tasks_by_category(tasks, category):
+    """
+    Filter tasks by category.
+
+    Args:
+        tasks (list): List of task dictionaries
+        category (str): Category to filter by
+
+    Returns:
+        list: Filtered list of tasks matching the category
+    """
+    native = _native(tasks, "filter_tasks_by_category")
+    if native is not None:
+        return native(category)
+
+    return _collect(tasks, (task for task in tasks if task.get("category") == category))
+
+
+def filter_tasks_by_completion(tasks, completed=True):
+    """
+    Filter tasks by completion status.
+
+    Args:
+        tasks (list): List of task dictionaries
+        completed (bool): Completion status to filter by
+
+    Returns:
+        list: Filtered list of tasks matching the completion status
+    """
+    native = _native(tasks, "filter_tasks_by_completion")
+    if native is not None:
+        return native(completed)
+
+    return _collect(
+        tasks, (task for task in tasks if task.get("completed") == completed)
+    )
+
+
+def search_tasks(tasks, query, index=None):
+    """
+    Search tasks by a text query in title and description.
+
+    Without an index this is a case-insensitive substring search. With a
+    `SearchIndex`, every word in the query must match the start of a word in
+    the task, and the results are ranked by relevance.
+
+    Args:
+        tasks (list): List of task dictionaries
+        query (str): Search query
+        index (SearchIndex, optional): Index of the tasks' text
+
+    Returns:
+        list: Filtered list of tasks matching the search query, in the order
+            of `tasks`, or best match first with an index
+    """
+    if index is not None:
+        return _lookup_ids(tasks, index.search(query))
+
+    native = _native(tasks, "search_tasks")
+    if native is not None:
+        return native(query)
+
+    query = query.lower()
+    return _collect(
+        tasks,
+        (
+            task
+            for task in tasks
+            if query in task.get("title", "").lower()
+            or query in task.get("description", "").lower()
+        ),
+    )
+
+
+def _lookup_ids(tasks, ids):
+    """
+    Get tasks by id, in the order of the ids, e.g. for ids found in an index.
+
+    Args:
+        tasks (list): List of task dictionaries
+        ids (Iterable[int]): The ids to look up
+
+    Returns:
+        list: The tasks, skipping ids that aren't in `tasks`
+    """
+    if isinstance(tasks, TaskCollection):
+        lookup = tasks.get
+    else:
+        lookup = {task.get("id"): task for task in tasks}.get
+    found = (lookup(task_id) for task_id in ids)
+    return [task for task in found if task is not None]
+
+
+def get_overdue_tasks(tasks, index=None):
+    """
+    Get tasks that are past their due date and not completed.
+
+    Args:
+        tasks (list): List of task dictionaries
+        index (DueDateIndex, optional): Index of the tasks' due dates
+
+    Returns:
+        list: List of overdue tasks, in the order of `tasks`, or earliest due
+            date first with an index
+    """
+    if index is not None:
+        return _lookup_ids(tasks, index.overdue())
+
+    native = _native(tasks, "get_overdue_tasks")
+    if native is not None:
+        return native()
+
+    return _collect(tasks, _iter_overdue(tasks))
+
+
+def _iter_overdue(tasks):
+    """
+    Yield the overdue tasks; see `get_overdue_tasks`.
+
+    Args:
+        tasks (Iterable[dict]): The tasks to check
+
+    Yields:
+        dict: The overdue tasks
+    """
+    today = datetime.now().date().isoformat()
+
+    for task in tasks:
+        if is_overdue(task, today):
+            yield task
+
+
+def is_overdue(task, today):
+    """
+    Check whether a task is overdue, warning about a due date that can't be parsed.
+
+    Args:
+        task (dict): The task
+        today (str): Today's date in ISO format
+
+    Returns:
+        bool: True if the task is incomplete and due before today
+    """
+    if task.get("completed", False):
+        return False
+    due_date = task.get("due_date")
+    if not due_date:
+        return False
+    try:
+        return date_sort_key(due_date) < today
+    except ValueError:
+        print(
+            f"Could not parse date: {due_date}. Does it match the format '{DATE_FORMAT}'?"
+        )
+        return False
+
+
+def get_tasks_due_between(tasks, start, end, index=None):
+    """
+    Get incomplete tasks due between two dates, earliest due date first.
+
+    Args:
+        tasks (list): List of task dictionaries
+        start (date | str): The first date, inclusive
+        end (date | str): The last date, inclusive
+        index (DueDateIndex, optional): Index of the tasks' due dates
+
+    Returns:
+        list: The tasks due in the range
+    """
+    if index is not None:
+        return _lookup_ids(tasks, index.due_between(start, end))
+
+    start, end = _due_key(start), _due_key(end)
+    return sorted(
+        (task for task in tasks if start <= (incomplete_due_key(task) or "") <= end),
+        key=incomplete_due_key,
+    )
+
+
+def get_next_due_tasks(tasks, n, index=None):
+    """
+    Get the next `n` incomplete tasks due today or later.
+
+    Args:
+        tasks (list): List of task dictionaries
+        n (int): The number of tasks to get
+        index (DueDateIndex, optional): Index of the tasks' due dates
+
+    Returns:
+        list: Up to `n` tasks, earliest due date first
+    """
+    if index is not None:
+        return _lookup_ids(tasks, index.next_due(n))
+
+    today = datetime.now().date().isoformat()
+    return heapq.nsmallest(
+        n,
+        (task for task in tasks if (incomplete_due_key(task) or "") >= today),
+        key=incomplete_due_key,
+    )
+
+
+def _due_key(value):
+    """
+    Normalize a date argument to the ISO string used to compare due dates.
+
+    Args:
+        value (date | str): A date, or a string in `DATE_FORMAT`
+
+    Returns:
+        str: The date in ISO format
+    """
+    if isinstance(value, date):
+        return value.isoformat()
+    return date_sort_key(value)
+
+
+def incomplete_due_key(task):
+    """
+    Get the due date of an incomplete task as an ISO string.
+
+    Args:
+        task (dict): The task
+
+    Returns:
+        str | None: The due date, or None for completed tasks and tasks
+            without a valid due date
+    """
+    if task.get("completed", False):
+        return None
+    return stats_due_date(task)
+
+
+def sort_tasks(tasks, sort_by, asc=True, limit=None):
+    """
+    Sort tasks by key `sort_by`.
+
+    Dates and timestamps are compared as ISO strings, which sort the same
+    way as the values they represent, so most of them never get parsed.
+
+    Args:
+        tasks: The tasks to sort.
+        sort_by: The key in the tasks to sort by, or a list of keys in order
+            of precedence (e.g. `["priority", "due_date"]`).
+        asc: True to sort ascending, False for descending. Defaults to True.
+            May also be a list with one direction per key in `sort_by`.
+        limit: Only return the first `limit` tasks, selected with a heap
+            instead of sorting everything. Defaults to None (all tasks).
+
+    Returns:
+        list[dict[str, Any]]: The sorted tasks.
+    """
+    native = _native(tasks, "sort_tasks")
+    if native is not None:
+        return native(sort_by, asc, limit)
+
+    keys = list(sort_by) if isinstance(sort_by, (list, tuple)) else [sort_by]
+    directions = list(asc) if isinstance(asc, (list, tuple)) else [asc] * len(keys)
+
+    if len(keys) == 1:
+        return sort_by_key(tasks, keys[0], directions[0], limit)
+
+    if limit is not None and len(set(directions)) == 1:
+        select = heapq.nsmallest if directions[0] else heapq.nlargest
+        return select(limit, tasks, key=_multi_sort_key(keys, directions[0]))
+
+    # stable sorts, least significant key first
+    sorted_tasks = tasks
+    for sort_by, asc in reversed(list(zip(keys, directions))):
+        sorted_tasks = sort_by_key(sorted_tasks, sort_by, asc)
+
+    return sorted_tasks if limit is None else sorted_tasks[:limit]
+
+
+def sort_by_key(tasks, sort_by, asc=True, limit=None, key=None):
+    """
+    Sort tasks by a single key, putting tasks without the key last.
+
+    Args:
+        tasks: The tasks to sort.
+        sort_by: The key in the tasks to sort by.
+        asc: True to sort ascending, False for descending.
+        limit: Only return the first `limit` tasks. Defaults to None (all tasks).
+        key: The key function. Defaults to the one for `sort_by`.
+
+    Returns:
+        list[dict[str, Any]]: The sorted tasks.
+    """
+    missing_sort_key = []
+    has_sort_key = []
+
+    # actual for loop to avoid making two loops
+    for task in tasks:
+        if sort_by in task:
+            has_sort_key.append(task)
+        else:
+            missing_sort_key.append(task)
+
+    if key is None:
+        key = _sort_key(sort_by)
+
+    if limit is None:
+        return sorted(has_sort_key, key=key, reverse=not asc) + missing_sort_key
+
+    select = heapq.nsmallest if asc else heapq.nlargest
+    top = select(limit, has_sort_key, key=key)
+    return top + missing_sort_key[: max(limit - len(top), 0)]
+
+
+def _sort_key(sort_by):
+    """
+    Get the key function used to sort by `sort_by`.
+
+    Args:
+        sort_by: The key in the tasks to sort by.
+
+    Returns:
+        Callable[[dict[str, Any]], Any]: The key function.
+    """
+    if sort_by == "due_date":
+        return lambda task: date_sort_key(task[sort_by])
+    if sort_by == "created_at":
+        return lambda task: timestamp_sort_key(task[sort_by])
+    return operator.itemgetter(sort_by)
+
+
+def _multi_sort_key(keys, asc=True):
+    """
+    Build a single key function for sorting by several keys in one direction.
+
+    Tasks missing a key sort after tasks that have it, as in `sort_tasks`.
+
+    Args:
+        keys (list): The keys in the tasks to sort by, in order of precedence.
+        asc (bool): True if the key will be used for an ascending sort.
+
+    Returns:
+        Callable[[dict[str, Any]], tuple]: The key function.
+    """
+    getters = [(sort_by, _sort_key(sort_by)) for sort_by in keys]
+    present, missing = (0, 1) if asc else (1, 0)
+
+    def key(task):
+        return tuple(
+            (present, get(task)) if sort_by in task else (missing, None)
+            for sort_by, get in getters
+        )
+
+    return key
+
+
+@functools.lru_cache(maxsize=65536)
+def date_sort_key(value):
+    """
+    Get the sort key for a date string.
+
+    There are few distinct due dates, so parsing them once each is cheap.
+
+    Args:
+        value (str): A date in `DATE_FORMAT`.
+
+    Returns:
+        str: The date in ISO format.
+    """
+    return datetime.strptime(value, DATE_FORMAT).date().isoformat()
+
+
+def timestamp_sort_key(value):
+    """
+    Get the sort key for a timestamp string.
+
+    Args:
+        value (str): A timestamp in `TIME_FORMAT`.
+
+    Returns:
+        str: The timestamp in ISO format.
+    """
+    if _ISO_TIMESTAMP.fullmatch(value):
+        return value
+    return _parse_timestamp_sort_key(value)
+
+
+@functools.lru_cache(maxsize=65536)
+def _parse_timestamp_sort_key(value):
+    """Parse a timestamp that isn't already in ISO format; see `timestamp_sort_key`."""
+    return datetime.strptime(value, TIME_FORMAT).isoformat(sep=" ")
+
+
+def complete_all_tasks(tasks):
+    """
+    Completes all the provided tasks.
+
+    Args:
+        tasks: The tasks to complete.
+
+    Returns:
+        list[dict[str, Any]]: The completed tasks.
+    """
+    tasks = [task.copy() for task in tasks]
+
+    for task in tasks:
+        task["completed"] = True
+
+    return tasks
+
+
+def _where(where):
+    """
+    Turn the `where` argument of the batch functions into a predicate.
+
+    Args:
+        where (Callable | Iterable[int]): A predicate or task ids
+
+    Returns:
+        Callable[[dict], bool]: The predicate
+    """
+    if callable(where):
+        return where
+    ids = set(where)
+    return lambda task: task.get("id") in ids
+
+
+def updated_task(task, fields):
+    """
+    Copy a task with some fields changed.
+
+    Args:
+        task (dict): The task
+        fields (dict): The new field values
+
+    Returns:
+        dict: The modified copy
+    """
+    task = task.copy()
+    task.update(fields)
+    return task
+
+
+def update_where(tasks, where, fields):
+    """
+    Change fields of every task matching a predicate or in a list of ids.
+
+    Matching tasks are replaced by modified copies, in a single pass.
+
+    Args:
+        tasks (list): List of task dictionaries, changed in place
+        where (Callable | Iterable[int]): A predicate taking a task, or the
+            ids of the tasks to change
+        fields (dict): The new field values
+
+    Returns:
+        list: The modified tasks
+    """
+    native = _native(tasks, "update_where")
+    if native is not None:
+        return native(where, fields)
+
+    matches = _where(where)
+    updated = []
+
+    for i, task in enumerate(tasks):
+        if matches(task):
+            tasks[i] = updated_task(task, fields)
+            updated.append(tasks[i])
+
+    return updated
+
+
+def complete_where(tasks, where):
+    """
+    Complete every task matching a predicate or in a list of ids.
+
+    Args:
+        tasks (list): List of task dictionaries, changed in place
+        where (Callable | Iterable[int]): A predicate taking a task, or the
+            ids of the tasks to complete
+
+    Returns:
+        list: The completed tasks
+    """
+    return update_where(tasks, where, {"completed": True})
+
+
+def delete_where(tasks, where):
+    """
+    Delete every task matching a predicate or in a list of ids, in a single
+    pass.
+
+    Args:
+        tasks (list): List of task dictionaries, changed in place
+        where (Callable | Iterable[int]): A predicate taking a task, or the
+            ids of the tasks to delete
+
+    Returns:
+        list: The deleted tasks
+    """
+    native = _native(tasks, "delete_where")
+    if native is not None:
+        return native(where)
+
+    matches = _where(where)
+    kept = []
+    deleted = []
+
+    for task in tasks:
+        (deleted if matches(task) else kept).append(task)
+
+    tasks[:] = kept
+    return deleted
+
+
+def bulk_import(tasks, new_tasks):
+    """
+    Add many tasks at once. Tasks without an id are given a new one, and
+    tasks with the id of an existing task replace it.
+
+    Args:
+        tasks (list): List of task dictionaries, changed in place
+        new_tasks (Iterable[dict]): The tasks to add
+
+    Returns:
+        list: The added tasks, with their ids
+    """
+    native = _native(tasks, "bulk_import")
+    if native is not None:
+        return native(new_tasks)
+
+    imported = assign_ids(new_tasks, generate_unique_id(tasks) - 1)
+
+    positions = {task.get("id"): i for i, task in enumerate(tasks)}
+    for task in imported:
+        i = positions.get(task["id"])
+        if i is None:
+            positions[task["id"]] = len(tasks)
+            tasks.append(task)
+        else:
+            tasks[i] = task
+
+    return imported
+
+
+def assign_ids(new_tasks, highest_id):
+    """
+    Give tasks without an id one that isn't used by any other task.
+
+    Args:
+        new_tasks (Iterable[dict]): The tasks
+        highest_id (int): The highest id already in use
+
+    Returns:
+        list: The tasks, with copies in place of the ones given an id
+    """
+    new_tasks = list(new_tasks)
+    for task in new_tasks:
+        task_id = task.get("id")
+        if isinstance(task_id, int) and task_id > highest_id:
+            highest_id = task_id
+
+    with_ids = []
+    for task in new_tasks:
+        if task.get("id") is None:
+            highest_id += 1
+            task = updated_task(task, {"id": highest_id})
+        with_ids.append(task)
+
+    return with_ids
+
+
+def get_task_stats(tasks):
+    """
+    Get stats for tasks.
+
+    Args:
+        tasks: The tasks to get stats for.
+
+    Returns:
+        tuple[int, int, int, int]: (num_tasks, num_incomplete, num_completed, num_overdue)
+    """
+    native = _native(tasks, "get_task_stats")
+    if native is not None:
+        return native()
+
+    total = 0
+    incomplete = 0
+    complete = 0
+    overdue = 0
+
+    today = datetime.now().date().isoformat()
+
+    # counted as we go so `tasks` can be a single-pass iterator
+    for task in tasks:
+        total += 1
+        if not task.get("completed", False):
+            incomplete += 1
+            if "due_date" in task and date_sort_key(task["due_date"]) < today:
+                overdue += 1
+        else:
+            complete += 1
+
+    return total, incomplete, complete, overdue
+
+
+# ---------- QUERIES ----------
+
+
+class TaskQuery:
+    """
+    A filter, search, sort and pagination pipeline over a list of tasks.
+
+    Conditions are chained and then evaluated in a single lazy pass, e.g.
+
+        TaskQuery().category("Work").completed(False).sort_by("due_date").page(1, 20)
+
+    No intermediate lists are built and tasks are not copied.
+    """
+
+    def __init__(self):
+        self._fields = {}
+        self._search = None
+        self._predicates = []
+        self._sort_by = None
+        self._asc = True
+        self._offset = 0
+        self._limit = None
+
+    def category(self, category):
+        """Only match tasks in `category`."""
+        self._fields["category"] = category
+        return self
+
+    def priority(self, priority):
+        """Only match tasks with priority `priority`."""
+        self._fields["priority"] = priority
+        return self
+
+    def completed(self, completed=True):
+        """Only match tasks with completion status `completed`."""
+        self._fields["completed"] = completed
+        return self
+
+    def search(self, query, index=None):
+        """Only match tasks found by `search_tasks(tasks, query, index)`."""
+        if index is None:
+            self._search = query.lower()
+        else:
+            found = set(index.search(query))
+            self._predicates.append(lambda task: task.get("id") in found)
+        return self
+
+    def due_between(self, start, end, index=None):
+        """Only match tasks found by `get_tasks_due_between` with these arguments."""
+        if index is None:
+            start, end = _due_key(start), _due_key(end)
+            self._predicates.append(
+                lambda task: start <= (incomplete_due_key(task) or "") <= end
+            )
+        else:
+            found = set(index.due_between(start, end))
+            self._predicates.append(lambda task: task.get("id") in found)
+        return self
+
+    def where(self, predicate):
+        """Only match tasks for which `predicate(task)` is true."""
+        self._predicates.append(predicate)
+        return self
+
+    def sort_by(self, sort_by, asc=True):
+        """Sort the matching tasks; see `sort_tasks` for the arguments."""
+        self._sort_by = sort_by
+        self._asc = asc
+        return self
+
+    def offset(self, offset):
+        """Skip the first `offset` matching tasks."""
+        self._offset = offset
+        return self
+
+    def limit(self, limit):
+        """Return at most `limit` tasks."""
+        self._limit = limit
+        return self
+
+    def page(self, number, size):
+        """Return page `number` (starting from 1) of `size` tasks."""
+        return self.offset((number - 1) * size).limit(size)
+
+    def matches(self, task):
+        """
+        Check a task against the query's conditions.
+
+        Args:
+            task (dict): The task to check
+
+        Returns:
+            bool: True if the task matches every condition
+        """
+        for key, value in self._fields.items():
+            if task.get(key) != value:
+                return False
+
+        if self._search is not None and not (
+            self._search in task.get("title", "").lower()
+            or self._search in task.get("description", "").lower()
+        ):
+            return False
+
+        return all(predicate(task) for predicate in self._predicates)
+
+    def iter(self, tasks):
+        """
+        Lazily evaluate the query.
+
+        Args:
+            tasks (Iterable[dict]): The tasks to query
+
+        Returns:
+            Iterator[dict]: The matching tasks, sorted and paginated
+        """
+        matching = filter(self.matches, tasks)
+        stop = None if self._limit is None else self._offset + self._limit
+
+        if self._sort_by is not None:
+            matching = iter(sort_tasks(matching, self._sort_by, self._asc, stop))
+
+        return itertools.islice(matching, self._offset, stop)
+
+    def run(self, tasks):
+        """
+        Evaluate the query.
+
+        Args:
+            tasks (Iterable[dict]): The tasks to query
+
+        Returns:
+            list[dict]: The matching tasks, sorted and paginated
+        """
+        return list(self.iter(tasks))
+
+    def count(self, tasks):
+        """
+        Count the tasks matching the query, ignoring sorting and pagination.
+
+        Args:
+            tasks (Iterable[dict]): The tasks to query
+
+        Returns:
+            int: The number of matching tasks
+        """
+        return sum(1 for _ in filter(self.matches, tasks))
+
+
+# ---------- STATS ----------
+
+
+class TaskStats:
+    """
+    Task statistics that are updated as tasks change instead of recomputed.
+
+    Incomplete tasks are counted per due date, and the overdue count is only
+    recalculated (by bisecting the sorted due dates) when the day changes.
+    """
+
+    def __init__(self, tasks=()):
+        """
+        Compute statistics for a list of tasks.
+
+        Args:
+            tasks (Iterable[dict]): The initial tasks
+        """
+        self.total = 0
+        self.complete = 0
+        self.by_category = Counter()
+        self.by_priority = Counter()
+        self._due_counts = Counter()
+        self._due_dates = []  # distinct keys of _due_counts, sorted
+        self._overdue = None  # (today, count)
+
+        for task in tasks:
+            self.add(task)
+
+    @property
+    def incomplete(self):
+        """int: The number of incomplete tasks."""
+        return self.total - self.complete
+
+    def add(self, task):
+        """
+        Count a task that was added (or modified; see `remove`).
+
+        Args:
+            task (dict): The task
+        """
+        self._count(task, 1)
+
+    def remove(self, task):
+        """
+        Stop counting a task that was deleted.
+
+        To update a task in place, `remove` it before changing it and `add` it
+        again afterwards.
+
+        Args:
+            task (dict): The task
+        """
+        self._count(task, -1)
+
+    def _count(self, task, change):
+        """Add `change` (1 or -1) to every count `task` contributes to."""
+        self.total += change
+
+        if "category" in task:
+            self.by_category[task["category"]] += change
+        if "priority" in task:
+            self.by_priority[task["priority"]] += change
+
+        if task.get("completed", False):
+            self.complete += change
+            return
+
+        due_date = stats_due_date(task)
+        if due_date is None:
+            return
+
+        self._due_counts[due_date] += change
+        if self._due_counts[due_date] == 0:
+            del self._due_counts[due_date]
+            del self._due_dates[bisect.bisect_left(self._due_dates, due_date)]
+        elif change > 0 and self._due_counts[due_date] == 1:
+            bisect.insort(self._due_dates, due_date)
+
+        if self._overdue is not None and due_date < self._overdue[0]:
+            self._overdue = (self._overdue[0], self._overdue[1] + change)
+
+    @property
+    def overdue(self):
+        """int: The number of incomplete tasks that are past their due date."""
+        today = datetime.now().date().isoformat()
+
+        if self._overdue is None or self._overdue[0] != today:
+            end = bisect.bisect_left(self._due_dates, today)
+            count = sum(self._due_counts[day] for day in self._due_dates[:end])
+            self._overdue = (today, count)
+
+        return self._overdue[1]
+
+    def get_task_stats(self):
+        """
+        Get the statistics in the form returned by `get_task_stats`.
+
+        Returns:
+            tuple[int, int, int, int]: (num_tasks, num_incomplete, num_completed, num_overdue)
+        """
+        return self.total, self.incomplete, self.complete, self.overdue
+
+
+def stats_due_date(task):
+    """
+    Get the due date of a task as an ISO string, for `TaskStats`.
+
+    Args:
+        task (dict): The task
+
+    Returns:
+        str | None: The due date, or None if it's missing or can't be parsed
+    """
+    due_date = task.get("due_date")
+    if not due_date:
+        return None
+
+    try:
+        return date_sort_key(due_date)
+    except ValueError:
+        return None
+
+
+# ---------- DUE DATES ----------
+
+
+class DueDateIndex:
+    """
+    The due dates of incomplete tasks, kept sorted for range queries.
+
+    Overdue, due-in-range and next-due queries bisect the sorted dates
+    instead of scanning and parsing every task, so they take O(log n + k).
+    Due dates that can't be parsed are reported once, when the task is
+    indexed, and are then ignored.
+    """
+
+    def __init__(self, tasks=()):
+        """
+        Index tasks.
+
+        Args:
+            tasks (Iterable[dict]): The tasks to index
+        """
+        self._entries = []  # sorted (due date, sequence number, task id)
+        self._entries_by_id = {}
+        self._sequence = itertools.count()  # breaks ties without comparing ids
+        self.invalid = {}  # task id -> due date that couldn't be parsed
+
+        for task in tasks:
+            self.add(task)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, task):
+        """
+        Index a task, replacing any earlier version of it.
+
+        Args:
+            task (dict): The task; tasks without an id are ignored
+        """
+        task_id = task.get("id")
+        if task_id is None:
+            return
+        reported = self.invalid.get(task_id)
+        self.remove(task_id)
+
+        due_date = task.get("due_date")
+        if task.get("completed", False) or not due_date:
+            return
+
+        try:
+            key = date_sort_key(due_date)
+        except ValueError:
+            if due_date != reported:
+                print(
+                    f"Could not parse date: {due_date}. Does it match the format '{DATE_FORMAT}'?"
+                )
+            self.invalid[task_id] = due_date
+            return
+
+        entry = (key, next(self._sequence), task_id)
+        bisect.insort(self._entries, entry)
+        self._entries_by_id[task_id] = entry
+
+    update = add
+
+    def remove(self, task_id):
+        """
+        Remove a task from the index.
+
+        Args:
+            task_id (int): The id of the task
+        """
+        self.invalid.pop(task_id, None)
+        entry = self._entries_by_id.pop(task_id, None)
+        if entry is not None:
+            del self._entries[bisect.bisect_left(self._entries, entry)]
+
+    def _ids(self, start, stop):
+        """Get the task ids of entries `start` to `stop`."""
+        return [entry[2] for entry in self._entries[start:stop]]
+
+    def overdue(self, today=None):
+        """
+        Get the tasks due before today.
+
+        Args:
+            today (date | str, optional): Defaults to the current date
+
+        Returns:
+            list[int]: The task ids, earliest due date first
+        """
+        today = _due_key(today or datetime.now().date())
+        return self._ids(0, bisect.bisect_left(self._entries, (today,)))
+
+    def due_between(self, start, end):
+        """
+        Get the tasks due between two dates.
+
+        Args:
+            start (date | str): The first date, inclusive
+            end (date | str): The last date, inclusive
+
+        Returns:
+            list[int]: The task ids, earliest due date first
+        """
+        lo = bisect.bisect_left(self._entries, (_due_key(start),))
+        hi = bisect.bisect_right(self._entries, (_due_key(end), math.inf))
+        return self._ids(lo, hi)
+
+    def next_due(self, n, today=None):
+        """
+        Get the next tasks due, from today on.
+
+        Args:
+            n (int): The maximum number of tasks
+            today (date | str, optional): Defaults to the current date
+
+        Returns:
+            list[int]: Up to `n` task ids, earliest due date first
+        """
+        today = _due_key(today or datetime.now().date())
+        start = bisect.bisect_left(self._entries, (today,))
+        return self._ids(start, start + n)
+
+
+# ---------- SEARCH INDEX ----------
+
+_WORD = re.compile(r"\w+")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _tokenize(task):
+    """
+    Split a task's title and description into lowercase words.
+
+    Args:
+        task (dict): The task
+
+    Returns:
+        list[str]: The words
+    """
+    text = f"{task.get('title', '')} {task.get('description', '')}"
+    return _WORD.findall(text.lower())
+
+
+class SearchIndex:
+    """
+    An inverted index over task titles and descriptions.
+
+    Maps every word to the ids of the tasks containing it, so a search only
+    looks at tasks that match instead of scanning every task's text. Query
+    words match any word they are a prefix of, all query words must match,
+    and results are ranked with BM25.
+    """
+
+    def __init__(self, tasks=()):
+        """
+        Index tasks.
+
+        Args:
+            tasks (Iterable[dict]): The tasks to index
+        """
+        self.postings = {}  # word -> {task id: occurrences}
+        self.lengths = {}  # task id -> number of words
+        self._task_words = {}  # task id -> distinct words, for removal
+        self.total_length = 0
+        self._words = None  # sorted vocabulary, rebuilt when words are added
+
+        for task in tasks:
+            self.add(task)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, task):
+        """
+        Index a task, replacing any earlier version of it.
+
+        Args:
+            task (dict): The task; tasks without an id are ignored
+        """
+        task_id = task.get("id")
+        if task_id is None:
+            return
+        if task_id in self.lengths:
+            self.remove(task_id)
+
+        words = _tokenize(task)
+        self.lengths[task_id] = len(words)
+        self.total_length += len(words)
+
+        counts = Counter(words)
+        self._task_words[task_id] = tuple(counts)
+
+        for word, count in counts.items():
+            postings = self.postings.get(word)
+            if postings is None:
+                postings = self.postings[word] = {}
+                self._words = None
+            postings[task_id] = count
+
+    update = add
+
+    def remove(self, task_id):
+        """
+        Remove a task from the index.
+
+        Args:
+            task_id (int): The id of the task
+        """
+        length = self.lengths.pop(task_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+
+        for word in self._task_words.pop(task_id):
+            del self.postings[word][task_id]
+            if not self.postings[word]:
+                del self.postings[word]
+                self._words = None
+
+    def _expand(self, prefix):
+        """
+        Get the indexed words starting with `prefix`.
+
+        Args:
+            prefix (str): The start of a word
+
+        Returns:
+            list[str]: The matching words
+        """
+        if self._words is None:
+            self._words = sorted(self.postings)
+
+        start = bisect.bisect_left(self._words, prefix)
+        end = start
+        while end < len(self._words) and self._words[end].startswith(prefix):
+            end += 1
+        return self._words[start:end]
+
+    def search(self, query, limit=None):
+        """
+        Find the tasks matching every word of a query.
+
+        Args:
+            query (str): The search query
+            limit (int, optional): Maximum number of results
+
+        Returns:
+            list: Ids of the matching tasks, most relevant first
+        """
+        prefixes = _WORD.findall(query.lower())
+        if not prefixes or not self.lengths:
+            return []
+
+        average_length = self.total_length / len(self.lengths) or 1
+        scores = None
+
+        for prefix in prefixes:
+            term_scores = {}
+            for word in self._expand(prefix):
+                postings = self.postings[word]
+                idf = math.log(
+                    1
+                    + (len(self.lengths) - len(postings) + 0.5) / (len(postings) + 0.5)
+                )
+                for task_id, count in postings.items():
+                    norm = 1 - BM25_B + BM25_B * self.lengths[task_id] / average_length
+                    term_scores[task_id] = term_scores.get(task_id, 0) + idf * (
+                        count * (BM25_K1 + 1) / (count + BM25_K1 * norm)
+                    )
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    task_id: score + term_scores[task_id]
+                    for task_id, score in scores.items()
+                    if task_id in term_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores, key=lambda task_id: -scores[task_id])
+        return ranked if limit is None else ranked[:limit]
+
+    def save(self, path, signature=None):
+        """
+        Save the index to a file.
+
+        Args:
+            path (str): Path to save the index to
+            signature: JSON-serializable value identifying the indexed data
+        """
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "signature": signature,
+                    "lengths": list(self.lengths.items()),
+                    "postings": {
+                        word: list(postings.items())
+                        for word, postings in self.postings.items()
+                    },
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index saved with `save`.
+
+        Args:
+            path (str): Path to the saved index
+
+        Returns:
+            tuple[SearchIndex, Any]: The index and the signature it was saved with
+        """
+        with open(path, "r") as f:
+            data = json.load(f)
+
+        index = cls()
+        index.lengths = dict(data["lengths"])
+        index.total_length = sum(index.lengths.values())
+        index.postings = {
+            word: dict(postings) for word, postings in data["postings"].items()
+        }
+
+        task_words = {task_id: [] for task_id in index.lengths}
+        for word, postings in index.postings.items():
+            for task_id in postings:
+                task_words[task_id].append(word)
+        index._task_words = {
+            task_id: tuple(words) for task_id, words in task_words.items()
+        }
+
+        return index, data["signature"]
+
+
+def get_search_index_path(file_path=DEFAULT_TASKS_FILE):
+    """
+    Get the path of the search index kept next to a tasks file.
+
+    Args:
+        file_path (str): Path to the JSON file containing tasks
+
+    Returns:
+        str: Path to the search index
+    """
+    return str(file_path) + SEARCH_INDEX_SUFFIX
+
+
+def _snapshot_signature(file_path):
+    """Identify the snapshot of a tasks file, for `load_search_index`."""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+def load_search_index(tasks, file_path=DEFAULT_TASKS_FILE):
+    """
+    Load the search index saved next to a tasks file, bringing it up to date.
+
+    The saved index records which snapshot it was built from and how much of
+    the journal it has seen. If the snapshot is unchanged, only the newer
+    journal entries are applied; otherwise the index is rebuilt from `tasks`.
+    Either way, the up to date index is saved again.
+
+    Args:
+        tasks (Iterable[dict]): The tasks in the file, used to rebuild the index
+        file_path (str): Path to the JSON file containing tasks
+
+    Returns:
+        SearchIndex: The index
+    """
+    index_path = get_search_index_path(file_path)
+    journal_path = get_journal_path(file_path)
+    snapshot = _snapshot_signature(file_path)
+
+    try:
+        journal_size = os.path.getsize(journal_path)
+    except FileNotFoundError:
+        journal_size = 0
+
+    try:
+        index, (saved_snapshot, offset) = SearchIndex.load(index_path)
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+        index, saved_snapshot, offset = None, None, 0
+
+    if index is None or saved_snapshot != snapshot or offset > journal_size:
+        index = SearchIndex(tasks)
+    elif offset == journal_size:
+        return index
+    else:
+        with open(journal_path, "rb") as f:
+            f.seek(offset)
+            entries = f.read(journal_size - offset)
+
+        # leave an entry that is still being written for next time
+        entries = entries[: entries.rfind(b"\n") + 1]
+        journal_size = offset + len(entries)
+
+        for line in entries.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("op") == "delete":
+                index.remove(entry.get("id"))
+            else:
+                index.update(entry["task"])
 
-    return len(tasks), incomplete, complete, overdue
+    index.save(index_path, [snapshot, journal_size])
+    return index
@@ -0,0 +1,720 @@
+"""Performance Benchmarks
+
+Run from the root project directory:
+
+    python -m tests.benchmark [SIZE ...]
+
+to compare implementations, or
+
+    python -m tests.benchmark --suite [SIZE ...] [--save]
+
+to time every public function in `tasks.py` and `src/storage/` and
+compare against (or, with `--save`, record) the baseline in
+`tests/benchmark_baseline.json`. The suite exits with status 1 if anything
+regressed past the threshold.
+
+Timings only compare on the same machine, so the baseline isn't committed.
+Record one with `--save` before making a change, then run `--suite` again
+afterwards to check it; without a baseline the suite only prints timings.
+"""
+
+import argparse
+import gc
+import importlib
+import inspect
+import json
+import os
+import pkgutil
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from functools import partial
+from pathlib import Path
+
+from src import storage, tasks
+from src.storage import backends, compact, parallel, shared, sqlite
+from tests.test_property import legacy_sort_tasks
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+SUITE_SIZES = (1_000, 100_000, 1_000_000)
+BASELINE_PATH = str(Path(__file__).parent / "benchmark_baseline.json")
+# regressions smaller than these are treated as noise
+MIN_TIME_REGRESSION = 0.005
+MIN_PEAK_REGRESSION = 64 * 1024
+PRIORITIES = ["Low", "Medium", "High"]
+CATEGORIES = ["Work", "Personal", "School", "Other"]
+WORDS = ["review", "draft", "email", "report", "plan", "fix", "call", "read"]
+
+
+def generate_tasks(
+    n,
+    seed=0,
+    priority_weights=None,
+    category_weights=None,
+    start=datetime(2024, 1, 1),
+    due_days=1000,
+    completed_ratio=0.5,
+    text_length=None,
+):
+    """Generates synthetic tasks.
+
+    Args:
+        n (int): The number of tasks to generate.
+        seed (int, optional): Seed for the random generator. Defaults to 0.
+        priority_weights (list[float], optional): Relative weights of
+            `PRIORITIES`. Defaults to uniform.
+        category_weights (list[float], optional): Relative weights of
+            `CATEGORIES`. Defaults to uniform.
+        start (datetime, optional): The earliest due date and creation time.
+        due_days (int, optional): The number of days due dates are spread over.
+        completed_ratio (float, optional): The fraction of completed tasks.
+        text_length (int, optional): Pad descriptions with random words to
+            about this many characters.
+
+    Returns:
+        list[dict[str, Any]]: The generated tasks.
+    """
+    rng = random.Random(seed)
+
+    def choose(options, weights):
+        if weights is None:
+            return rng.choice(options)
+        return rng.choices(options, weights)[0]
+
+    def describe(i):
+        description = f"Description for task {i}"
+        while text_length is not None and len(description) < text_length:
+            description += " " + rng.choice(WORDS)
+        return description
+
+    return [
+        {
+            "id": i,
+            "title": f"Task {i}",
+            "description": describe(i),
+            "priority": choose(PRIORITIES, priority_weights),
+            "category": choose(CATEGORIES, category_weights),
+            "due_date": (start + timedelta(days=rng.randrange(due_days))).strftime(
+                tasks.DATE_FORMAT
+            ),
+            "completed": rng.random() < completed_ratio,
+            "created_at": (
+                start + timedelta(seconds=rng.randrange(10_000_000))
+            ).strftime(tasks.TIME_FORMAT),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def time_call(func, *args):
+    """Times a single call.
+
+    Args:
+        func (Callable): The function to call.
+        *args: Arguments for the function.
+
+    Returns:
+        float: The elapsed time, in seconds.
+    """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def benchmark_sort(sizes=DEFAULT_SIZES):
+    """Compares `sort_tasks` with the original implementation.
+
+    Args:
+        sizes (Iterable[int], optional): The numbers of tasks to benchmark with.
+
+    Returns:
+        list[tuple[int, str, float, float, float]]: (size, sort key, legacy time,
+            current time, top 50 time) rows
+    """
+    rows = []
+
+    for n in sizes:
+        data = generate_tasks(n)
+        for sort_by in ("due_date", "created_at"):
+            tasks.date_sort_key.cache_clear()
+            rows.append(
+                (
+                    n,
+                    sort_by,
+                    time_call(legacy_sort_tasks, data, sort_by),
+                    time_call(tasks.sort_tasks, data, sort_by),
+                    time_call(tasks.sort_tasks, data, sort_by, True, 50),
+                )
+            )
+
+    return rows
+
+
+def retained_memory(func, *args):
+    """Measures the memory held by the result of a call.
+
+    Args:
+        func (Callable): The function to call.
+        *args: Arguments for the function.
+
+    Returns:
+        int: The size of the memory still allocated after the call, in bytes.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def benchmark_memory(sizes=DEFAULT_SIZES):
+    """Compares the memory used by task dictionaries and a `TaskList`.
+
+    Args:
+        sizes (Iterable[int], optional): The numbers of tasks to benchmark with.
+
+    Returns:
+        list[tuple[int, int, int]]: (size, dict bytes, TaskList bytes) rows
+    """
+    rows = []
+
+    for n in sizes:
+        content = json.dumps(generate_tasks(n))
+        rows.append(
+            (
+                n,
+                retained_memory(json.loads, content),
+                retained_memory(lambda: compact.TaskList(json.loads(content))),
+            )
+        )
+
+    return rows
+
+
+def benchmark_parallel(sizes=DEFAULT_SIZES, worker_counts=None):
+    """Compares scanning a JSON lines file serially and with `ParallelTaskScan`.
+
+    Args:
+        sizes (Iterable[int], optional): The numbers of tasks to benchmark with.
+        worker_counts (Iterable[int], optional): The numbers of worker processes.
+            Defaults to powers of two up to the number of CPUs.
+
+    Returns:
+        list[tuple[int, int, float, float]]: (size, workers, stats time,
+            filter time) rows, with 0 workers for the serial scan
+    """
+    cpus = os.cpu_count() or 1
+    worker_counts = worker_counts or [
+        2**i for i in range(cpus.bit_length()) if 2**i <= cpus
+    ]
+    threshold = parallel.PARALLEL_THRESHOLD
+    parallel.PARALLEL_THRESHOLD = 0
+    rows = []
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tasks.jsonl")
+
+            for n in sizes:
+                tasks.save_tasks(generate_tasks(n), path)
+                rows.append(
+                    (
+                        n,
+                        0,
+                        time_call(lambda: tasks.get_task_stats(tasks.iter_tasks(path))),
+                        time_call(
+                            lambda: list(
+                                tasks.filter_tasks_by_priority(
+                                    tasks.iter_tasks(path), "High"
+                                )
+                            )
+                        ),
+                    )
+                )
+
+                for workers in worker_counts:
+                    with parallel.ParallelTaskScan.from_file(path, workers) as scan:
+                        rows.append(
+                            (
+                                n,
+                                workers,
+                                time_call(tasks.get_task_stats, scan),
+                                time_call(tasks.filter_tasks_by_priority, scan, "High"),
+                            )
+                        )
+    finally:
+        parallel.PARALLEL_THRESHOLD = threshold
+
+    return rows
+
+
+def benchmark_startup(sizes=DEFAULT_SIZES):
+    """Compares loading tasks from JSON, JSON lines and binary snapshots.
+
+    Args:
+        sizes (Iterable[int], optional): The numbers of tasks to benchmark with.
+
+    Returns:
+        list[tuple[int, float, float, float]]: (size, JSON time, JSON lines time,
+            binary time) rows
+    """
+    rows = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            data = generate_tasks(n)
+            times = []
+            for name in ("tasks.json", "tasks.jsonl", "tasks.tbin"):
+                path = os.path.join(directory, name)
+                tasks.save_tasks(data, path)
+                times.append(time_call(_open_tasks, path))
+            rows.append((n, *times))
+
+    return rows
+
+
+def _open_tasks(path):
+    """Loads tasks as the app starts up, lazily for binary snapshots."""
+    with tasks.open_tasks(path) as loaded:
+        return len(loaded)
+
+
+class BenchmarkData:
+    """Generated tasks, and files holding them, for the benchmark suite."""
+
+    def __init__(self, n, directory, **options):
+        """
+        Args:
+            n (int): The number of tasks.
+            directory (str): Where to write files.
+            **options: Options for `generate_tasks`.
+        """
+        self.n = n
+        self.directory = directory
+        self.tasks = generate_tasks(n, **options)
+        self.json_path = self.path("tasks.json")
+        tasks.save_tasks(self.tasks, self.json_path)
+
+    def path(self, name):
+        """Gets the path of a file in the benchmark directory."""
+        return os.path.join(self.directory, name)
+
+    def copy(self):
+        """Copies the tasks, for functions that change them."""
+        return [dict(task) for task in self.tasks]
+
+    def journaled(self):
+        """Writes the tasks with a journal of changes to 1% of them.
+
+        Returns:
+            str: The path of the tasks file.
+        """
+        path = self.path("journaled.json")
+        tasks.save_tasks(self.tasks, path)
+        with open(tasks.get_journal_path(path), "w") as f:
+            for task in self.tasks[:: max(1, self.n // 100)]:
+                entry = {"op": "update", "task": {**task, "completed": True}}
+                f.write(json.dumps(entry) + "\n")
+        return path
+
+    def binary(self):
+        """Writes the tasks as a binary snapshot.
+
+        Returns:
+            str: The path of the snapshot.
+        """
+        path = self.path("tasks.tbin")
+        tasks.save_tasks(self.tasks, path)
+        return path
+
+    def indexed(self):
+        """Writes the tasks with a saved search index.
+
+        Returns:
+            str: The path of the tasks file.
+        """
+        path = self.path("indexed.json")
+        tasks.save_tasks(self.tasks, path)
+        tasks.load_search_index(self.tasks, path)
+        return path
+
+    def unshared(self):
+        """Forgets the shared store of the tasks file, so it is loaded again.
+
+        Returns:
+            str: The path of the tasks file.
+        """
+        shared._shared_stores.pop(os.path.abspath(self.json_path), None)
+        return self.json_path
+
+    def database(self):
+        """Writes the tasks to an SQLite database.
+
+        Returns:
+            str: The path of the database.
+        """
+        path = self.fresh("store.db")
+        sqlite.migrate_json_to_sqlite(self.json_path, path).close()
+        return path
+
+    def fresh(self, name):
+        """Gets the path of a file, removing any left from earlier runs."""
+        path = self.path(name)
+        if os.path.exists(path):
+            os.remove(path)
+        return path
+
+
+def _is_high(task):
+    return task["priority"] == "High"
+
+
+def _load_shared_store(path):
+    return len(shared.get_shared_store(path).load())
+
+
+def _load_store(uri):
+    store = backends.open_store(uri)
+    try:
+        return len(store.load())
+    finally:
+        store.close()
+
+
+# each benchmark turns a `BenchmarkData` into the call to time, so that
+# copying tasks and preparing files isn't timed
+BENCHMARKS = {
+    "load_tasks": lambda d: partial(tasks.load_tasks, d.json_path),
+    "open_tasks": lambda d: partial(_open_tasks, d.binary()),
+    "save_tasks": lambda d: partial(tasks.save_tasks, d.tasks, d.path("saved.json")),
+    "iter_tasks": lambda d: partial(
+        lambda path: sum(1 for _ in tasks.iter_tasks(path)), d.json_path
+    ),
+    "replay_journal": lambda d: partial(
+        tasks.replay_journal, d.tasks, tasks.get_journal_path(d.journaled())
+    ),
+    "append_journal": lambda d: partial(
+        tasks.append_journal,
+        {"op": "add", "task": {"id": d.n + 1}},
+        d.fresh("journal.json"),
+    ),
+    "append_journal_entries": lambda d: partial(
+        tasks.append_journal_entries,
+        [{"op": "add", "task": task} for task in d.tasks[:100]],
+        d.fresh("journal.json"),
+    ),
+    "journal_add_task": lambda d: partial(
+        tasks.journal_add_task, {"id": d.n + 1}, d.fresh("journal.json")
+    ),
+    "journal_update_task": lambda d: partial(
+        tasks.journal_update_task, d.tasks[0], d.fresh("journal.json")
+    ),
+    "journal_delete_task": lambda d: partial(
+        tasks.journal_delete_task, 1, d.fresh("journal.json")
+    ),
+    "compact_tasks": lambda d: partial(tasks.compact_tasks, d.journaled()),
+    "get_tasks_version": lambda d: partial(tasks.get_tasks_version, d.json_path),
+    "load_task_collection": lambda d: partial(tasks.load_task_collection, d.json_path),
+    "load_search_index": lambda d: partial(
+        tasks.load_search_index, d.tasks, d.indexed()
+    ),
+    "get_shared_store": lambda d: partial(_load_shared_store, d.unshared()),
+    "open_store": lambda d: partial(_load_store, "sqlite://" + d.database()),
+    "generate_unique_id": lambda d: partial(tasks.generate_unique_id, d.tasks),
+    "filter_tasks_by_priority": lambda d: partial(
+        tasks.filter_tasks_by_priority, d.tasks, "High"
+    ),
+    "filter_tasks_by_category": lambda d: partial(
+        tasks.filter_tasks_by_category, d.tasks, "Work"
+    ),
+    "filter_tasks_by_completion": lambda d: partial(
+        tasks.filter_tasks_by_completion, d.tasks, False
+    ),
+    "search_tasks": lambda d: partial(tasks.search_tasks, d.tasks, "task 1"),
+    "get_overdue_tasks": lambda d: partial(tasks.get_overdue_tasks, d.tasks),
+    "get_tasks_due_between": lambda d: partial(
+        tasks.get_tasks_due_between, d.tasks, date(2024, 3, 1), date(2024, 3, 31)
+    ),
+    "get_next_due_tasks": lambda d: partial(tasks.get_next_due_tasks, d.tasks, 10),
+    "sort_tasks": lambda d: partial(tasks.sort_tasks, d.tasks, "due_date"),
+    "complete_all_tasks": lambda d: partial(tasks.complete_all_tasks, d.copy()),
+    "update_where": lambda d: partial(
+        tasks.update_where, d.copy(), _is_high, {"category": "Work"}
+    ),
+    "complete_where": lambda d: partial(tasks.complete_where, d.copy(), _is_high),
+    "delete_where": lambda d: partial(tasks.delete_where, d.copy(), _is_high),
+    "bulk_import": lambda d: partial(
+        tasks.bulk_import, d.copy(), generate_tasks(max(1, d.n // 100), seed=1)
+    ),
+    "get_task_stats": lambda d: partial(tasks.get_task_stats, d.tasks),
+    "migrate_json_to_sqlite": lambda d: partial(
+        lambda *paths: sqlite.migrate_json_to_sqlite(*paths).close(),
+        d.json_path,
+        d.fresh("tasks.db"),
+    ),
+}
+
+# public functions that aren't benchmarked, since their cost doesn't depend
+# on the number of tasks or they are timed through the functions that use
+# them
+NOT_BENCHMARKED = {
+    "assign_ids",
+    "atomic_write",
+    "batched",
+    "get_group_commit_journal",
+    "get_journal_path",
+    "get_lock_path",
+    "get_meta_path",
+    "get_search_index_path",
+    "incomplete_due_key",
+    "is_json_lines",
+    "is_overdue",
+    "lock_tasks",
+    "register_store",
+    "sort_by_key",
+    "stats_due_date",
+    "timestamp_sort_key",
+    "to_json",
+    "updated_task",
+    "write_binary",
+    "write_json_lines",
+}
+
+
+def public_functions():
+    """Lists the public functions of `tasks.py` and the storage engines.
+
+    Returns:
+        list[str]: The function names.
+    """
+    modules = [tasks] + [
+        importlib.import_module(f"{storage.__name__}.{info.name}")
+        for info in pkgutil.iter_modules(storage.__path__)
+    ]
+    return [
+        name
+        for module in modules
+        for name, value in vars(module).items()
+        if inspect.isfunction(value)
+        and value.__module__ == module.__name__
+        and not name.startswith("_")
+    ]
+
+
+def _clear_caches():
+    """Clears the date parsing caches, so earlier benchmarks don't warm them."""
+    tasks.date_sort_key.cache_clear()
+    tasks._parse_timestamp_sort_key.cache_clear()
+
+
+def measure(make, data, repeat=1):
+    """Times a benchmark and measures its peak memory.
+
+    Args:
+        make (Callable): The benchmark; see `BENCHMARKS`.
+        data (BenchmarkData): The tasks to run it on.
+        repeat (int, optional): The number of timed runs; the fastest counts.
+
+    Returns:
+        dict[str, float]: The "time" in seconds and "peak" memory in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        call = make(data)
+        _clear_caches()
+        times.append(time_call(call))
+
+    # measured separately, since tracing slows everything down
+    call = make(data)
+    _clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"time": min(times), "peak": peak}
+
+
+def run_suite(sizes=SUITE_SIZES, names=None, repeat=1, **options):
+    """Runs the benchmark suite.
+
+    Args:
+        sizes (Iterable[int], optional): The numbers of tasks to benchmark with.
+        names (Iterable[str], optional): The benchmarks to run. Defaults to all.
+        repeat (int, optional): The number of timed runs of each benchmark.
+        **options: Options for `generate_tasks`.
+
+    Returns:
+        dict[str, dict[str, dict[str, float]]]: Measurements by benchmark
+            name and then number of tasks; see `measure`
+    """
+    names = list(names or BENCHMARKS)
+    results = {name: {} for name in names}
+
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            data = BenchmarkData(n, directory, **options)
+            for name in names:
+                results[name][str(n)] = measure(BENCHMARKS[name], data, repeat)
+
+    return results
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """Saves suite results as the baseline to compare against.
+
+    Args:
+        results (dict): Results from `run_suite`.
+        path (str, optional): Where to save them.
+    """
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Loads the baseline saved by `save_baseline`.
+
+    Args:
+        path (str, optional): Where it was saved.
+
+    Returns:
+        dict | None: The baseline results, or None if there isn't one.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def find_regressions(results, baseline, threshold=0.5):
+    """Compares suite results against a baseline.
+
+    Args:
+        results (dict): Results from `run_suite`.
+        baseline (dict): Earlier results, e.g. from `load_baseline`.
+        threshold (float, optional): How much slower or larger a measurement
+            may get, as a fraction of the baseline, before it counts.
+
+    Returns:
+        list[tuple[str, str, str, float, float]]: (benchmark, size, "time" or
+            "peak", baseline, current) rows for each regression
+    """
+    floors = {"time": MIN_TIME_REGRESSION, "peak": MIN_PEAK_REGRESSION}
+    regressions = []
+
+    for name, sizes in results.items():
+        for n, current in sizes.items():
+            old = baseline.get(name, {}).get(n)
+            if old is None:
+                continue
+            for metric, floor in floors.items():
+                if current[metric] > max(
+                    old[metric] * (1 + threshold), old[metric] + floor
+                ):
+                    regressions.append((name, n, metric, old[metric], current[metric]))
+
+    return regressions
+
+
+def format_results(results):
+    """Formats suite results as table rows.
+
+    Args:
+        results (dict): Results from `run_suite`.
+
+    Returns:
+        list[dict[str, Any]]: One row per benchmark and size.
+    """
+    return [
+        {
+            "benchmark": name,
+            "tasks": int(n),
+            "time (ms)": round(measured["time"] * 1000, 3),
+            "peak (MB)": round(measured["peak"] / 1e6, 3),
+        }
+        for name, sizes in results.items()
+        for n, measured in sizes.items()
+    ]
+
+
+def run_suite_cli(args):
+    results = run_suite(args.sizes or SUITE_SIZES, args.only, args.repeat)
+
+    print(f"{'benchmark':<28} {'tasks':>10} {'time (ms)':>12} {'peak (MB)':>10}")
+    for row in format_results(results):
+        print(
+            f"{row['benchmark']:<28} {row['tasks']:>10} "
+            f"{row['time (ms)']:>12.3f} {row['peak (MB)']:>10.3f}"
+        )
+
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; create one with --save")
+        return 0
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, n, metric, old, new in regressions:
+        print(f"REGRESSION {name} ({n} tasks) {metric}: {old:.6g} -> {new:.6g}")
+    if not regressions:
+        print("\nNo regressions")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmark")
+    parser.add_argument("sizes", nargs="*", type=int, help="numbers of tasks")
+    parser.add_argument("--suite", action="store_true", help="time every function")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="save a new baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="allowed slowdown as a fraction of the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        return run_suite_cli(args)
+
+    sizes = args.sizes or DEFAULT_SIZES
+
+    print(f"{'tasks':>10} {'key':>12} {'legacy':>10} {'current':>10} {'top 50':>10}")
+    for n, sort_by, legacy, current, top in benchmark_sort(sizes):
+        print(f"{n:>10} {sort_by:>12} {legacy:>10.3f} {current:>10.3f} {top:>10.3f}")
+
+    print()
+    print(f"{'tasks':>10} {'dict MB':>10} {'Task MB':>10}")
+    for n, dict_size, task_size in benchmark_memory(sizes):
+        print(f"{n:>10} {dict_size / 1e6:>10.1f} {task_size / 1e6:>10.1f}")
+
+    print()
+    print(f"{'tasks':>10} {'workers':>10} {'stats':>10} {'filter':>10}")
+    for n, workers, stats, filtered in benchmark_parallel(sizes):
+        print(f"{n:>10} {workers or 'serial':>10} {stats:>10.3f} {filtered:>10.3f}")
+
+    print()
+    print(f"{'tasks':>10} {'json':>10} {'jsonl':>10} {'binary':>10}")
+    for n, json_time, lines_time, binary_time in benchmark_startup(sizes):
+        print(f"{n:>10} {json_time:>10.3f} {lines_time:>10.3f} {binary_time:>10.4f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,42 +1,254 @@
+"""Code coverage for the test runner in tests/runner.py.
+
+Coverage is only measured in the test subprocess, never in the app, using
+pytest-cov: each xdist worker writes its own data file (coverage's parallel
+mode) and they are combined when the session ends. Every line is recorded
+with the test that ran it, and the data is kept in `temp/.coverage` along
+with a copy of the sources it was measured on. That lets a later run work
+out which tests a change to `src/` can affect, rerun only those, and merge
+their coverage into the saved data.
+
+`coverage` is imported where it is used, so the app can import the runner
+without it.
+"""
+
+import difflib
 import os
+import shutil
+from pathlib import Path
+
+from tests.common import REPO_DIR, SRC_DIR
 
-import coverage
-import pytest
+COVERAGE_PATH = str(Path(REPO_DIR) / "temp" / ".coverage")
+# copies of the sources `COVERAGE_PATH` was measured on, to diff against
+SNAPSHOT_DIR = str(Path(REPO_DIR) / "temp" / "coverage_sources")
+# the context of lines run while importing, rather than by a test
+IMPORT_CONTEXT = ""
 
-from tests.common import SRC_DIR, TEST_DIR
 
-cov = coverage.Coverage(source=[SRC_DIR])
+def pytest_options():
+    """Gets the pytest options that measure coverage for the runner.
+
+    Returns:
+        list[str]: The options.
+    """
+    return [f"--cov={SRC_DIR}", "--cov-report=", "--cov-context=test"]
 
 
 def get_code_coverage():
-    """Runs code coverage for all tests.
+    """Gets code coverage for all tests.
+
+    Coverage is measured by the shared test session in tests/runner.py, so
+    it is only re-measured when the code changes.
 
     Returns:
         list[tuple[str, int]]: a list of (filename, coverage %) pairs
     """
-    cov.start()
+    from tests.runner import run_all
 
-    pytest.main([TEST_DIR])
+    return [tuple(report) for report in run_all()["coverage"]]
 
-    # Stop coverage and save data
-    cov.stop()
 
-    # Access coverage stats
-    data = cov.get_data()
-    covered_files = data.measured_files()
+def coverage_percentages(data_file=COVERAGE_PATH):
+    """Reads per-file coverage from a coverage data file.
 
-    coverage_reports = []
+    Args:
+        data_file (str, optional): The coverage data file.
 
-    # Process stats for each file
-    for filename in covered_files:
-        _, executed, excluded, not_executed, _ = cov.analysis2(filename)
-        num_executed = len(executed)
-        num_excluded = len(excluded)
-        num_not_executed = len(not_executed)
+    Returns:
+        list[tuple[str, float]]: (filename, coverage %) pairs.
+    """
+    import coverage
 
-        total_lines = num_executed + num_excluded + num_not_executed
-        covered = total_lines - num_not_executed
+    if not os.path.exists(data_file):
+        return []
+
+    cov = coverage.Coverage(data_file=data_file, source=[SRC_DIR])
+    cov.load()
+
+    coverage_reports = []
+    for filename in sorted(cov.get_data().measured_files()):
+        if not os.path.exists(filename):
+            continue
+        _, executed, excluded, not_executed, _ = cov.analysis2(filename)
+        total_lines = len(executed) + len(excluded) + len(not_executed)
+        covered = total_lines - len(not_executed)
         coverage_percent = 100.0 * (covered / total_lines) if total_lines > 0 else 0
         coverage_reports.append((os.path.basename(filename), coverage_percent))
 
     return coverage_reports
+
+
+def affected_tests(changed):
+    """Finds the tests that ran code changed in `src/` since coverage was saved.
+
+    A test is affected if it ran a line that was since changed or removed,
+    or a line next to where new lines were added. Changes to lines run on
+    import, like definitions and constants, can affect any test, so those
+    need every test to run again. So do changes to code that no test ran in
+    its own process, like a new file or code only run in a subprocess, which
+    coverage can't tie to any test.
+
+    Args:
+        changed (Iterable[str]): Paths of the changed `src/` files, relative
+            to the repo.
+
+    Returns:
+        set[str] | None: The node ids of the affected tests, or None if every
+            test needs to run.
+    """
+    import coverage
+
+    if not os.path.exists(COVERAGE_PATH):
+        return None
+
+    data = coverage.CoverageData(COVERAGE_PATH)
+    data.read()
+    affected = set()
+
+    for path in changed:
+        filename = os.path.join(REPO_DIR, path)
+        snapshot = os.path.join(SNAPSHOT_DIR, path)
+        if filename not in data.measured_files() or not os.path.exists(snapshot):
+            return None
+
+        contexts = data.contexts_by_lineno(filename)
+        old_lines = _read_lines(snapshot)
+        for line in _changed_lines(snapshot, filename):
+            if line not in contexts:
+                if _is_code(old_lines[line - 1]):
+                    return None  # no test ran it here
+                continue
+            for context in contexts[line]:
+                if context == IMPORT_CONTEXT:
+                    return None
+                affected.add(context.rsplit("|", 1)[0])
+
+    return affected
+
+
+def line_maps(changed):
+    """Maps the unchanged lines of changed `src/` files to where they are now.
+
+    Args:
+        changed (Iterable[str]): Paths of the changed files, relative to the
+            repo.
+
+    Returns:
+        dict[str, dict[int, int]]: Old to new line numbers, by file name.
+    """
+    return {
+        os.path.join(REPO_DIR, path): _line_map(
+            os.path.join(SNAPSHOT_DIR, path), os.path.join(REPO_DIR, path)
+        )
+        for path in changed
+    }
+
+
+def merge_coverage(old_file, new_file, rerun, moved, merged_file):
+    """Merges the coverage of a partial run into earlier coverage.
+
+    Lines recorded for the tests that were rerun are replaced by the new
+    ones, and the other lines of changed files are moved to where they are
+    now.
+
+    Args:
+        old_file (str): The earlier coverage data.
+        new_file (str): Coverage data from the tests that were rerun, which
+            may not exist if none were.
+        rerun (Callable[[str], bool]): Whether a test was rerun, by node id.
+        moved (dict[str, dict[int, int]]): `line_maps` of the changed files.
+        merged_file (str): Where to write the merged data.
+    """
+    import coverage
+
+    old = coverage.CoverageData(old_file)
+    old.read()
+    merged = coverage.CoverageData(merged_file)
+
+    for filename in old.measured_files():
+        if not os.path.exists(filename):
+            continue
+        line_map = moved.get(filename)
+        by_context = {}
+        for line, contexts in old.contexts_by_lineno(filename).items():
+            if line_map is not None:
+                line = line_map.get(line)
+                if line is None:
+                    continue
+            for context in contexts:
+                if context == IMPORT_CONTEXT or not rerun(context.rsplit("|", 1)[0]):
+                    by_context.setdefault(context, set()).add(line)
+        for context, lines in by_context.items():
+            merged.set_context(context)
+            merged.add_lines({filename: sorted(lines)})
+
+    if os.path.exists(new_file):
+        new = coverage.CoverageData(new_file)
+        new.read()
+        merged.update(new)
+    merged.write()
+
+
+def save_coverage(data_file):
+    """Keeps coverage data for the current sources, for later runs to reuse.
+
+    Args:
+        data_file (str): The coverage data.
+    """
+    os.makedirs(os.path.dirname(COVERAGE_PATH), exist_ok=True)
+    shutil.copyfile(data_file, COVERAGE_PATH)
+
+    shutil.rmtree(SNAPSHOT_DIR, ignore_errors=True)
+    for source in Path(SRC_DIR).rglob("*.py"):
+        target = Path(SNAPSHOT_DIR) / os.path.relpath(source, REPO_DIR)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, target)
+
+
+def _read_lines(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+
+def _is_code(line):
+    """Whether a line can run, rather than being blank or a comment."""
+    stripped = line.strip()
+    return bool(stripped) and not stripped.startswith("#")
+
+
+def _changed_lines(old_path, new_path):
+    """Gets the old line numbers a change touched.
+
+    Args:
+        old_path (str): The file before the change.
+        new_path (str): The file after the change.
+
+    Returns:
+        set[int]: Changed or removed lines, and the lines either side of
+            where lines were added.
+    """
+    old_lines = _read_lines(old_path)
+    matcher = difflib.SequenceMatcher(None, old_lines, _read_lines(new_path))
+    changed = set()
+    for tag, i1, i2, _, _ in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        # line numbers start at 1; an insertion touches its neighbours
+        changed.update(range(max(i1, 1), min(i2 + 1, len(old_lines)) + 1))
+    return changed
+
+
+def _line_map(old_path, new_path):
+    """Maps the old line numbers of unchanged lines to their new ones."""
+    matcher = difflib.SequenceMatcher(
+        None, _read_lines(old_path), _read_lines(new_path)
+    )
+    return {
+        i + 1 + offset: j + 1 + offset
+        for i, j, size in matcher.get_matching_blocks()
+        for offset in range(size)
+    }
@@ -1,24 +1,14 @@
 import sys
 from pathlib import Path
 
-import pytest
-
 sys.path.append(str(Path(__file__).parents[1]))
 
 
-class TestReporter:
-    def __init__(self):
-        self.reports = set()
-
-    def pytest_runtest_logreport(self, report):
-        if report.when == "call":
-            self.reports.add((report.nodeid, report.passed))
-
-
 def run_pytest(file):
-    reporter = TestReporter()
-    pytest.main([file], plugins=[reporter])
-    return reporter.reports
+    # every test runs in one shared, cached session; see tests/runner.py
+    from tests import runner
+
+    return runner.reports_for(file)
 
 
 _test_dir = Path(__file__).parent.resolve()
@@ -0,0 +1,30 @@
+"""Markers and shared fixtures for the test suite.
+
+subprocess: the test runs code in other processes, where coverage can't
+    tie it to the test, so tests/runner.py reruns it after any change
+    to `src/`.
+"""
+
+import pytest
+
+from src import tasks
+from tests.common import TEST_DATA
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "subprocess: runs code in other processes, out of sight of coverage",
+    )
+
+
+@pytest.fixture
+def test_data():
+    return [task.copy() for task in TEST_DATA]
+
+
+@pytest.fixture
+def tasks_file(tmp_path, test_data):
+    path = str(tmp_path / "tasks.json")
+    tasks.save_tasks(test_data, path)
+    return path
@@ -0,0 +1,157 @@
+"""Startup Report
+
+Run from the root project directory:
+
+    python -m tests.importtime [--top N] [--check]
+
+to see how long a cold start of the app spends importing, using Python's
+`-X importtime`, and which modules take longest. With `--check` it exits
+with status 1 if startup went over `STARTUP_BUDGET` or imported any of the
+`LAZY_MODULES` that the app should only load when they're needed.
+"""
+
+import argparse
+import subprocess
+import sys
+
+from tests.common import SRC_DIR
+
+APP_MODULE = "app"
+# test tooling and optional dependencies the app only imports on first use
+LAZY_MODULES = (
+    "pytest",
+    "pytest_bdd",
+    "coverage",
+    "hypothesis",
+    "numpy",
+    "tests.benchmark",
+)
+# seconds the app may spend importing, not counting streamlit itself
+STARTUP_BUDGET = 0.1
+
+
+def import_times(module=APP_MODULE, path=SRC_DIR):
+    """Imports a module in a new interpreter with `-X importtime`.
+
+    Args:
+        module (str, optional): The module to import.
+        path (str, optional): The directory to import it from.
+
+    Returns:
+        list[dict[str, Any]]: Every module imported, in the order they
+            finished, with its "module" name, import "depth" (0 for `module`
+            itself), and "self" and "cumulative" (including the modules it
+            imported) times in seconds.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    imports = []
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports.append(
+            {
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self": int(self_us) / 1e6,
+                "cumulative": int(cumulative_us) / 1e6,
+            }
+        )
+
+    # depths are relative to the top level, where `module` is
+    top = next(i["depth"] for i in imports if i["module"] == module)
+    for i in imports:
+        i["depth"] -= top
+    return imports
+
+
+def startup_report(module=APP_MODULE, path=SRC_DIR, top=15):
+    """Measures a cold start of a module.
+
+    Args:
+        module (str, optional): The module to import.
+        path (str, optional): The directory to import it from.
+        top (int, optional): How many of the slowest imports to list.
+
+    Returns:
+        dict[str, Any]: The "total" seconds spent importing `module`, the
+            "startup" seconds of that not spent importing streamlit, the
+            "slowest" direct imports of `module` (see `import_times`), and
+            which of the `LAZY_MODULES` were "eagerly" imported.
+    """
+    imports = import_times(module, path)
+    # everything `module` imported, which are listed before it
+    end = next(n for n, i in enumerate(imports) if i["module"] == module)
+    start = end
+    while start > 0 and imports[start - 1]["depth"] > 0:
+        start -= 1
+    own = imports[start : end + 1]
+
+    total = own[-1]["cumulative"]
+    streamlit = sum(
+        i["cumulative"] for i in own if i["module"] == "streamlit" and i["depth"] == 1
+    )
+    names = {i["module"] for i in own}
+    return {
+        "total": total,
+        "startup": total - streamlit,
+        "slowest": sorted(
+            (i for i in own if i["depth"] == 1),
+            key=lambda i: i["cumulative"],
+            reverse=True,
+        )[:top],
+        "eagerly": [name for name in LAZY_MODULES if name in names],
+    }
+
+
+def check_startup(report, budget=STARTUP_BUDGET):
+    """Checks a `startup_report` against the budget.
+
+    Args:
+        report (dict[str, Any]): The report.
+        budget (float, optional): The most seconds startup may take.
+
+    Returns:
+        list[str]: Descriptions of what went over, if anything did.
+    """
+    problems = [f"imports {name} on startup" for name in report["eagerly"]]
+    if report["startup"] > budget:
+        problems.append(
+            f"startup took {report['startup']:.3f}s, over the {budget:.3f}s budget"
+        )
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tests.importtime")
+    parser.add_argument("--module", default=APP_MODULE)
+    parser.add_argument("--path", default=SRC_DIR)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET)
+    parser.add_argument("--check", action="store_true", help="fail over budget")
+    args = parser.parse_args(argv)
+
+    report = startup_report(args.module, args.path, args.top)
+    print(f"{'import':<40} {'seconds':>10}")
+    for i in report["slowest"]:
+        print(f"{i['module']:<40} {i['cumulative']:>10.4f}")
+    print()
+    print(f"{'total':<40} {report['total']:>10.4f}")
+    print(f"{'without streamlit':<40} {report['startup']:>10.4f}")
+
+    problems = check_startup(report, args.budget)
+    for problem in problems:
+        print(f"{args.module} {problem}", file=sys.stderr)
+    return 1 if args.check and problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""A pytest plugin that streams test results as JSON lines, for tests/runner.py.
+
+Enable it with `-p tests.progress`. Events are appended to the file named by
+the TEST_PROGRESS_FILE environment variable, one JSON object per line:
+
+    {"event": "collected", "count": 42}
+    {"event": "test", "nodeid": "...", "when": "call", "outcome": "passed",
+     "duration": 0.01, "subprocess": false}
+    {"event": "finished", "exitstatus": 0}
+
+The "test" event is wrapped here to fit, but is one line in the file. Its
+"subprocess" is whether the test is marked `subprocess`, as running code in
+other processes that coverage can't tie to it.
+"""
+
+import json
+import os
+
+import pytest
+
+PROGRESS_ENV = "TEST_PROGRESS_FILE"
+
+
+def pytest_configure(config):
+    path = os.environ.get(PROGRESS_ENV)
+    # with xdist, results from every worker are reported by the controller
+    if path and not hasattr(config, "workerinput"):
+        config.pluginmanager.register(ProgressReporter(path), "progress-reporter")
+
+
+class ProgressReporter:
+    def __init__(self, path):
+        self.file = open(path, "a", buffering=1)
+        self.collected = False
+
+    def write(self, **event):
+        self.file.write(json.dumps(event) + "\n")
+
+    def pytest_collection_finish(self, session):
+        # the xdist controller collects nothing itself; see below
+        if session.items:
+            self.collected = True
+            self.write(event="collected", count=len(session.items))
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node, ids):
+        if not self.collected:
+            self.collected = True
+            self.write(event="collected", count=len(ids))
+
+    def pytest_runtest_logreport(self, report):
+        # setup and teardown only matter when they fail or skip the test
+        if report.when == "call" or report.outcome != "passed":
+            self.write(
+                event="test",
+                nodeid=report.nodeid,
+                when=report.when,
+                outcome=report.outcome,
+                duration=report.duration,
+                subprocess="subprocess" in report.keywords,
+            )
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        self.write(event="finished", exitstatus=int(exitstatus))
+
+    def pytest_unconfigure(self, config):
+        self.file.close()
@@ -0,0 +1,618 @@
+"""Runs every test pass in one parallel pytest session, with cached results.
+
+The unit, TDD and BDD tests, the HTML report and code coverage all come from
+a single run over `tests/`, spread over `pytest-xdist` workers. The run is a
+background `TestJob` in its own process, which streams per-test results as
+it goes and can be cancelled. Results are cached by a hash of the sources in
+`src/` and `tests/`, so asking again without changing any code returns
+immediately, and a history of past runs is kept with per-test durations.
+
+When only some files changed, only the tests they can affect are rerun:
+changed test modules, and the tests whose saved coverage (see
+tests/code_coverage.py) ran a changed line in `src/`. Tests marked
+`subprocess` run code where coverage can't see it, so they are rerun after
+any change to `src/`. Their results are merged with the cached ones.
+
+Importing this module is cheap, for the app: pytest and coverage only load
+once a job runs.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from tests import code_coverage
+from tests.common import REPO_DIR, SRC_DIR, TEST_DATA_PATH, TEST_DIR
+
+CACHE_PATH = str(Path(REPO_DIR) / "temp" / "test_results.json")
+HISTORY_PATH = str(Path(REPO_DIR) / "temp" / "test_history.json")
+HISTORY_LIMIT = 20
+# finished jobs kept for `get_job`, besides any still running
+JOB_LIMIT = 20
+# number of xdist workers; "auto" uses one per core
+WORKERS = "auto"
+# seconds between checks of a running job for new results
+POLL_INTERVAL = 0.2
+SOURCE_PATTERNS = ("*.py", "*.feature")
+
+_lock = threading.Lock()
+_results = None
+_jobs = {}
+_job_ids = itertools.count(1)
+
+
+def source_files(dirs=(SRC_DIR, TEST_DIR)):
+    """Lists the files the test results depend on.
+
+    Args:
+        dirs (Iterable[str], optional): The directories to look in.
+
+    Returns:
+        list[Path]: The files, in a stable order.
+    """
+    files = {Path(TEST_DATA_PATH)} if Path(TEST_DATA_PATH).exists() else set()
+    for directory in dirs:
+        for pattern in SOURCE_PATTERNS:
+            files.update(Path(directory).rglob(pattern))
+    return sorted(files)
+
+
+def source_digests(dirs=(SRC_DIR, TEST_DIR)):
+    """Hashes each of the files the test results depend on.
+
+    Args:
+        dirs (Iterable[str], optional): The directories to look in.
+
+    Returns:
+        dict[str, str]: Hex digests, by path relative to the repo.
+    """
+    return {
+        Path(os.path.relpath(path, REPO_DIR))
+        .as_posix(): hashlib.sha256(path.read_bytes())
+        .hexdigest()
+        for path in source_files(dirs)
+    }
+
+
+def source_hash(dirs=(SRC_DIR, TEST_DIR), digests=None):
+    """Hashes the files the test results depend on.
+
+    Args:
+        dirs (Iterable[str], optional): The directories to look in.
+        digests (dict[str, str], optional): Their `source_digests`, if
+            already known.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    for path, file_digest in sorted((digests or source_digests(dirs)).items()):
+        digest.update(f"{path}\0{file_digest}\0".encode())
+    return digest.hexdigest()
+
+
+def run_all(force=False):
+    """Runs every test pass and waits for the results; see `start_job`.
+
+    Args:
+        force (bool, optional): Run even if there are cached results.
+
+    Returns:
+        dict[str, Any]: The "hash" of the sources, the "files" it covers by
+            their digests, the "reports" as [nodeid, passed] pairs, the
+            "html" report (None if only some tests were rerun), the
+            "coverage" as [filename, coverage %] pairs, and the node ids of
+            the "subprocess" tests.
+
+    Raises:
+        RuntimeError: If the run was cancelled.
+    """
+    return start_job(force).wait()
+
+
+def start_job(force=False, full=False):
+    """Starts running every test pass in the background.
+
+    If the sources haven't changed since the last run, the job is already
+    finished, with the cached results. If only some have, only the tests
+    they can affect are run, unless `full` is set. If a run of the current
+    sources is already going, that job is returned instead of starting
+    another.
+
+    Args:
+        force (bool, optional): Run even if there are cached results.
+        full (bool, optional): Run every test, for the HTML report.
+
+    Returns:
+        TestJob: The job.
+    """
+    global _results
+
+    with _lock:
+        files = source_digests()
+        key = source_hash(digests=files)
+        for job in reversed(list(_jobs.values())):
+            if job.key == key and job.state == "running" and (job.full or not full):
+                return job
+
+        if _results is None or _results["hash"] != key:
+            _results = _load_json(CACHE_PATH) or _results
+        if not force and _results is not None and _results["hash"] == key:
+            if _results["html"] is not None or not full:
+                job = TestJob.from_results(next(_job_ids), _results)
+                _add_job(job)
+                return job
+
+        selection = None
+        if not (force or full) and _results is not None and "files" in _results:
+            selection = select_tests(
+                _results["files"], files, _results.get("subprocess", ())
+            )
+
+        if selection is None:
+            job = TestJob(next(_job_ids), key, files=files)
+        else:
+            job = TestJob(next(_job_ids), key, selection, files=files, base=_results)
+        _add_job(job)
+        return job
+
+
+def _add_job(job):
+    """Keeps a new job, forgetting the oldest finished ones past `JOB_LIMIT`."""
+    _jobs[job.id] = job
+    finished = [job_id for job_id, other in _jobs.items() if other.done]
+    for job_id in finished[: len(finished) - JOB_LIMIT]:
+        del _jobs[job_id]
+
+
+def select_tests(old_files, new_files, subprocess_tests=()):
+    """Picks the tests to rerun after some files changed.
+
+    Those are the changed test modules, and the tests that ran a changed line
+    in `src/`, or may have in another process if anything in `src/` changed.
+    Every test needs to run again if anything else changed, like a helper
+    module, a feature file or the test data, or if a change was to a line
+    run on import or one no test was seen to run.
+
+    Args:
+        old_files (dict[str, str]): `source_digests` of the last run.
+        new_files (dict[str, str]): `source_digests` now.
+        subprocess_tests (Iterable[str], optional): Node ids of the tests
+            marked `subprocess`.
+
+    Returns:
+        list[str] | None: The test modules and node ids to run, or None to
+            run every test.
+    """
+    changed = {
+        path
+        for path in old_files.keys() | new_files.keys()
+        if old_files.get(path) != new_files.get(path)
+    }
+    modules = set()
+    changed_sources = []
+    for path in changed:
+        name = Path(path).name
+        if path.startswith("src/") and name.endswith(".py"):
+            changed_sources.append(path)
+        elif (
+            path.startswith("tests/")
+            and name.startswith("test_")
+            and name.endswith(".py")
+        ):
+            if path in new_files:  # the tests of deleted modules just go
+                modules.add(path)
+        else:
+            return None
+
+    affected = code_coverage.affected_tests(changed_sources)
+    if affected is None:
+        return None
+    if changed_sources:
+        affected.update(subprocess_tests)
+    return sorted(modules) + sorted(
+        nodeid
+        for nodeid in affected
+        if nodeid.split("::")[0] in new_files.keys() - modules
+    )
+
+
+def get_job(job_id):
+    """Looks up a job started by `start_job`.
+
+    Args:
+        job_id (int): The job's id.
+
+    Returns:
+        TestJob | None: The job, or None if there is no such job or it was
+            forgotten; only the last `JOB_LIMIT` finished jobs are kept.
+    """
+    return _jobs.get(job_id)
+
+
+def job_history():
+    """Gets the runs that have ended, including those of earlier processes.
+
+    Cancelled runs are included, with the tests that finished before they
+    were cancelled.
+
+    Returns:
+        list[dict[str, Any]]: The runs, newest first, each with its "id",
+            "started" time, "duration", "state", "passed" and "failed"
+            counts, and per-test "durations" in seconds.
+    """
+    return list(reversed(_load_json(HISTORY_PATH) or []))
+
+
+class TestJob:
+    """A test session running in a background process.
+
+    `reports` fills up with per-test results as they come in; `state` is
+    "running" until the job ends as "passed", "failed", "cancelled" or
+    "error".
+    """
+
+    __test__ = False  # not a test class, despite the name
+
+    def __init__(self, job_id, key, paths=(TEST_DIR,), files=None, base=None):
+        """
+        Args:
+            job_id (int): The job's id.
+            key (str): The `source_hash` being tested.
+            paths (Iterable[str], optional): The tests to run.
+            files (dict[str, str], optional): The `source_digests` being
+                tested, to pick the tests a later run needs to rerun.
+            base (dict, optional): Results of an earlier run to merge into,
+                when `paths` are only the tests to rerun. Its coverage must
+                be the saved coverage.
+        """
+        self.id = job_id
+        self.key = key
+        self.full = base is None
+        self.started = time.time()
+        self.finished = None
+        self.state = "running"
+        self.total = None
+        self.reports = []
+        self.results = None
+        self._files = files
+        self._base = base
+        self._done = threading.Event()
+        self._directory = tempfile.mkdtemp(prefix="test-job-")
+        self._progress_path = os.path.join(self._directory, "progress.jsonl")
+        self._progress_offset = 0
+        self._coverage_path = os.path.join(self._directory, ".coverage")
+        if base is not None:
+            self._paths = set(paths)
+            self._keep_coverage(base["files"])
+        self._process = self._launch(paths) if paths else None
+
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    @classmethod
+    def from_results(cls, job_id, results):
+        """Makes an already finished job from cached results.
+
+        Args:
+            job_id (int): The job's id.
+            results (dict): Results from an earlier job.
+
+        Returns:
+            TestJob: The job.
+        """
+        job = cls.__new__(cls)
+        job.id = job_id
+        job.key = results["hash"]
+        job.full = results["html"] is not None
+        job.started = job.finished = time.time()
+        job.reports = [
+            {"nodeid": nodeid, "outcome": "passed" if passed else "failed"}
+            for nodeid, passed in results["reports"]
+        ]
+        job.total = len(job.reports)
+        job.results = results
+        job.state = _final_state(job.reports)
+        job._done = threading.Event()
+        job._done.set()
+        return job
+
+    @property
+    def done(self):
+        """bool: Whether the job has ended."""
+        return self._done.is_set()
+
+    @property
+    def duration(self):
+        """float: Seconds the job has run for so far."""
+        return (self.finished or time.time()) - self.started
+
+    def wait(self, timeout=None):
+        """Waits for the job to end.
+
+        Args:
+            timeout (float, optional): Seconds to wait for. Defaults to forever.
+
+        Returns:
+            dict | None: The results (see `run_all`), or None on timeout.
+
+        Raises:
+            RuntimeError: If the job was cancelled or couldn't run.
+        """
+        if not self._done.wait(timeout):
+            return None
+        if self.results is None:
+            raise RuntimeError(f"test run {self.id} {self.state}")
+        return self.results
+
+    def cancel(self):
+        """Stops the job, if it is still running."""
+        if self.done or self._process is None or self._process.poll() is not None:
+            return
+        self.state = "cancelled"
+        try:
+            if hasattr(os, "killpg"):
+                # stop the xdist workers too
+                os.killpg(self._process.pid, signal.SIGTERM)
+            else:
+                self._process.terminate()
+        except ProcessLookupError:
+            pass
+
+    def _keep_coverage(self, old_files):
+        """Copies what merging the saved coverage needs, before it changes."""
+        changed = [
+            path
+            for path, digest in self._files.items()
+            if path.startswith("src/") and old_files.get(path) != digest
+        ]
+        self._moved = code_coverage.line_maps(changed)
+        self._base_coverage_path = os.path.join(self._directory, "base.coverage")
+        shutil.copyfile(code_coverage.COVERAGE_PATH, self._base_coverage_path)
+
+    def _launch(self, paths):
+        from tests.progress import PROGRESS_ENV  # imports pytest
+
+        env = {
+            **os.environ,
+            PROGRESS_ENV: self._progress_path,
+            # keep coverage data out of the repo; xdist workers each write
+            # their own file next to it, combined when the session ends
+            "COVERAGE_FILE": self._coverage_path,
+        }
+        # node ids can be too many for the command line
+        args_path = os.path.join(self._directory, "args.txt")
+        with open(args_path, "w") as f:
+            f.write("\n".join(paths))
+        command = [
+            sys.executable,
+            "-m",
+            "pytest",
+            f"@{args_path}",
+            f"--rootdir={REPO_DIR}",
+            f"--numprocesses={WORKERS}",
+            *code_coverage.pytest_options(),
+            "-p",
+            "tests.progress",
+        ]
+        if self.full:
+            command += [
+                f"--html={os.path.join(self._directory, 'report.html')}",
+                "--self-contained-html",
+            ]
+
+        with open(os.path.join(self._directory, "output.txt"), "w") as output:
+            return subprocess.Popen(
+                command,
+                cwd=REPO_DIR,
+                env=env,
+                stdout=output,
+                stderr=subprocess.STDOUT,
+                start_new_session=hasattr(os, "killpg"),
+            )
+
+    def _watch(self):
+        """Collects results until the process ends, then finishes the job."""
+        try:
+            while self._process is not None and self._process.poll() is None:
+                self._read_progress()
+                time.sleep(POLL_INTERVAL)
+            self._read_progress()
+            self._finish()
+        except Exception:
+            self.state = "error"
+            raise
+        finally:
+            self.finished = time.time()
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._done.set()
+
+    def _read_progress(self):
+        try:
+            with open(self._progress_path, "rb") as f:
+                f.seek(self._progress_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        # leave a line that is still being written for next time
+        data = data[: data.rfind(b"\n") + 1]
+        self._progress_offset += len(data)
+
+        for line in data.splitlines():
+            event = json.loads(line)
+            if event["event"] == "collected":
+                self.total = event["count"]
+            elif event["event"] == "test":
+                self.reports.append(event)
+
+    def _finish(self):
+        global _results
+
+        if self.state == "cancelled":
+            self._record()
+            return
+        # 1 means tests failed, 5 that none were selected
+        if self._process is not None and self._process.returncode not in (0, 1, 5):
+            self.state = "error"
+            self._record()
+            return
+
+        reports = [
+            [report["nodeid"], report["outcome"] == "passed"]
+            for report in self.reports
+            if report["outcome"] != "skipped"
+        ]
+        subprocess_tests = {
+            report["nodeid"] for report in self.reports if report.get("subprocess")
+        }
+        coverage_path = self._coverage_path
+        if self._base is not None:
+            # keep the results of the tests that weren't rerun
+            reports += [
+                [nodeid, passed]
+                for nodeid, passed in self._base["reports"]
+                if self._kept(nodeid)
+            ]
+            subprocess_tests.update(
+                nodeid
+                for nodeid in self._base.get("subprocess", ())
+                if self._kept(nodeid)
+            )
+            coverage_path = os.path.join(self._directory, "merged.coverage")
+            code_coverage.merge_coverage(
+                self._base_coverage_path,
+                self._coverage_path,
+                self._rerun,
+                self._moved,
+                coverage_path,
+            )
+
+        self.results = {
+            "hash": self.key,
+            "files": self._files,
+            "reports": sorted(reports),
+            "html": _read_text(os.path.join(self._directory, "report.html")),
+            "coverage": code_coverage.coverage_percentages(coverage_path),
+            "subprocess": sorted(subprocess_tests),
+        }
+        self.state = _final_state(
+            [{"outcome": "passed" if passed else "failed"} for _, passed in reports]
+        )
+        self.finished = time.time()
+
+        with _lock:
+            if self._files is not None and self.key == source_hash():
+                _results = self.results
+                _save_json(CACHE_PATH, self.results)
+                if os.path.exists(coverage_path):
+                    code_coverage.save_coverage(coverage_path)
+        self._record()
+
+    def _record(self):
+        """Adds the job to the history, once it has ended."""
+        self.finished = self.finished or time.time()
+        with _lock:
+            history = _load_json(HISTORY_PATH) or []
+            history.append(self.summary())
+            _save_json(HISTORY_PATH, history[-HISTORY_LIMIT:])
+
+    def _rerun(self, nodeid):
+        """Whether a test was rerun, when only some were."""
+        return nodeid in self._paths or nodeid.split("::")[0] in self._paths
+
+    def _kept(self, nodeid):
+        """Whether an earlier result still stands, when only some were rerun."""
+        return not self._rerun(nodeid) and nodeid.split("::")[0] in self._files
+
+    def summary(self):
+        """Summarizes the job for `job_history`.
+
+        Returns:
+            dict[str, Any]: See `job_history`.
+        """
+        outcomes = [report["outcome"] for report in self.reports]
+        return {
+            "id": self.id,
+            "started": self.started,
+            "duration": self.duration,
+            "state": self.state,
+            "passed": outcomes.count("passed"),
+            "failed": outcomes.count("failed"),
+            "durations": {
+                report["nodeid"]: report.get("duration", 0)
+                for report in self.reports
+                if report.get("when") == "call"
+            },
+        }
+
+
+def _final_state(reports):
+    failed = any(report["outcome"] == "failed" for report in reports)
+    return "failed" if failed else "passed"
+
+
+def reports_for(path, results=None):
+    """Gets the results of the tests in a file or directory.
+
+    Args:
+        path (str): The test file or directory.
+        results (dict, optional): Results from `run_all`. Defaults to running it.
+
+    Returns:
+        set[tuple[str, bool]]: (nodeid, passed) pairs.
+    """
+    results = results or run_all()
+    return {
+        (nodeid, passed)
+        for nodeid, passed in results["reports"]
+        if in_path(nodeid, path)
+    }
+
+
+def in_path(nodeid, path):
+    """Checks whether a test is in a file or directory.
+
+    Args:
+        nodeid (str): The test's pytest node id.
+        path (str): The test file or directory.
+
+    Returns:
+        bool: True if the test is in `path`.
+    """
+    prefix = Path(os.path.relpath(path, REPO_DIR)).as_posix()
+    return (
+        nodeid == prefix
+        or nodeid.startswith(prefix + "::")
+        or nodeid.startswith(prefix + "/")
+    )
+
+
+def _read_text(path):
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _load_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _save_json(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(value, f)
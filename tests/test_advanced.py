@@ -1,6 +1,9 @@
+import os
+
 import pytest
 
 from src import tasks
+from src.storage import backends, columnar, parallel, shared, sqlite
 from tests.common import TEST_DATA, TEST_DATA_PATH, run_pytest
 
 
@@ -53,5 +56,290 @@ def test_search_tasks(test_data, query, expected_indexes):
     assert items == [test_data[i] for i in sorted(expected_indexes)]
 
 
+@pytest.fixture
+def sqlite_repo(test_data):
+    repo = sqlite.SQLiteTaskRepository(":memory:")
+    repo.import_tasks(test_data)
+    yield repo
+    repo.close()
+
+
+# fixture + parameterize
+@pytest.mark.parametrize(
+    "func,args",
+    [
+        (tasks.filter_tasks_by_priority, ("High",)),
+        (tasks.filter_tasks_by_category, ("Work",)),
+        (tasks.filter_tasks_by_completion, (False,)),
+        (tasks.search_tasks, ("tHe",)),
+        (tasks.search_tasks, ("s",)),
+        (tasks.get_overdue_tasks, ()),
+        (tasks.sort_tasks, ("due_date", False)),
+        (tasks.sort_tasks, ("created_at", True)),
+        (tasks.sort_tasks, ("not_a_key", True)),
+        (tasks.get_task_stats, ()),
+    ],
+)
+def test_sqlite_repository_matches_list(sqlite_repo, test_data, func, args):
+    assert func(sqlite_repo, *args) == func(test_data, *args)
+
+
+@pytest.mark.parametrize(
+    "func,args",
+    [
+        (tasks.complete_where, ([1, 2, 9],)),
+        (tasks.update_where, (lambda task: task["priority"] == "Low", {"x": 1})),
+        (tasks.delete_where, (lambda task: task["completed"],)),
+        (tasks.bulk_import, ([{"title": "New"}, {"id": 2, "title": "Two"}],)),
+    ],
+)
+def test_sqlite_batch_matches_list(sqlite_repo, test_data, func, args):
+    expected = list(test_data)
+
+    assert func(sqlite_repo, *args) == func(expected, *args)
+    assert list(sqlite_repo) == sorted(expected, key=lambda task: task["id"])
+
+
+def test_migrate_json_to_sqlite(tmp_path):
+    repo = sqlite.migrate_json_to_sqlite(TEST_DATA_PATH, str(tmp_path / "tasks.db"))
+
+    assert list(repo) == TEST_DATA
+    repo.close()
+
+
+def test_sqlite_gives_missing_ids_like_generate_unique_id(sqlite_repo, test_data):
+    sqlite_repo.import_tasks([{"title": "A"}, {"id": 10, "title": "B"}])
+    sqlite_repo.put({"title": "C"})
+
+    assert [task["id"] for task in sqlite_repo] == [1, 2, 3, 4, 10, 11, 12]
+    assert sqlite_repo.get(11) == {"id": 11, "title": "A"}
+
+    sqlite_repo.save([{"title": "D"}, {"id": 5, "title": "E"}])
+    assert list(sqlite_repo) == [{"id": 5, "title": "E"}, {"id": 6, "title": "D"}]
+
+
+# parameterize
+@pytest.mark.parametrize(
+    "task",
+    [
+        {"id": 5, "completed": 1},
+        {"id": 5, "completed": "yes"},
+        {"id": 5, "title": 5},
+        {"id": 5, "title": None, "priority": None, "due_date": None},
+    ],
+)
+def test_sqlite_keeps_values_columns_cant_hold(sqlite_repo, task):
+    sqlite_repo.put(task)
+
+    assert sqlite_repo.get(5) == task
+
+
+# fixture + parameterize
+@pytest.mark.parametrize(
+    "func,args",
+    [
+        (tasks.filter_tasks_by_priority, ("High",)),
+        (tasks.filter_tasks_by_completion, (True,)),
+        (tasks.filter_tasks_by_completion, (False,)),
+        (tasks.get_overdue_tasks, ()),
+        (tasks.sort_tasks, ("due_date", True)),
+        (tasks.get_task_stats, ()),
+    ],
+)
+def test_sqlite_typed_values_match_list(sqlite_repo, test_data, func, args):
+    typed = [
+        {"id": 5, "completed": 1, "due_date": "2000-01-01"},
+        {"id": 6, "completed": "yes"},
+        {"id": 7, "completed": 0, "due_date": "2000-01-01"},
+        {"id": 8, "priority": None},
+    ]
+    sqlite_repo.import_tasks(typed)
+
+    assert func(sqlite_repo, *args) == func(test_data + typed, *args)
+
+
+@pytest.mark.parametrize("task_id", ["5", True, 5.0])
+def test_sqlite_rejects_ids_that_arent_integers(sqlite_repo, test_data, task_id):
+    with pytest.raises(ValueError):
+        sqlite_repo.put({"id": task_id, "title": "A"})
+
+    assert list(sqlite_repo) == test_data
+
+
+@pytest.fixture
+def columnar_store(test_data):
+    pytest.importorskip("numpy")
+    return columnar.ColumnarTaskStore(test_data)
+
+
+# fixture + parameterize
+@pytest.mark.parametrize(
+    "func,args",
+    [
+        (tasks.filter_tasks_by_priority, ("Low",)),
+        (tasks.filter_tasks_by_priority, ("Urgent",)),
+        (tasks.filter_tasks_by_category, ("Personal",)),
+        (tasks.filter_tasks_by_completion, (True,)),
+        (tasks.search_tasks, ("tHe",)),
+        (tasks.get_overdue_tasks, ()),
+        (tasks.sort_tasks, ("due_date", False)),
+        (tasks.sort_tasks, ("priority", True, 3)),
+        (tasks.sort_tasks, (["category", "id"], [True, False])),
+        (tasks.get_task_stats, ()),
+    ],
+)
+def test_columnar_store_matches_list(columnar_store, test_data, func, args):
+    assert func(columnar_store, *args) == func(test_data, *args)
+
+
+def test_columnar_store_round_trip():
+    pytest.importorskip("numpy")
+    data = [
+        {"id": "a", "due_date": "2025-4-1", "completed": None, "tags": ["x"]},
+        {"title": "No ID", "created_at": "not a time"},
+        {},
+    ]
+
+    assert columnar.ColumnarTaskStore(data).to_dicts() == data
+
+
+# parameterize
+@pytest.mark.parametrize(
+    "func,args",
+    [
+        (tasks.filter_tasks_by_completion, (True,)),
+        (tasks.filter_tasks_by_completion, (False,)),
+        (tasks.get_overdue_tasks, ()),
+        (tasks.get_task_stats, ()),
+    ],
+)
+def test_columnar_store_mixed_completed_matches_list(test_data, func, args):
+    pytest.importorskip("numpy")
+    data = test_data + [
+        {"id": 5, "completed": 1},
+        {"id": 6, "completed": 0, "due_date": "2000-01-01"},
+        {"id": 7, "completed": "yes"},
+        {"id": 8},
+    ]
+
+    assert func(columnar.ColumnarTaskStore(data), *args) == func(data, *args)
+
+
+def test_columnar_store_warns_like_list(capsys):
+    pytest.importorskip("numpy")
+    data = [{"id": 1, "due_date": "someday"}, {"id": 2, "due_date": "2000-01-01"}]
+
+    assert tasks.get_overdue_tasks(columnar.ColumnarTaskStore(data)) == data[1:]
+    columnar_out = capsys.readouterr().out
+    tasks.get_overdue_tasks(data)
+    assert columnar_out == capsys.readouterr().out
+    assert columnar_out.count("Could not parse date: someday") == 1
+
+
+@pytest.fixture(params=[0, parallel.PARALLEL_THRESHOLD], ids=["parallel", "serial"])
+def parallel_scan(request, test_data, monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_THRESHOLD", request.param)
+    with parallel.ParallelTaskScan(test_data, workers=2) as scan:
+        yield scan
+
+
+# fixture + parameterize
+@pytest.mark.parametrize(
+    "func,args",
+    [
+        (tasks.filter_tasks_by_priority, ("Low",)),
+        (tasks.filter_tasks_by_category, ("Personal",)),
+        (tasks.filter_tasks_by_completion, (False,)),
+        (tasks.search_tasks, ("tHe",)),
+        (tasks.get_overdue_tasks, ()),
+        (tasks.get_task_stats, ()),
+    ],
+)
+@pytest.mark.subprocess
+def test_parallel_scan_matches_list(parallel_scan, test_data, func, args):
+    assert func(parallel_scan, *args) == func(test_data, *args)
+
+
+def test_parallel_scan_from_file(tmp_path, test_data):
+    path = str(tmp_path / "tasks.jsonl")
+    tasks.save_tasks(test_data, path)
+
+    with parallel.ParallelTaskScan.from_file(path) as scan:
+        assert scan.path == path
+        assert list(scan) == test_data
+
+    tasks.journal_delete_task(1, path)
+    with parallel.ParallelTaskScan.from_file(path) as scan:
+        assert scan.path != path
+        assert list(scan) == test_data[1:]
+    assert not os.path.exists(scan.path)
+
+
+def test_parallel_scan_blank_lines_and_bad_dates(tmp_path, capsys):
+    path = tmp_path / "tasks.jsonl"
+    path.write_text('\n{"id": 1, "due_date": "someday"}\n\n  \n{"id": 2}')
+
+    with parallel.ParallelTaskScan.from_file(str(path)) as scan:
+        assert len(scan) == 2
+        assert list(scan) == [{"id": 1, "due_date": "someday"}, {"id": 2}]
+        assert tasks.get_overdue_tasks(scan) == []
+    assert "Could not parse date: someday" in capsys.readouterr().out
+
+
+@pytest.fixture(
+    params=[
+        "memory://{name}",
+        "sqlite://{path}.db",
+        "json://{path}.json",
+        "jsonl://{path}.jsonl",
+    ]
+)
+def task_store(request, tmp_path, test_data):
+    uri = request.param.format(name=tmp_path.name, path=tmp_path / "tasks")
+    store = backends.open_store(uri)
+    store.save(test_data)
+    return uri, store
+
+
+def test_task_store_protocol(task_store, test_data):
+    _, store = task_store
+
+    store.put({"id": 5, "title": "Test 5"})
+    store.put({**test_data[1], "completed": False})
+    store.delete(3)
+
+    assert isinstance(store, backends.TaskStore)
+    assert [task["id"] for task in store.load()] == [1, 2, 4, 5]
+    assert store.get(2)["completed"] is False
+    assert store.get(3) is None
+    assert store.query(tasks.TaskQuery().priority("Low")) == [
+        test_data[0],
+        test_data[3],
+    ]
+
+
+def test_shared_store_over_any_backend(task_store, test_data):
+    uri, store = task_store
+    shared_store = shared.get_shared_store(uri)
+    version = shared_store.refresh()
+
+    shared_store.toggle(1)
+    tasks.delete_where(shared_store, [2])
+
+    assert shared_store is shared.get_shared_store(uri)
+    assert version == 0 and shared_store.version == 2
+    assert store.get(1)["completed"] is True
+    assert store.get(2) is None
+    assert shared_store.get_task_stats() == tasks.get_task_stats(store.load())
+    assert shared_store.search("first") == [1]
+
+
+def test_open_store_unknown_scheme():
+    with pytest.raises(ValueError):
+        backends.open_store("ftp://tasks.json")
+    with pytest.raises(ValueError):
+        backends.open_store("jsonl://tasks.json")
+
+
 def run_tests():
     return run_pytest(__file__)
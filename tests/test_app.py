@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from src import tasks
+from tests.common import run_pytest
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    testing = pytest.importorskip("streamlit.testing.v1")
+    path = str(tmp_path / "tasks.json")
+    tasks.save_tasks(
+        [{"id": i, "title": f"Task {i}", "completed": False} for i in range(1, 31)],
+        path,
+    )
+    monkeypatch.setenv("TASKS_STORE", f"json://{path}")
+
+    app_file = os.path.join(os.path.dirname(tasks.__file__), "app.py")
+    return testing.AppTest.from_file(app_file, default_timeout=30).run()
+
+
+def shown_titles(app):
+    return [md.value for md in app.markdown if md.value.startswith("**Task")]
+
+
+def test_app_pages_tasks(app):
+    assert "Page 1 of 2 (30 tasks)" in [caption.value for caption in app.caption]
+    assert len(shown_titles(app)) == 25
+
+    app.number_input(key="page").set_value(2).run()
+
+    assert shown_titles(app) == [f"**Task {i}**" for i in range(26, 31)]
+
+
+def test_app_filter_goes_back_to_first_page(app):
+    app.number_input(key="page").set_value(2).run()
+    next(box for box in app.text_input if box.label == "Search").set_value("Task 3")
+    app.run()
+
+    assert app.number_input(key="page").value == 1
+    assert "Page 1 of 1 (2 tasks)" in [caption.value for caption in app.caption]
+    assert shown_titles(app) == ["**Task 3**", "**Task 30**"]
+
+
+def test_app_table_view(app):
+    app.radio[0].set_value("Table").run()
+
+    assert len(app.dataframe) == 1
+    assert list(app.dataframe[0].value["title"]) == [f"Task {i}" for i in range(1, 26)]
+    assert shown_titles(app) == []
+    assert not {"Complete", "Undo", "Delete"} & {button.label for button in app.button}
+
+
+def run_tests():
+    return run_pytest(__file__)
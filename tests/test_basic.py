@@ -42,6 +42,8 @@ def test_save_tasks():
         raise
     finally:
         os.remove(savefile)
+        if os.path.exists(tasks.get_lock_path(savefile)):
+            os.remove(tasks.get_lock_path(savefile))
 
     assert saved == json.dumps(TEST_DATA, indent=2)
 
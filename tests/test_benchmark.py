@@ -0,0 +1,56 @@
+from tests import benchmark
+from tests.benchmark import generate_tasks
+from tests.common import run_pytest
+
+
+def test_benchmarks_cover_public_functions():
+    public = set(benchmark.public_functions())
+
+    assert public == set(benchmark.BENCHMARKS) | benchmark.NOT_BENCHMARKED
+
+
+def test_run_benchmark_suite():
+    results = benchmark.run_suite([10, 20])
+
+    assert set(results) == set(benchmark.BENCHMARKS)
+    for sizes in results.values():
+        assert set(sizes) == {"10", "20"}
+        assert all(m["time"] >= 0 and m["peak"] >= 0 for m in sizes.values())
+
+
+def test_find_regressions():
+    baseline = {"a": {"10": {"time": 1.0, "peak": 1e6}}}
+    results = {
+        "a": {"10": {"time": 1.4, "peak": 3e6}, "20": {"time": 9.0, "peak": 0}},
+        "b": {"10": {"time": 9.0, "peak": 0}},
+    }
+
+    assert benchmark.find_regressions(results, baseline, threshold=0.5) == [
+        ("a", "10", "peak", 1e6, 3e6)
+    ]
+    assert benchmark.find_regressions(results, baseline, threshold=0.1) == [
+        ("a", "10", "time", 1.0, 1.4),
+        ("a", "10", "peak", 1e6, 3e6),
+    ]
+
+
+def test_generate_tasks_distributions():
+    data = generate_tasks(
+        200,
+        priority_weights=[0, 0, 1],
+        category_weights=[1, 0, 0, 0],
+        due_days=1,
+        completed_ratio=0,
+        text_length=100,
+    )
+
+    assert generate_tasks(200) == generate_tasks(200)
+    assert {task["priority"] for task in data} == {"High"}
+    assert {task["category"] for task in data} == {"Work"}
+    assert {task["due_date"] for task in data} == {"2024-01-01"}
+    assert not any(task["completed"] for task in data)
+    assert all(len(task["description"]) >= 100 for task in data)
+
+
+def run_tests():
+    return run_pytest(__file__)
@@ -0,0 +1,101 @@
+import copy
+
+import pytest
+
+from src import tasks
+from src.storage import binary
+from tests.benchmark import generate_tasks
+from tests.common import run_pytest
+
+
+def test_binary_snapshot_round_trip(tmp_path):
+    data = generate_tasks(5) + [
+        {"id": 6, "title": "Unicode \u00e9\U0001f600 \ud800", "completed": False},
+        {"title": "No id", "priority": "High"},
+        {"completed": False, "id": 7},  # keys out of order
+        {"id": True, "due_date": "2024-1-5", "created_at": "2024-01-01T10:00"},
+        {"id": 8, "created_at": "2024-01-01 10:00:00.5", "tags": ["a"]},
+        {"id": 2**70, "completed": 1, "description": None},
+    ]
+    snapshot = str(tmp_path / "tasks.tbin")
+    exported = str(tmp_path / "tasks.json")
+
+    tasks.save_tasks(data, snapshot)
+    tasks.save_tasks(tasks.load_tasks(snapshot), exported)
+    tasks.save_tasks(tasks.load_tasks(exported), snapshot)
+
+    assert tasks.load_tasks(snapshot) == data
+    assert tasks.load_tasks(exported) == data
+    assert [list(task) for task in tasks.load_tasks(snapshot)] == [
+        list(task) for task in data
+    ]
+
+
+def test_binary_snapshot_is_lazy(tmp_path, test_data):
+    path = str(tmp_path / "tasks.tbin")
+    tasks.save_tasks(test_data, path)
+
+    with tasks.open_tasks(path) as loaded:
+        assert isinstance(loaded, binary.BinaryTaskList)
+        assert loaded._unread == len(test_data)
+        assert loaded[1]["title"] == test_data[1]["title"]
+        assert loaded._unread == len(test_data) - 1
+        assert loaded[1] is loaded[1]
+
+    with pytest.raises(ValueError):  # unmapped
+        loaded[2]["title"]
+
+
+def test_load_binary_snapshot_closes_it(tmp_path, test_data):
+    path = str(tmp_path / "tasks.tbin")
+    tasks.save_tasks(test_data, path)
+
+    loaded = tasks.load_tasks(path)
+
+    assert type(loaded) is list and all(type(task) is dict for task in loaded)
+    assert loaded == test_data
+    with tasks.open_tasks(str(tmp_path / "tasks.json")) as missing:
+        assert missing == []
+
+
+def test_binary_snapshot_changes(tmp_path, test_data):
+    path = str(tmp_path / "tasks.tbin")
+    tasks.save_tasks(test_data, path)
+    loaded = tasks.load_tasks(path)
+
+    loaded[0]["completed"] = True
+    del loaded[1]["description"]
+    loaded.append({"id": 5, "title": "Test 5"})
+    del loaded[2]
+    tasks.save_tasks(loaded, path)
+
+    expected = copy.deepcopy(test_data)
+    expected[0]["completed"] = True
+    del expected[1]["description"]
+    expected.append({"id": 5, "title": "Test 5"})
+    del expected[2]
+    assert tasks.load_tasks(path) == expected
+
+
+def test_binary_snapshot_applies_journal(tmp_path, test_data):
+    path = str(tmp_path / "tasks.tbin")
+    tasks.save_tasks(test_data, path)
+
+    tasks.journal_add_task({"id": 5, "title": "Test 5"}, path)
+    tasks.journal_delete_task(2, path)
+
+    expected = [test_data[0]] + test_data[2:] + [{"id": 5, "title": "Test 5"}]
+    assert tasks.load_tasks(path) == expected
+    assert list(tasks.iter_tasks(path)) == expected
+
+
+def test_binary_snapshot_invalid(tmp_path, capsys):
+    path = tmp_path / "tasks.tbin"
+    path.write_bytes(b"[]")
+
+    assert tasks.load_tasks(str(path)) == []
+    assert "Warning" in capsys.readouterr().out
+
+
+def run_tests():
+    return run_pytest(__file__)
@@ -0,0 +1,174 @@
+from datetime import date, datetime
+
+import pytest
+
+from src import tasks
+from src.storage import compact, shared
+from tests.common import run_pytest
+
+# ---------- TASK COLLECTION ----------
+
+
+def test_task_collection_acts_like_list(test_data):
+    collection = tasks.TaskCollection(test_data)
+
+    assert collection == test_data
+    assert len(collection) == 4
+    assert collection[1:3] == test_data[1:3]
+    assert tasks.get_task_stats(collection) == tasks.get_task_stats(test_data)
+    assert tasks.sort_tasks(collection, "due_date") == tasks.sort_tasks(
+        test_data, "due_date"
+    )
+
+
+def test_task_collection_by_id(test_data):
+    collection = tasks.TaskCollection(test_data)
+
+    assert collection.get(3) is test_data[2]
+    assert collection.toggle(3)["completed"]
+    assert collection.delete(3) is test_data[2]
+    assert collection.get(3) is None
+    assert collection == [test_data[0], test_data[1], test_data[3]]
+
+
+def test_task_collection_never_reuses_ids(test_data):
+    collection = tasks.TaskCollection(test_data)
+    collection.delete(4)
+
+    assert tasks.generate_unique_id(collection) == 5
+    assert tasks.generate_unique_id(collection) == 6
+
+
+def test_load_task_collection_keeps_high_water_mark(tasks_file, test_data):
+    tasks.journal_add_task({"id": 5, "title": "Test 5"}, tasks_file)
+    tasks.journal_delete_task(5, tasks_file)
+
+    assert tasks.load_task_collection(tasks_file).high_water_mark == 5
+
+    tasks.compact_tasks(tasks_file)
+    collection = tasks.load_task_collection(tasks_file)
+
+    assert collection == test_data
+    assert tasks.generate_unique_id(collection) == 6
+
+
+# ---------- COMPACT TASKS ----------
+
+
+def test_task_mapping_round_trip(test_data):
+    data = {**test_data[0], "due_date": "2025-4-1", "tags": ["a"]}
+    task = compact.Task(data)
+
+    assert task == data
+    assert dict(task) == data
+    assert task["due_date"] == "2025-4-1"
+    assert task.created_at == datetime(2025, 4, 10, 17, 54, 6)
+    assert "tags" in task and "nothing" not in task
+
+    task["completed"] = True
+    del task["tags"]
+
+    assert task.completed is True
+    assert "tags" not in task
+    assert len(task) == len(data) - 1
+
+
+def test_task_list_parses_dates(test_data):
+    task_list = compact.TaskList(test_data)
+
+    assert task_list == test_data
+    assert task_list.get(3).due_date == date(1900, 4, 10)
+    assert task_list.get(3)["due_date"] == "1900-04-10"
+
+
+@pytest.mark.parametrize(
+    "func,args",
+    [
+        (tasks.filter_tasks_by_priority, ("Low",)),
+        (tasks.filter_tasks_by_category, ("School",)),
+        (tasks.filter_tasks_by_completion, (True,)),
+        (tasks.search_tasks, ("the",)),
+        (tasks.get_overdue_tasks, ()),
+        (tasks.sort_tasks, ("due_date", False)),
+        (tasks.sort_tasks, ("created_at", True, 2)),
+        (tasks.sort_tasks, (["category", "id"],)),
+        (tasks.get_task_stats, ()),
+        (tasks.complete_all_tasks, ()),
+    ],
+)
+def test_task_list_matches_dicts(test_data, func, args):
+    assert func(compact.TaskList(test_data), *args) == func(test_data, *args)
+
+
+def test_save_task_list(tmp_path, test_data):
+    path = str(tmp_path / "tasks.json")
+
+    tasks.save_tasks(compact.TaskList(test_data), path)
+
+    assert tasks.load_tasks(path) == test_data
+    assert tasks.load_task_collection(path, compact.TaskList) == test_data
+
+
+# ---------- BATCH ----------
+
+
+@pytest.mark.parametrize("container", [list, tasks.TaskCollection])
+@pytest.mark.parametrize("where", [[3, 1, 7], lambda task: task["category"] == "Work"])
+def test_update_where(test_data, container, where):
+    collection = container(test_data)
+
+    updated = tasks.update_where(collection, where, {"priority": "Urgent"})
+
+    expected_ids = [1, 3] if isinstance(where, list) else [1, 4]
+    assert sorted(task["id"] for task in updated) == expected_ids
+    assert [
+        task["id"] for task in collection if task["priority"] == "Urgent"
+    ] == expected_ids
+    # originals are copied, not changed
+    assert test_data[0]["priority"] == "Low"
+
+
+@pytest.mark.parametrize("container", [list, tasks.TaskCollection])
+def test_complete_and_delete_where(test_data, container):
+    collection = container(test_data)
+
+    assert tasks.complete_where(collection, [3]) == [
+        {**test_data[2], "completed": True}
+    ]
+    deleted = tasks.delete_where(collection, lambda task: task["completed"])
+
+    assert [task["id"] for task in deleted] == [2, 3, 4]
+    assert list(collection) == [test_data[0]]
+
+
+@pytest.mark.parametrize("container", [list, tasks.TaskCollection])
+def test_bulk_import(test_data, container):
+    collection = container(test_data)
+
+    imported = tasks.bulk_import(
+        collection, [{"title": "A"}, {"id": 7, "title": "B"}, {"id": 2, "title": "C"}]
+    )
+
+    assert [task["id"] for task in imported] == [8, 7, 2]
+    assert [task["id"] for task in collection] == [1, 2, 3, 4, 8, 7]
+    assert tasks.generate_unique_id(collection) == 9
+
+
+def test_shared_store_batches_write_once(tasks_file, test_data):
+    store = shared.SharedTaskStore(tasks_file)
+    journal = tasks.get_group_commit_journal(tasks_file)
+    commits = journal.commits
+
+    tasks.complete_where(store, [1, 2, 3, 4])
+    tasks.delete_where(store, lambda task: task["id"] > 2)
+    tasks.bulk_import(store, [{"title": f"Imported {i}"} for i in range(100)])
+
+    assert journal.commits == commits + 3
+    assert store.view() == tasks.load_tasks(tasks_file)
+    assert len(store.view()) == 102
+    assert store.get_task_stats()[:3] == (102, 100, 2)
+    assert store.loads == 1
+
+
+def run_tests():
+    return run_pytest(__file__)
@@ -0,0 +1,207 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from src import tasks
+from tests.common import run_pytest
+
+# ---------- JOURNAL ----------
+
+
+def test_journal_replay(tasks_file, test_data):
+    new_task = {**test_data[0], "id": 5, "title": "Test 5"}
+    updated = {**test_data[1], "completed": False}
+
+    tasks.journal_add_task(new_task, tasks_file)
+    tasks.journal_update_task(updated, tasks_file)
+    tasks.journal_delete_task(3, tasks_file)
+
+    assert tasks.load_tasks(tasks_file) == [
+        test_data[0],
+        updated,
+        test_data[3],
+        new_task,
+    ]
+
+
+def test_journal_does_not_rewrite_snapshot(tasks_file):
+    with open(tasks_file, "r") as f:
+        before = f.read()
+
+    tasks.journal_delete_task(1, tasks_file)
+
+    with open(tasks_file, "r") as f:
+        assert f.read() == before
+
+
+def test_save_tasks_discards_journal(tasks_file, test_data):
+    tasks.journal_delete_task(1, tasks_file)
+    tasks.save_tasks(test_data, tasks_file)
+
+    assert not os.path.exists(tasks.get_journal_path(tasks_file))
+    assert tasks.load_tasks(tasks_file) == test_data
+
+
+def test_journal_skips_interrupted_entry(tasks_file, test_data):
+    tasks.journal_delete_task(1, tasks_file)
+    with open(tasks.get_journal_path(tasks_file), "a") as f:
+        f.write('{"op": "delete", "i')
+
+    assert tasks.load_tasks(tasks_file) == test_data[1:]
+
+
+def test_journal_append_after_interrupted_entry(tasks_file, test_data):
+    with open(tasks.get_journal_path(tasks_file), "a") as f:
+        f.write('{"op": "add", "task": {"id": 5')
+
+    tasks.journal_add_task({"id": 6}, tasks_file)
+
+    assert tasks.load_tasks(tasks_file) == test_data + [{"id": 6}]
+
+
+def test_journal_compaction(tasks_file, test_data, monkeypatch):
+    monkeypatch.setattr(tasks, "JOURNAL_COMPACT_BYTES", 0)
+
+    tasks.journal_delete_task(2, tasks_file)
+
+    assert not os.path.exists(tasks.get_journal_path(tasks_file))
+    with open(tasks_file, "r") as f:
+        assert json.load(f) == [test_data[0], test_data[2], test_data[3]]
+
+
+# ---------- SAFE WRITES ----------
+
+
+def test_failed_save_keeps_old_file(tasks_file, test_data):
+    def broken_tasks():
+        yield test_data[0]
+        raise RuntimeError("crash")
+
+    with pytest.raises(RuntimeError):
+        tasks.save_tasks(broken_tasks(), tasks_file)
+
+    assert tasks.load_tasks(tasks_file) == test_data
+    assert not [
+        name
+        for name in os.listdir(os.path.dirname(tasks_file))
+        if name.endswith(".tmp")
+    ]
+
+
+def test_save_refuses_stale_version(tasks_file, test_data):
+    version = tasks.get_tasks_version(tasks_file)
+    tasks.journal_delete_task(1, tasks_file)
+
+    with pytest.raises(tasks.ConcurrentModificationError):
+        tasks.save_tasks([], tasks_file, expected_version=version)
+
+    assert tasks.load_tasks(tasks_file) == test_data[1:]
+
+    tasks.save_tasks([], tasks_file, tasks.get_tasks_version(tasks_file))
+    assert tasks.load_tasks(tasks_file) == []
+
+
+def test_group_commit_batches_concurrent_appends(tasks_file, monkeypatch):
+    journal = tasks.GroupCommitJournal(tasks_file)
+    write = journal._write
+    first_write_started = threading.Event()
+    release = threading.Event()
+
+    def slow_write(entries):
+        first_write_started.set()
+        release.wait()
+        write(entries)
+
+    monkeypatch.setattr(journal, "_write", slow_write)
+
+    leader = threading.Thread(
+        target=journal.append, args=([{"op": "delete", "id": 1}],)
+    )
+    leader.start()
+    first_write_started.wait()
+
+    followers = [
+        threading.Thread(
+            target=journal.append, args=([{"op": "delete", "id": task_id}],)
+        )
+        for task_id in (2, 3)
+    ]
+    for thread in followers:
+        thread.start()
+    while len(journal._pending.entries) < 2:
+        pass
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert journal.commits == 2
+    assert [task["id"] for task in tasks.load_tasks(tasks_file)] == [4]
+
+
+def test_concurrent_journal_appends(tasks_file):
+    def add_tasks(start):
+        for task_id in range(start, start + 20):
+            tasks.journal_add_task({"id": task_id}, tasks_file)
+
+    threads = [threading.Thread(target=add_tasks, args=(100 * i,)) for i in range(1, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = {task["id"] for task in tasks.load_tasks(tasks_file)}
+    assert ids == {1, 2, 3, 4} | {100 * i + j for i in range(1, 5) for j in range(20)}
+
+
+@pytest.mark.skipif(tasks.fcntl is None, reason="needs fcntl")
+def test_lock_excludes_other_processes(tasks_file):
+    code = (
+        "import fcntl, os, sys\n"
+        "fd = os.open(sys.argv[1], os.O_RDWR)\n"
+        "fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)\n"
+    )
+    lock_path = tasks.get_lock_path(tasks_file)
+
+    with tasks.lock_tasks(tasks_file):
+        with tasks.lock_tasks(tasks_file):  # re-entrant
+            held = subprocess.run([sys.executable, "-c", code, lock_path])
+    free = subprocess.run([sys.executable, "-c", code, lock_path])
+
+    assert held.returncode != 0
+    assert free.returncode == 0
+
+
+def test_reads_do_not_create_lock_files(tmp_path):
+    missing = str(tmp_path / "missing" / "tasks.json")
+    tasks_file = str(tmp_path / "tasks.json")
+
+    assert tasks.load_tasks(missing) == []
+    assert list(tasks.iter_tasks(tasks_file)) == []
+    assert tasks.load_task_collection(tasks_file) == []
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.skipif(tasks.fcntl is None, reason="needs fcntl")
+def test_reads_share_the_lock(tasks_file):
+    code = (
+        "import fcntl, os, sys\n"
+        "fd = os.open(sys.argv[1], os.O_RDONLY)\n"
+        "fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)\n"
+    )
+    lock_path = tasks.get_lock_path(tasks_file)
+
+    with tasks.lock_tasks(tasks_file, shared=True):
+        shared = subprocess.run([sys.executable, "-c", code, lock_path])
+        with tasks.lock_tasks(tasks_file):  # upgraded to write
+            excluded = subprocess.run([sys.executable, "-c", code, lock_path])
+
+    assert shared.returncode == 0
+    assert excluded.returncode != 0
+
+
+def run_tests():
+    return run_pytest(__file__)
@@ -1 +1,423 @@
+"""Property-based tests
+
+Random tasks, including malformed dates, unicode text, missing keys and
+`completed` values that aren't bools (0, 1, None, strings), are run through
+`tasks.py` and compared against simple reference implementations (the
+original, unoptimized versions of each function), on plain lists and on every
+optimized engine.
+
+The same tasks can be generated in bulk, as fixtures for load and performance
+testing. From the root project directory:
+
+    python -m tests.test_property 1000000 temp/tasks_1m.json temp/tasks_1m.jsonl
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import random
+import string
+from datetime import date, datetime, timedelta
+
 import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from src import tasks
+from src.storage import columnar, compact, sqlite
+
+PRIORITIES = ["Low", "Medium", "High"]
+CATEGORIES = ["Work", "Personal", "School", "Other"]
+FIRST_DATE = date(2000, 1, 1)
+LAST_DATE = date(2050, 12, 31)
+# due dates strptime rejects, as they turn up in hand-edited task files
+MALFORMED_DATES = [
+    "",
+    "2025-13-01",
+    "2025-02-30",
+    "01/02/2025",
+    "2025-01-01T00:00",
+    "tomorrow",
+    " 2025-01-01",
+]
+# letters beyond ASCII, including ones that change length when lowercased
+UNICODE_LETTERS = "éßİΣσçøñ日本語中文ÅΩ🙂"
+SORT_KEYS = ["id", "title", "priority", "category", "due_date", "created_at"]
+
+# ---------- REFERENCE IMPLEMENTATIONS ----------
+
+
+def reference_filter(tasks_list, key, value):
+    """The original `filter_tasks_by_priority`, `_category` and `_completion`."""
+    return [task for task in tasks_list if task.get(key) == value]
+
+
+def reference_search(tasks_list, query):
+    """The original `search_tasks`."""
+    query = query.lower()
+    return [
+        task
+        for task in tasks_list
+        if query in task.get("title", "").lower()
+        or query in task.get("description", "").lower()
+    ]
+
+
+def reference_overdue(tasks_list):
+    """The original `get_overdue_tasks`, which skips dates it can't parse."""
+    today = datetime.now().date()
+    overdue = []
+    for task in tasks_list:
+        if not task.get("completed", False) and task.get("due_date"):
+            try:
+                due_date = datetime.strptime(task["due_date"], tasks.DATE_FORMAT)
+            except ValueError:
+                continue
+            if due_date.date() < today:
+                overdue.append(task)
+    return overdue
+
+
+def reference_stats(tasks_list):
+    """The original `get_task_stats`, which fails on dates it can't parse."""
+    today = datetime.now().date()
+    incomplete = complete = overdue = 0
+    for task in tasks_list:
+        if not task.get("completed", False):
+            incomplete += 1
+            if (
+                "due_date" in task
+                and datetime.strptime(task["due_date"], tasks.DATE_FORMAT).date()
+                < today
+            ):
+                overdue += 1
+        else:
+            complete += 1
+    return len(tasks_list), incomplete, complete, overdue
+
+
+def legacy_sort_tasks(task_list, sort_by, asc=True):
+    """The original `sort_tasks`, which parses every date on every call."""
+    missing_sort_key = []
+    has_sort_key = []
+
+    for task in task_list:
+        if sort_by in task:
+            has_sort_key.append(task)
+        else:
+            missing_sort_key.append(task)
+
+    key = lambda task: task[sort_by]
+
+    if sort_by == "due_date":
+        key = lambda task: datetime.strptime(task[sort_by], tasks.DATE_FORMAT).date()
+    elif sort_by == "created_at":
+        key = lambda task: datetime.strptime(task[sort_by], tasks.TIME_FORMAT)
+
+    return sorted(has_sort_key, key=key, reverse=not asc) + missing_sort_key
+
+
+def reference_sort(tasks_list, sort_by, asc=True, limit=None):
+    """`sort_tasks` as stable legacy sorts, least significant key first."""
+    keys = sort_by if isinstance(sort_by, list) else [sort_by]
+    directions = asc if isinstance(asc, list) else [asc] * len(keys)
+    for key, direction in reversed(list(zip(keys, directions))):
+        tasks_list = legacy_sort_tasks(tasks_list, key, direction)
+    return tasks_list if limit is None else tasks_list[:limit]
+
+
+def outcome(func, *args):
+    """Calls a function, turning a ValueError into a comparable result."""
+    try:
+        return func(*args)
+    except ValueError:
+        return ValueError
+
+
+# ---------- STRATEGIES ----------
+
+text = st.text(st.sampled_from(string.ascii_letters + " " + UNICODE_LETTERS))
+valid_dates = st.dates(FIRST_DATE, LAST_DATE).flatmap(
+    # strptime also takes dates without leading zeros
+    lambda d: st.sampled_from([d.isoformat(), f"{d.year}-{d.month}-{d.day}"])
+)
+malformed_dates = st.sampled_from(MALFORMED_DATES) | st.text(max_size=12)
+# `completed` values that aren't bools, as other tools write them
+completed_values = st.sampled_from([0, 1, None, "", "yes"])
+timestamps = st.datetimes(
+    datetime.combine(FIRST_DATE, datetime.min.time()),
+    datetime.combine(LAST_DATE, datetime.min.time()),
+).map(lambda d: d.replace(microsecond=0).strftime(tasks.TIME_FORMAT))
+
+
+def task_lists(due_dates=valid_dates, max_size=30):
+    """Lists of tasks with unique, increasing ids and any other key missing.
+
+    Args:
+        due_dates (SearchStrategy[str], optional): The due dates to use.
+        max_size (int, optional): The most tasks in a list.
+
+    Returns:
+        SearchStrategy[list[dict[str, Any]]]: The strategy.
+    """
+    task = st.fixed_dictionaries(
+        {},
+        optional={
+            "title": text,
+            "description": text,
+            "priority": st.sampled_from(PRIORITIES) | text,
+            "category": st.sampled_from(CATEGORIES) | text,
+            "due_date": due_dates,
+            "completed": st.booleans() | completed_values,
+            "created_at": timestamps,
+        },
+    )
+    return st.lists(task, max_size=max_size).map(
+        lambda tasks_list: [{"id": i, **task} for i, task in enumerate(tasks_list, 1)]
+    )
+
+
+# ---------- ENGINES ----------
+
+
+def _sqlite_repository(tasks_list):
+    repo = sqlite.SQLiteTaskRepository(":memory:")
+    repo.import_tasks(tasks_list)
+    return repo
+
+
+ENGINES = {
+    "list": list,
+    "TaskList": compact.TaskList,
+    "ColumnarTaskStore": columnar.ColumnarTaskStore,
+    "SQLiteTaskRepository": _sqlite_repository,
+}
+
+engines = pytest.mark.parametrize(
+    "engine",
+    [
+        pytest.param(
+            name,
+            marks=pytest.mark.skipif(
+                name == "ColumnarTaskStore"
+                and importlib.util.find_spec("numpy") is None,
+                reason="requires numpy",
+            ),
+        )
+        for name in ENGINES
+    ],
+)
+
+
+@contextlib.contextmanager
+def open_engine(engine, tasks_list):
+    """Puts tasks in an engine, closing it afterwards if it needs closing."""
+    store = ENGINES[engine](tasks_list)
+    try:
+        yield store
+    finally:
+        if hasattr(store, "close"):
+            store.close()
+
+
+# ---------- PROPERTIES ----------
+
+
+@engines
+@settings(deadline=None)
+@given(
+    data=task_lists(due_dates=valid_dates | malformed_dates),
+    priority=st.sampled_from(PRIORITIES),
+    category=st.sampled_from(CATEGORIES),
+    completed=st.booleans(),
+)
+def test_filters_match_reference(engine, data, priority, category, completed):
+    with open_engine(engine, data) as store:
+        assert tasks.filter_tasks_by_priority(store, priority) == reference_filter(
+            data, "priority", priority
+        )
+        assert tasks.filter_tasks_by_category(store, category) == reference_filter(
+            data, "category", category
+        )
+        assert tasks.filter_tasks_by_completion(store, completed) == reference_filter(
+            data, "completed", completed
+        )
+
+
+@engines
+@settings(deadline=None)
+@given(data=task_lists(), draw=st.data())
+def test_search_matches_reference(engine, data, draw):
+    # search for part of a title, or anything
+    titles = [task["title"] for task in data if task.get("title")]
+    if titles:
+        title = draw.draw(st.sampled_from(titles))
+        start = draw.draw(st.integers(0, len(title)))
+        end = draw.draw(st.integers(start, len(title)))
+        query = draw.draw(st.sampled_from([title[start:end], title[start:end].upper()]))
+    else:
+        query = draw.draw(text)
+
+    with open_engine(engine, data) as store:
+        assert tasks.search_tasks(store, query) == reference_search(data, query)
+
+
+@engines
+@settings(deadline=None)
+@given(data=task_lists(due_dates=valid_dates | malformed_dates))
+def test_overdue_matches_reference(engine, data):
+    with open_engine(engine, data) as store:
+        assert tasks.get_overdue_tasks(store) == reference_overdue(data)
+
+
+@engines
+@settings(deadline=None)
+@given(data=task_lists())
+def test_stats_match_reference(engine, data):
+    with open_engine(engine, data) as store:
+        assert tasks.get_task_stats(store) == reference_stats(data)
+
+
+@engines
+@settings(deadline=None)
+@given(
+    data=task_lists(),
+    sort_by=st.sampled_from(SORT_KEYS)
+    | st.lists(st.sampled_from(SORT_KEYS), min_size=1, max_size=3),
+    asc=st.booleans(),
+    limit=st.none() | st.integers(0, 40),
+)
+def test_sort_matches_reference(engine, data, sort_by, asc, limit):
+    with open_engine(engine, data) as store:
+        assert tasks.sort_tasks(store, sort_by, asc, limit) == reference_sort(
+            data, sort_by, asc, limit
+        )
+
+
+@engines
+@settings(deadline=None)
+@given(data=task_lists(due_dates=valid_dates | malformed_dates, max_size=5))
+def test_sort_by_malformed_dates_matches_reference(engine, data):
+    # both fail on a date they can't parse
+    with open_engine(engine, data) as store:
+        assert outcome(tasks.sort_tasks, store, "due_date") == outcome(
+            reference_sort, data, "due_date"
+        )
+
+
+# ---------- AT SCALE ----------
+
+
+def iter_fuzz_tasks(n, seed=0, malformed_ratio=0.0, missing_ratio=0.05):
+    """Generates tasks like `task_lists`, fast enough for millions of them.
+
+    Args:
+        n (int): The number of tasks to generate.
+        seed (int, optional): Seed for the random generator. Defaults to 0.
+        malformed_ratio (float, optional): The fraction of due dates that
+            are malformed.
+        missing_ratio (float, optional): The chance of each key but "id"
+            being missing.
+
+    Yields:
+        dict[str, Any]: The tasks, with ids from 1 to `n`.
+    """
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + UNICODE_LETTERS
+    days = (LAST_DATE - FIRST_DATE).days
+
+    def words():
+        return " ".join(
+            "".join(rng.choices(alphabet, k=rng.randint(1, 8)))
+            for _ in range(rng.randint(1, 6))
+        )
+
+    for i in range(1, n + 1):
+        due_date = FIRST_DATE + timedelta(days=rng.randrange(days))
+        task = {
+            "title": words(),
+            "description": words(),
+            "priority": rng.choice(PRIORITIES),
+            "category": rng.choice(CATEGORIES),
+            "due_date": (
+                rng.choice(MALFORMED_DATES)
+                if rng.random() < malformed_ratio
+                else due_date.isoformat()
+            ),
+            "completed": rng.random() < 0.5,
+            "created_at": (
+                datetime.combine(due_date, datetime.min.time())
+                - timedelta(seconds=rng.randrange(10_000_000))
+            ).strftime(tasks.TIME_FORMAT),
+        }
+        yield {"id": i} | {
+            key: value for key, value in task.items() if rng.random() >= missing_ratio
+        }
+
+
+def write_fixture(path, n, **options):
+    """Writes generated tasks to a file, without holding them all in memory.
+
+    Args:
+        path (str): The file, as JSON, or JSON lines if it ends in `.jsonl`.
+        n (int): The number of tasks.
+        **options: Options for `iter_fuzz_tasks`.
+    """
+    tasks.save_tasks(iter_fuzz_tasks(n, **options), path)
+
+
+@pytest.fixture(scope="module", params=[0.0, 0.01], ids=["valid", "malformed"])
+def large_data(request):
+    return list(iter_fuzz_tasks(20_000, seed=1, malformed_ratio=request.param))
+
+
+@engines
+def test_engines_match_reference_at_scale(engine, large_data):
+    with open_engine(engine, large_data) as store:
+        assert tasks.filter_tasks_by_priority(store, "High") == reference_filter(
+            large_data, "priority", "High"
+        )
+        assert tasks.filter_tasks_by_completion(store, False) == reference_filter(
+            large_data, "completed", False
+        )
+        assert tasks.search_tasks(store, "ß") == reference_search(large_data, "ß")
+        assert tasks.get_overdue_tasks(store) == reference_overdue(large_data)
+        if outcome(reference_stats, large_data) is not ValueError:
+            assert tasks.get_task_stats(store) == reference_stats(large_data)
+        for sort_by, asc in [("priority", True), (["category", "created_at"], False)]:
+            assert tasks.sort_tasks(store, sort_by, asc, 100) == reference_sort(
+                large_data, sort_by, asc, 100
+            )
+
+
+def test_write_fixture_round_trip(tmp_path):
+    expected = list(iter_fuzz_tasks(100, seed=2, malformed_ratio=0.1))
+
+    for name in ["tasks.json", "tasks.jsonl"]:
+        path = str(tmp_path / name)
+        write_fixture(path, 100, seed=2, malformed_ratio=0.1)
+        assert tasks.load_tasks(path) == expected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tests.test_property")
+    parser.add_argument("count", type=int, help="number of tasks")
+    parser.add_argument("paths", nargs="+", help="files to write (.json or .jsonl)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--malformed-ratio", type=float, default=0.0)
+    parser.add_argument("--missing-ratio", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        write_fixture(
+            path,
+            args.count,
+            seed=args.seed,
+            malformed_ratio=args.malformed_ratio,
+            missing_ratio=args.missing_ratio,
+        )
+        print(f"wrote {args.count} tasks to {path}")
+
+
+if __name__ == "__main__":
+    main()
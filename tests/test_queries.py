@@ -0,0 +1,223 @@
+from datetime import date, timedelta
+
+import pytest
+
+from src import tasks
+from src.storage import shared
+from tests.benchmark import generate_tasks
+from tests.common import run_pytest
+
+# ---------- QUERIES ----------
+
+
+def test_query_matches_chained_functions(test_data):
+    query = (
+        tasks.TaskQuery()
+        .category("Work")
+        .completed(False)
+        .search("tesT")
+        .sort_by("id", False)
+    )
+
+    expected = tasks.filter_tasks_by_category(test_data, "Work")
+    expected = tasks.filter_tasks_by_completion(expected, False)
+    expected = tasks.search_tasks(expected, "tesT")
+    expected = tasks.sort_tasks(expected, "id", False)
+
+    assert query.run(test_data) == expected
+
+
+@pytest.mark.parametrize(
+    "number,size,expected_order",
+    [(1, 3, [1, 3, 0]), (2, 3, [2]), (3, 3, [])],
+)
+def test_query_page(test_data, number, size, expected_order):
+    query = tasks.TaskQuery().sort_by("due_date", False).page(number, size)
+
+    assert query.run(test_data) == [test_data[i] for i in expected_order]
+
+
+def test_query_does_not_copy(test_data):
+    query = tasks.TaskQuery().priority("High").where(lambda task: task["id"] > 2)
+
+    assert query.run(test_data)[0] is test_data[2]
+    assert query.count(test_data) == 1
+
+
+def test_query_is_lazy():
+    seen = []
+
+    def source():
+        for i in range(100):
+            seen.append(i)
+            yield {"id": i}
+
+    assert tasks.TaskQuery().offset(2).limit(3).run(source()) == [
+        {"id": i} for i in range(2, 5)
+    ]
+    assert len(seen) == 5
+
+
+# ---------- SEARCH INDEX ----------
+
+
+@pytest.mark.parametrize(
+    "query,expected_ids",
+    [
+        ("the", {1, 3, 4}),
+        ("TES fir", {1}),
+        ("sec", {2}),
+        ("test zebra", set()),
+        ("", set()),
+    ],
+)
+def test_search_index(test_data, query, expected_ids):
+    index = tasks.SearchIndex(test_data)
+
+    assert set(index.search(query)) == expected_ids
+
+
+def test_search_index_ranking():
+    index = tasks.SearchIndex(
+        [
+            {"id": 1, "title": "groceries", "description": "milk and bread"},
+            {"id": 2, "title": "milk", "description": "milk milk"},
+            {"id": 3, "title": "bread"},
+        ]
+    )
+
+    assert index.search("milk") == [2, 1]
+    assert index.search("mi", limit=1) == [2]
+
+
+def test_search_index_updates(test_data):
+    index = tasks.SearchIndex(test_data)
+
+    index.update({**test_data[1], "title": "Renamed"})
+    index.remove(3)
+
+    assert index.search("renamed") == [2]
+    assert set(index.search("the")) == {1, 4}
+
+
+def test_search_tasks_with_index(test_data):
+    index = tasks.SearchIndex(test_data)
+
+    items = tasks.search_tasks(test_data[:3], "the", index)
+
+    assert sorted(items, key=lambda task: task["id"]) == [test_data[0], test_data[2]]
+    assert tasks.TaskQuery().search("the", index).run(test_data) == [
+        test_data[0],
+        test_data[2],
+        test_data[3],
+    ]
+
+
+def test_load_search_index_replays_journal(tasks_file, test_data):
+    tasks.load_search_index(test_data, tasks_file)
+    tasks.journal_add_task({"id": 5, "title": "Journaled"}, tasks_file)
+    tasks.journal_delete_task(1, tasks_file)
+
+    # the stale task list shows the saved index was brought up to date
+    # from the journal rather than rebuilt
+    index = tasks.load_search_index(test_data, tasks_file)
+
+    assert index.search("journaled") == [5]
+    assert set(index.search("the")) == {3, 4}
+
+    tasks.save_tasks(test_data, tasks_file)
+    index = tasks.load_search_index(test_data, tasks_file)
+
+    assert set(index.search("the")) == {1, 3, 4}
+
+
+# ---------- DUE DATES ----------
+
+
+@pytest.fixture
+def due_tasks():
+    data = generate_tasks(500)
+    today = date.today()
+    for i, task in enumerate(data[:60]):
+        task["due_date"] = (today + timedelta(days=i - 30)).isoformat()
+    return data
+
+
+def test_due_date_index_matches_scans(due_tasks):
+    index = tasks.DueDateIndex(due_tasks)
+    today = date.today()
+
+    assert tasks.get_overdue_tasks(due_tasks, index) == sorted(
+        tasks.get_overdue_tasks(due_tasks), key=lambda task: task["due_date"]
+    )
+    for start, end in [
+        (today, today + timedelta(days=7)),
+        ("2024-02-01", "2024-03-15"),
+    ]:
+        assert tasks.get_tasks_due_between(
+            due_tasks, start, end, index
+        ) == tasks.get_tasks_due_between(due_tasks, start, end)
+    assert tasks.get_next_due_tasks(due_tasks, 5, index) == tasks.get_next_due_tasks(
+        due_tasks, 5
+    )
+
+
+def test_due_date_index_updates(test_data):
+    index = tasks.DueDateIndex(test_data)
+    assert index.overdue("2025-04-24") == [3, 1]
+
+    index.update({**test_data[0], "completed": True})
+    index.add({"id": 5, "due_date": "2025-04-20"})
+    index.add({"id": 6, "due_date": "2025-04-24"})
+    index.remove(3)
+
+    assert index.overdue("2025-04-24") == [5]
+    assert index.due_between("2025-04-20", "2025-04-24") == [5, 6]
+    assert index.next_due(1, "2025-04-21") == [6]
+
+
+def test_due_date_index_reports_bad_dates_once(test_data, capsys):
+    bad = {**test_data[0], "due_date": "04/23/2025"}
+    index = tasks.DueDateIndex([bad])
+    index.update({**bad, "title": "Renamed"})
+    index.overdue()
+    index.due_between("2025-01-01", "2025-12-31")
+
+    assert capsys.readouterr().out.count("04/23/2025") == 1
+    assert index.invalid == {1: "04/23/2025"}
+    assert len(index) == 0
+
+
+def test_query_due_between(test_data):
+    index = tasks.DueDateIndex(test_data)
+    query = tasks.TaskQuery().due_between("2025-01-01", "2025-12-31")
+
+    assert [task["id"] for task in query.run(test_data)] == [1]
+    assert query.run(test_data) == tasks.TaskQuery().due_between(
+        "2025-01-01", "2025-12-31", index
+    ).run(test_data)
+
+
+def test_shared_store_due_dates(tasks_file, test_data):
+    store = shared.SharedTaskStore(tasks_file)
+    tasks.journal_add_task({"id": 5, "due_date": "2000-01-01"}, tasks_file)
+    tasks.journal_add_task({"id": 6, "due_date": "2001-01-01"}, tasks_file)
+    tasks.journal_delete_task(6, tasks_file)
+
+    overdue = tasks.get_overdue_tasks(store.view(), store)
+
+    assert [task["id"] for task in overdue][:2] == [3, 5]
+    assert sorted(overdue, key=lambda task: task["id"]) == sorted(
+        tasks.get_overdue_tasks(store.view()), key=lambda task: task["id"]
+    )
+
+    # queries only use the index to pick tasks, so they keep the tasks' order
+    query = tasks.TaskQuery().due_between("2000-01-01", "2100-01-01", store)
+    assert query.run(store.view()) == tasks.TaskQuery().due_between(
+        "2000-01-01", "2100-01-01"
+    ).run(store.view())
+    assert [task["id"] for task in query.run(store.view())][-1] == 5
+
+
+def run_tests():
+    return run_pytest(__file__)
@@ -0,0 +1,242 @@
+import time
+
+import coverage
+import pytest
+
+from tests import code_coverage, runner
+from tests.common import run_pytest
+
+
+def test_source_hash_tracks_changes(tmp_path):
+    source = tmp_path / "module.py"
+    source.write_text("x = 1\n")
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    before = runner.source_hash([tmp_path])
+    (tmp_path / "notes.txt").write_text("still ignored")
+    unchanged = runner.source_hash([tmp_path])
+    source.write_text("x = 2\n")
+
+    assert unchanged == before
+    assert runner.source_hash([tmp_path]) != before
+
+
+def test_reports_for_file_or_directory():
+    results = {
+        "reports": [
+            ["tests/test_basic.py::test_a", True],
+            ["tests/test_basic.py::test_b[1]", False],
+            ["tests/test_basic_extra.py::test_c", True],
+            ["tests/feature/test_sort.py::test_d", True],
+        ]
+    }
+
+    assert runner.reports_for(runner.TEST_DIR + "/test_basic.py", results) == {
+        ("tests/test_basic.py::test_a", True),
+        ("tests/test_basic.py::test_b[1]", False),
+    }
+    assert runner.reports_for(runner.TEST_DIR + "/feature", results) == {
+        ("tests/feature/test_sort.py::test_d", True)
+    }
+
+
+def test_start_job_uses_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(runner, "CACHE_PATH", str(tmp_path / "results.json"))
+    monkeypatch.setattr(runner, "_results", None)
+    results = {
+        "hash": runner.source_hash(),
+        "reports": [["tests/test_a.py::test_a", True]],
+        "html": None,
+        "coverage": [],
+    }
+    runner._save_json(runner.CACHE_PATH, results)
+    monkeypatch.setattr(runner.TestJob, "_launch", None)  # must not run
+
+    job = runner.start_job()
+
+    assert job.done and job.state == "passed"
+    assert runner.run_all() == results
+    assert runner.get_job(job.id) is job
+
+
+def test_start_job_forgets_old_jobs(monkeypatch, tmp_path):
+    monkeypatch.setattr(runner, "CACHE_PATH", str(tmp_path / "results.json"))
+    monkeypatch.setattr(runner, "_results", None)
+    monkeypatch.setattr(runner, "_jobs", {})
+    monkeypatch.setattr(runner, "JOB_LIMIT", 2)
+    results = {"hash": runner.source_hash(), "reports": [], "html": None}
+    runner._save_json(runner.CACHE_PATH, results)
+
+    jobs = [runner.start_job() for _ in range(4)]
+
+    assert [runner.get_job(job.id) for job in jobs] == [None, None, *jobs[2:]]
+
+
+@pytest.fixture
+def saved_coverage(tmp_path, monkeypatch):
+    """Saves coverage of a five line `src/module.py` and returns its path.
+
+    Line 1 runs on import, `test_one` runs lines 2 and 5, `test_two` runs
+    line 4 and line 3 is a comment.
+    """
+    monkeypatch.setattr(code_coverage, "REPO_DIR", str(tmp_path))
+    monkeypatch.setattr(code_coverage, "COVERAGE_PATH", str(tmp_path / ".coverage"))
+    monkeypatch.setattr(code_coverage, "SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    source = tmp_path / "src" / "module.py"
+    for path in (source, tmp_path / "snapshot" / "src" / "module.py"):
+        path.parent.mkdir(parents=True)
+        path.write_text("line1\nline2\n# line3\nline4\nline5\n")
+
+    write_coverage(
+        code_coverage.COVERAGE_PATH,
+        {
+            "": [1],
+            "tests/test_a.py::test_one|run": [2, 5],
+            "tests/test_a.py::test_two|run": [4],
+        },
+        str(source),
+    )
+    return source
+
+
+def write_coverage(data_file, lines_by_context, filename):
+    data = coverage.CoverageData(data_file)
+    for context, lines in lines_by_context.items():
+        data.set_context(context)
+        data.add_lines({filename: lines})
+    data.write()
+
+
+def test_select_tests_by_coverage(saved_coverage):
+    old = {"src/module.py": "1", "tests/test_a.py": "2", "tests/test_b.py": "3"}
+    lines = saved_coverage.read_text().splitlines()
+
+    saved_coverage.write_text("\n".join(lines[:3] + ["added"] + lines[3:]))
+    assert runner.select_tests(old, {**old, "src/module.py": "4"}) == [
+        "tests/test_a.py::test_two"
+    ]
+    assert runner.select_tests(
+        old, {**old, "src/module.py": "4", "tests/test_b.py": "5"}
+    ) == [
+        "tests/test_b.py",
+        "tests/test_a.py::test_two",
+    ]
+    assert runner.select_tests(old, {**old, "tests/common.py": "6"}) is None
+    assert runner.select_tests(
+        old, {**old, "src/module.py": "4"}, ["tests/test_b.py::test_spawn"]
+    ) == ["tests/test_a.py::test_two", "tests/test_b.py::test_spawn"]
+    assert runner.select_tests(
+        old, {**old, "tests/test_a.py": "5"}, ["tests/test_b.py::test_spawn"]
+    ) == ["tests/test_a.py"]
+
+    saved_coverage.write_text("\n".join(["changed"] + lines[1:]))
+    assert runner.select_tests(old, {**old, "src/module.py": "4"}) is None
+
+
+def test_select_tests_reruns_all_for_unmeasured_code(saved_coverage, tmp_path):
+    old = {"src/module.py": "1", "tests/test_a.py": "2"}
+    lines = saved_coverage.read_text().splitlines()
+    snapshot = tmp_path / "snapshot" / "src" / "module.py"
+
+    # line 3 is code that no test ran, as if it ran in a subprocess
+    snapshot.write_text("\n".join(lines[:2] + ["line3"] + lines[3:]))
+    saved_coverage.write_text("\n".join(lines[:2] + ["changed"] + lines[3:]))
+    assert runner.select_tests(old, {**old, "src/module.py": "3"}) is None
+
+    other = saved_coverage.parent / "other.py"
+    other.write_text("x = 1\n")
+    assert runner.select_tests(old, {**old, "src/other.py": "4"}) is None
+
+
+def test_merge_coverage_replaces_rerun_tests(saved_coverage, tmp_path):
+    lines = saved_coverage.read_text().splitlines()
+    saved_coverage.write_text("\n".join(lines[:3] + ["added"] + lines[3:]))
+    moved = code_coverage.line_maps(["src/module.py"])
+    new_file = str(tmp_path / "new.coverage")
+    write_coverage(
+        new_file, {"tests/test_a.py::test_two|run": [4, 5]}, str(saved_coverage)
+    )
+
+    merged_file = str(tmp_path / "merged.coverage")
+    code_coverage.merge_coverage(
+        code_coverage.COVERAGE_PATH,
+        new_file,
+        lambda nodeid: nodeid == "tests/test_a.py::test_two",
+        moved,
+        merged_file,
+    )
+
+    merged = coverage.CoverageData(merged_file)
+    merged.read()
+    assert moved[str(saved_coverage)] == {1: 1, 2: 2, 3: 3, 4: 5, 5: 6}
+    assert {
+        line: sorted(contexts)
+        for line, contexts in merged.contexts_by_lineno(str(saved_coverage)).items()
+    } == {
+        1: [""],
+        2: ["tests/test_a.py::test_one|run"],
+        4: ["tests/test_a.py::test_two|run"],
+        5: ["tests/test_a.py::test_two|run"],
+        6: ["tests/test_a.py::test_one|run"],
+    }
+
+
+@pytest.fixture
+def job_tests(tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "CACHE_PATH", str(tmp_path / "results.json"))
+    monkeypatch.setattr(runner, "HISTORY_PATH", str(tmp_path / "history.json"))
+    monkeypatch.setattr(runner, "WORKERS", "1")
+    path = tmp_path / "test_job.py"
+    path.write_text(
+        "import os, time, pytest\n"
+        "@pytest.mark.subprocess\n"
+        "def test_pass(): pass\n"
+        "def test_fail(): assert False\n"
+        "def test_skip(): pytest.skip()\n"
+        "def test_wait():\n"
+        "    while os.environ.get('JOB_WAIT'): time.sleep(0.1)\n"
+    )
+    return str(path)
+
+
+def test_test_job_streams_results(job_tests):
+    job = runner.TestJob(1, "key", [job_tests])
+    results = job.wait(timeout=60)
+
+    assert job.state == "failed"
+    assert job.total == 4
+    outcomes = {report["nodeid"].split("::")[-1]: report for report in job.reports}
+    assert {name: report["outcome"] for name, report in outcomes.items()} == {
+        "test_pass": "passed",
+        "test_fail": "failed",
+        "test_skip": "skipped",
+        "test_wait": "passed",
+    }
+    assert sorted(passed for _, passed in results["reports"]) == [False, True, True]
+    assert results["subprocess"] == [outcomes["test_pass"]["nodeid"]]
+    assert "<html" in results["html"]
+    assert runner.job_history()[0]["failed"] == 1
+
+
+def test_test_job_cancel(job_tests, monkeypatch):
+    monkeypatch.setenv("JOB_WAIT", "1")
+    job = runner.TestJob(1, "key", [job_tests])
+    deadline = time.time() + 60
+    while len(job.reports) < 3 and time.time() < deadline:
+        time.sleep(0.1)
+
+    job.cancel()
+
+    with pytest.raises(RuntimeError):
+        job.wait(timeout=30)
+    assert job.state == "cancelled"
+    history = runner.job_history()
+    assert [run["state"] for run in history] == ["cancelled"]
+    assert {name.split("::")[-1] for name in history[0]["durations"]} >= {
+        "test_pass",
+        "test_fail",
+    }
+
+
+def run_tests():
+    return run_pytest(__file__)
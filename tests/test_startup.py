@@ -0,0 +1,37 @@
+import pytest
+
+from tests import importtime
+from tests.common import run_pytest
+
+
+def test_startup_report_lists_imports(tmp_path):
+    (tmp_path / "top.py").write_text("import helper\n")
+    (tmp_path / "helper.py").write_text("import time\ntime.sleep(0.05)\n")
+
+    imports = {i["module"]: i for i in importtime.import_times("top", tmp_path)}
+    report = importtime.startup_report("top", tmp_path)
+
+    assert imports["top"]["depth"] == 0 and imports["helper"]["depth"] == 1
+    assert imports["helper"]["self"] >= 0.05
+    assert report["slowest"][0]["module"] == "helper"
+    assert report["total"] == report["startup"] >= report["slowest"][0]["cumulative"]
+    assert report["eagerly"] == []
+
+
+@pytest.mark.subprocess
+def test_app_startup_within_budget():
+    pytest.importorskip("streamlit")
+    # generous, as other tests may be running alongside
+    budget = importtime.STARTUP_BUDGET * 5
+
+    # timings are noisy, so take the best of a few cold starts
+    for _ in range(3):
+        problems = importtime.check_startup(importtime.startup_report(), budget)
+        if not problems:
+            break
+
+    assert problems == []
+
+
+def run_tests():
+    return run_pytest(__file__)
@@ -0,0 +1,122 @@
+import asyncio
+import os
+
+import pytest
+
+from src import tasks
+from src.storage import async_store, shared
+from tests.common import run_pytest
+
+# ---------- SHARED STORE ----------
+
+
+def test_task_collection_copy_on_write(test_data):
+    collection = tasks.TaskCollection(test_data)
+    copy = collection.copy()
+
+    copy.toggle(1)
+    copy.delete(2)
+    collection.append({"id": 5})
+
+    assert [task["id"] for task in collection] == [1, 2, 3, 4, 5]
+    assert [task["id"] for task in copy] == [1, 3, 4]
+    assert collection.get(1) == test_data[0]
+    assert copy.get(1)["completed"] != test_data[0]["completed"]
+
+
+def test_shared_store_applies_journal_without_reloading(tasks_file, test_data):
+    store = shared.SharedTaskStore(tasks_file)
+    assert store.view() == test_data
+
+    tasks.journal_add_task({"id": 5, "title": "Journaled"}, tasks_file)
+    tasks.journal_delete_task(1, tasks_file)
+    store.toggle(2)
+
+    assert store.view() == tasks.load_tasks(tasks_file)
+    assert store.get_task_stats() == tasks.get_task_stats(store.view())
+    assert store.search("journaled") == [5]
+    assert store.loads == 1
+
+
+def test_shared_store_reloads_new_snapshot(tasks_file, test_data):
+    store = shared.SharedTaskStore(tasks_file)
+    view = store.view()
+
+    tasks.save_tasks(test_data[:2], tasks_file)
+
+    assert store.view() == test_data[:2]
+    assert store.get_task_stats()[0] == 2
+    assert store.loads == 2
+    assert view == test_data
+
+
+def test_shared_store_rejects_stale_save(tasks_file, test_data):
+    store = shared.SharedTaskStore(tasks_file)
+    version = store.refresh()
+    store.delete(1)
+
+    with pytest.raises(tasks.ConcurrentModificationError):
+        store.save([], expected_version=version)
+    assert store.view() == test_data[1:]
+
+
+def test_get_shared_store(tasks_file):
+    assert shared.get_shared_store(tasks_file) is shared.get_shared_store(
+        os.path.join(os.path.dirname(tasks_file), ".", "tasks.json")
+    )
+
+
+# ---------- ASYNC STORE ----------
+
+
+def test_async_store_coalesces_writes(tasks_file, test_data):
+    async def run():
+        store = async_store.AsyncTaskStore(tasks_file)
+        await asyncio.gather(
+            *(
+                store.apply(lambda t, i=task["id"]: tasks.complete_where(t, [i]))
+                for task in test_data
+            ),
+            store.apply(lambda t: t.append({"id": 5, "title": "Test 5"})),
+        )
+        return store.writes
+
+    assert asyncio.run(run()) == 1
+    saved = tasks.load_tasks(tasks_file)
+    assert [task["id"] for task in saved] == [1, 2, 3, 4, 5]
+    assert all(task.get("completed") for task in saved[:4])
+
+
+def test_async_store_query_and_save(tasks_file, test_data):
+    async def run():
+        store = async_store.AsyncTaskStore(tasks_file)
+        query = tasks.TaskQuery().completed(False)
+        before = [task async for task in store.query(query)]
+        await store.save(test_data[:2])
+        after = [task async for task in store.query(query)]
+        return before, after
+
+    before, after = asyncio.run(run())
+
+    assert before == [task for task in test_data if not task["completed"]]
+    assert after == [task for task in test_data[:2] if not task["completed"]]
+    assert tasks.load_tasks(tasks_file) == test_data[:2]
+
+
+def test_async_store_rejects_stale_write(tasks_file, test_data):
+    async def run():
+        store = async_store.AsyncTaskStore(tasks_file)
+        await store.load()
+        tasks.save_tasks(test_data[:1], tasks_file)
+        with pytest.raises(tasks.ConcurrentModificationError):
+            await store.apply(lambda t: t.delete(1))
+        await store.load()
+        await store.apply(lambda t: t.delete(1))
+
+    asyncio.run(run())
+
+    assert tasks.load_tasks(tasks_file) == []
+
+
+def run_tests():
+    return run_pytest(__file__)
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from src import tasks
+from src.storage import binary
+from tests.benchmark import generate_tasks
+from tests.common import run_pytest
+
+
+@pytest.mark.parametrize("n", [0, 1, 5])
+def test_save_tasks_streams_same_json(tmp_path, n):
+    data = generate_tasks(n)
+    path = tmp_path / "tasks.json"
+
+    tasks.save_tasks(iter(data), str(path))
+
+    assert path.read_text() == json.dumps(data, indent=2)
+
+
+@pytest.mark.parametrize("name", ["tasks.json", "tasks.jsonl", "tasks.tbin"])
+def test_iter_tasks_round_trip(tmp_path, monkeypatch, name):
+    # tiny chunks so values are split across reads
+    for module in (tasks, binary):
+        monkeypatch.setattr(module, "STREAM_CHUNK_SIZE", 7)
+        monkeypatch.setattr(module, "STREAM_CHUNK_TASKS", 2)
+    data = generate_tasks(5) + [{"id": 6, "score": 12345, "nested": [1, {"a": []}]}]
+    path = str(tmp_path / name)
+
+    tasks.save_tasks(data, path)
+
+    assert list(tasks.iter_tasks(path)) == data
+    assert tasks.load_tasks(path) == data
+
+
+def test_iter_tasks_applies_journal(tasks_file, test_data):
+    tasks.journal_add_task({"id": 5, "title": "Test 5"}, tasks_file)
+    tasks.journal_delete_task(2, tasks_file)
+    tasks.journal_add_task({"id": 6, "title": "Test 6"}, tasks_file)
+    tasks.journal_update_task({**test_data[0], "completed": False}, tasks_file)
+    tasks.journal_update_task({"id": 5, "title": "Test 5 updated"}, tasks_file)
+    tasks.journal_delete_task(3, tasks_file)
+    tasks.journal_add_task({**test_data[2], "title": "Readded"}, tasks_file)
+
+    assert list(tasks.iter_tasks(tasks_file)) == tasks.load_tasks(tasks_file)
+
+
+@pytest.mark.parametrize("content", ["", "[", '[{"id": 1}', '[{"id": 1} {}]', "{}"])
+def test_iter_tasks_invalid_json(tmp_path, content):
+    path = tmp_path / "tasks.json"
+    path.write_text(content)
+
+    with pytest.raises(json.JSONDecodeError):
+        list(tasks.iter_tasks(str(path)))
+
+
+def test_functions_stay_lazy_on_iterators(test_data):
+    filtered = tasks.filter_tasks_by_completion(iter(test_data), False)
+
+    assert not isinstance(filtered, list)
+    expected = tasks.search_tasks(
+        tasks.filter_tasks_by_completion(test_data, False), "the"
+    )
+    assert list(tasks.search_tasks(filtered, "the")) == expected
+    assert isinstance(tasks.filter_tasks_by_priority(test_data, "High"), list)
+    assert tasks.get_task_stats(iter(test_data)) == tasks.get_task_stats(test_data)
+
+
+def run_tests():
+    return run_pytest(__file__)
@@ -3,13 +3,10 @@ from datetime import datetime, timedelta
 import pytest
 
 from src import tasks
-from tests.common import TEST_DATA, run_pytest
-
-
-@pytest.fixture
-def test_data():
-    return [task.copy() for task in TEST_DATA]
-
+from src.storage import compact
+from tests.benchmark import generate_tasks
+from tests.common import run_pytest
+from tests.test_property import legacy_sort_tasks
 
 # ---------- SORTING ----------
 
@@ -72,6 +69,44 @@ def test_sort_edge_cases(task_input, sort_by, asc, expected_output):
     assert sorted_tasks == expected_output
 
 
+@pytest.mark.parametrize(
+    "sort_by,asc,expected_order",
+    [
+        (["priority", "due_date"], True, [2, 0, 3, 1]),
+        (["category", "id"], [True, False], [1, 2, 3, 0]),
+        (["completed", "created_at"], False, [3, 1, 2, 0]),
+    ],
+)
+def test_sort_multiple_keys(test_data, sort_by, asc, expected_order):
+    sorted_tasks = tasks.sort_tasks(test_data, sort_by, asc)
+
+    assert sorted_tasks == [test_data[i] for i in expected_order]
+
+
+@pytest.mark.parametrize("limit", [0, 1, 3, 10])
+@pytest.mark.parametrize("sort_by", ["due_date", ["category", "created_at"]])
+@pytest.mark.parametrize("asc", [True, False])
+def test_sort_limit(test_data, sort_by, asc, limit):
+    data = test_data + [{"id": 5}, {"id": 6, "category": "Work"}]
+
+    top = tasks.sort_tasks(data, sort_by, asc, limit)
+
+    assert top == tasks.sort_tasks(data, sort_by, asc)[:limit]
+
+
+def test_sort_matches_legacy_sort():
+    data = generate_tasks(500, seed=1)
+    data[10]["due_date"] = "2025-4-1"  # parses, but isn't zero padded
+    del data[20]["due_date"]
+    del data[30]["created_at"]
+
+    for sort_by in ("due_date", "created_at", "priority"):
+        for asc in (True, False):
+            assert tasks.sort_tasks(data, sort_by, asc) == legacy_sort_tasks(
+                data, sort_by, asc
+            )
+
+
 # ---------- COMPLETE ALL ----------
 
 
@@ -147,5 +182,51 @@ def test_get_task_stats_edge_cases(task_input, expected_output):
     assert sorted_tasks == expected_output
 
 
+@pytest.mark.parametrize("container", [list, compact.TaskList])
+def test_get_task_stats_rejects_malformed_due_date(container):
+    with pytest.raises(ValueError):
+        tasks.get_task_stats(container([{"id": 1, "due_date": "2025-13-01"}]))
+
+
+def test_task_stats_matches_get_task_stats(test_data):
+    stats = tasks.TaskStats(test_data)
+
+    assert tasks.get_task_stats(stats) == tasks.get_task_stats(test_data)
+    assert stats.by_category == {"Work": 2, "Personal": 1, "School": 1}
+    assert stats.by_priority == {"Low": 2, "Medium": 1, "High": 1}
+
+
+def test_task_stats_incremental_updates(test_data):
+    stats = tasks.TaskStats()
+    for task in test_data:
+        stats.add(task)
+
+    # toggle the overdue task with the earliest due date
+    stats.remove(test_data[2])
+    test_data[2]["completed"] = True
+    stats.add(test_data[2])
+
+    stats.remove(test_data[1])
+    del test_data[1]
+
+    assert stats.get_task_stats() == tasks.get_task_stats(test_data)
+    assert stats.by_category["Personal"] == 0
+
+
+def test_task_stats_overdue_follows_date(test_data, monkeypatch):
+    stats = tasks.TaskStats(test_data)
+    assert stats.overdue == 2
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 4, 23, 12)
+
+    monkeypatch.setattr(tasks, "datetime", FakeDatetime)
+
+    # only the task due in 1900 is overdue; the other is due that day
+    assert stats.overdue == 1
+
+
 def run_tests():
     return run_pytest(__file__)